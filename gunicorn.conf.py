@@ -0,0 +1,16 @@
+# Gunicorn loads ./gunicorn.conf.py automatically; command-line flags in the
+# Dockerfile still take precedence over anything set here.
+
+
+def post_worker_init(worker):
+    # The app (and Django) is loaded by now; warm-up only runs when LOCAL_VLM_PRELOAD is on.
+    from vision.local_vlm_warmup import start_local_vlm_warmup
+
+    start_local_vlm_warmup()
+
+
+def worker_exit(server, worker):
+    # Write out recognition logs still sitting in this worker's buffer.
+    from vision.recognition_log import recognition_log_writer
+
+    recognition_log_writer.close()
@@ -0,0 +1,166 @@
+"""
+Process-wide pooled HTTP clients for the LLM and embedding backends.
+
+Every hot-path call used to open its own connection, paying a TCP (and TLS)
+handshake per request. Clients built here are cached per worker process and
+reuse keep-alive connections, with per-backend pool limits and timeouts read
+from settings or the environment:
+
+- ``HTTP_POOL_MAX_CONNECTIONS`` / ``<BACKEND>_HTTP_POOL_MAX_CONNECTIONS``
+- ``HTTP_POOL_MAX_KEEPALIVE`` / ``<BACKEND>_HTTP_POOL_MAX_KEEPALIVE``
+- ``HTTP_POOL_KEEPALIVE_SECONDS``
+- ``<BACKEND>_HTTP_TIMEOUT_SECONDS``
+- ``HTTP_CLIENT_HTTP2`` (used for HTTPS backends when the ``h2`` package is installed)
+"""
+import hashlib
+import importlib.util
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_SECONDS = 60
+DEFAULT_TIMEOUTS = {
+    "openai": 120.0,
+    "openai_realtime": 10.0,
+    "ollama": 120.0,
+}
+
+T = TypeVar("T")
+
+_CLIENTS: Dict[Hashable, Any] = {}
+_CLIENTS_PID: Optional[int] = None
+_CLIENTS_LOCK = threading.RLock()
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def _backend_setting(backend: str, name: str, default: Any) -> Any:
+    return _setting(f"{backend.upper()}_{name}", _setting(name, default))
+
+
+def _cached(key: Hashable, factory: Callable[[], T]) -> T:
+    """
+    Return the client stored under ``key`` for this process, building it once.
+
+    Connections must not be shared across a fork, so a new pid starts from an
+    empty registry instead of reusing the parent's sockets.
+    """
+    global _CLIENTS_PID
+
+    with _CLIENTS_LOCK:
+        if _CLIENTS_PID != os.getpid():
+            _CLIENTS.clear()
+            _CLIENTS_PID = os.getpid()
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = factory()
+            _CLIENTS[key] = client
+        return client
+
+
+def _key_fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def http2_enabled() -> bool:
+    value = str(_setting("HTTP_CLIENT_HTTP2", "true")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"} and importlib.util.find_spec("h2") is not None
+
+
+def backend_timeout(backend: str) -> float:
+    return float(_backend_setting(backend, "HTTP_TIMEOUT_SECONDS", DEFAULT_TIMEOUTS.get(backend, 60.0)))
+
+
+def _pool_size(backend: str) -> tuple[int, int]:
+    max_connections = int(_backend_setting(backend, "HTTP_POOL_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS))
+    max_keepalive = int(_backend_setting(backend, "HTTP_POOL_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE))
+    return max_connections, min(max_keepalive, max_connections)
+
+
+def get_httpx_client(backend: str) -> httpx.Client:
+    """Shared ``httpx.Client`` for ``backend`` with its own connection pool."""
+
+    def build() -> httpx.Client:
+        max_connections, max_keepalive = _pool_size(backend)
+        http2 = http2_enabled()
+        logger.info(
+            "Creating pooled HTTP client for %s (max_connections=%s, http2=%s)", backend, max_connections, http2
+        )
+        return httpx.Client(
+            timeout=backend_timeout(backend),
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=float(_setting("HTTP_POOL_KEEPALIVE_SECONDS", DEFAULT_KEEPALIVE_SECONDS)),
+            ),
+        )
+
+    return _cached(("httpx", backend), build)
+
+
+def get_requests_session(backend: str) -> requests.Session:
+    """Shared ``requests.Session`` for plain-HTTP backends such as a local Ollama server."""
+
+    def build() -> requests.Session:
+        max_connections, _ = _pool_size(backend)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    return _cached(("requests", backend), build)
+
+
+def get_openai_client(api_key: str):
+    from openai import OpenAI
+
+    return _cached(
+        ("openai", _key_fingerprint(api_key)),
+        lambda: OpenAI(
+            api_key=api_key,
+            timeout=backend_timeout("openai"),
+            http_client=get_httpx_client("openai"),
+        ),
+    )
+
+
+def get_chat_openai(model: str, api_key: str, temperature: float = 0):
+    from langchain_openai import ChatOpenAI
+
+    return _cached(
+        ("chat_openai", model, temperature, _key_fingerprint(api_key)),
+        lambda: ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            openai_api_key=api_key,
+            timeout=backend_timeout("openai"),
+            http_client=get_httpx_client("openai"),
+        ),
+    )
+
+
+def get_openai_embeddings(api_key: str):
+    from langchain_openai import OpenAIEmbeddings
+
+    return _cached(
+        ("openai_embeddings", _key_fingerprint(api_key)),
+        lambda: OpenAIEmbeddings(
+            openai_api_key=api_key,
+            timeout=backend_timeout("openai"),
+            http_client=get_httpx_client("openai"),
+        ),
+    )
@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import (
     PregnancyStage, NutrientRequirement, Food, FoodLog, UserPregnancyProfile,
     FoodRecommendation, FoodRating, UserTrustScore, NutritionDatabase,
-    FoodRecognitionLog, ResponseStyle
+    FoodRecognitionLog, ResponseStyle, ImageFingerprint, GuidanceEntry
 )
 
 @admin.register(PregnancyStage)
@@ -60,12 +60,25 @@ class NutritionDatabaseAdmin(admin.ModelAdmin):
 
 @admin.register(FoodRecognitionLog)
 class FoodRecognitionLogAdmin(admin.ModelAdmin):
-    list_display = ('user', 'recognized_food', 'confidence_score', 'date')
-    list_filter = ('date',)
+    list_display = ('user', 'recognized_food', 'confidence_score', 'provider', 'model_name', 'latency_ms', 'date')
+    list_filter = ('date', 'provider')
     search_fields = ('user__username', 'recognized_food')
     date_hierarchy = 'date'
 
 @admin.register(ResponseStyle)
 class ResponseStyleAdmin(admin.ModelAdmin):
     list_display = ('name',)
-    search_fields = ('name', 'prompt')
\ No newline at end of file
+    search_fields = ('name', 'prompt')
+
+@admin.register(ImageFingerprint)
+class ImageFingerprintAdmin(admin.ModelAdmin):
+    list_display = ('dhash', 'food_name', 'hit_count', 'created_at', 'last_seen_at')
+    search_fields = ('dhash', 'food_name')
+    date_hierarchy = 'created_at'
+
+@admin.register(GuidanceEntry)
+class GuidanceEntryAdmin(admin.ModelAdmin):
+    list_display = ('food_name', 'stage', 'style', 'generator', 'index_name', 'index_version', 'is_safe', 'created_at')
+    list_filter = ('stage', 'generator', 'index_version', 'is_safe')
+    search_fields = ('food_name',)
+    date_hierarchy = 'created_at'
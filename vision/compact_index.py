@@ -0,0 +1,208 @@
+"""
+Read-only, worker-shared form of the FAISS index.
+
+``export_compact`` writes the FAISS vectors with ``faiss.write_index`` and the
+chunk text and metadata into an SQLite docstore keyed by FAISS row, replacing
+the pickled LangChain docstore (``index.pkl``). ``CompactIndex`` memory-maps the
+vectors read-only, so every gunicorn worker shares the same page cache instead
+of holding its own deserialized copy. Documents are fetched by row or id only
+for the hits of a search.
+
+Files are versioned (``index.v<N>.faiss``, ``docstore.v<N>.sqlite3``) and
+``current.json`` is swapped atomically last, so a worker never pairs vectors
+with the docstore of another version. A loaded ``CompactIndex`` holds the
+mapping and an open docstore connection, so it keeps working after later
+exports unlink its files.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from vision.vector_index import set_search_parameters
+
+logger = logging.getLogger(__name__)
+
+COMPACT_DIR = "compact"
+POINTER_FILE = "current.json"
+COMPACT_FORMAT = 1
+LOOKUP_CHUNK = 500  # stays under SQLite's bound-parameter limit
+
+
+def compact_directory(index_path: str) -> str:
+    return os.path.join(index_path, COMPACT_DIR)
+
+
+def read_pointer(index_path: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(compact_directory(index_path), POINTER_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            pointer = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    return pointer if pointer.get("format") == COMPACT_FORMAT else None
+
+
+def _mmap_flags() -> int:
+    # IO_FLAG_MMAP_IFC (faiss >= 1.11) maps the codes of flat and IVF indexes in place; older
+    # releases can only map IVF inverted lists. The two flags cannot be combined.
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def _write_atomically(path: str, write) -> None:
+    temp_path = f"{path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+def _write_docstore(path: str, rows: Iterable[Tuple[int, str, Any]]) -> None:
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute(
+            "CREATE TABLE chunks ("
+            " row INTEGER PRIMARY KEY,"
+            " id TEXT NOT NULL UNIQUE,"
+            " content TEXT NOT NULL,"
+            " metadata TEXT NOT NULL"
+            ")"
+        )
+        connection.executemany(
+            "INSERT INTO chunks (row, id, content, metadata) VALUES (?, ?, ?, ?)",
+            (
+                (row, doc_id, doc.page_content, json.dumps(doc.metadata or {}, ensure_ascii=False, default=str))
+                for row, doc_id, doc in rows
+            ),
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def export_compact(
+    store: Any, index_path: str, version: int, index: Optional[Any] = None, index_type: str = "flat"
+) -> Dict[str, Any]:
+    """
+    Write ``store`` (a LangChain FAISS store) as the compact index of ``index_path``.
+
+    ``index`` replaces ``store.index`` as the vector index when given, e.g. an
+    ANN index of ``index_type`` built over the same rows (``vector_index``).
+    """
+    directory = compact_directory(index_path)
+    os.makedirs(directory, exist_ok=True)
+    index = index if index is not None else store.index
+    index_file = f"index.v{version}.faiss"
+    docstore_file = f"docstore.v{version}.sqlite3"
+
+    _write_atomically(os.path.join(directory, index_file), lambda path: faiss.write_index(index, path))
+    _write_atomically(
+        os.path.join(directory, docstore_file),
+        lambda path: _write_docstore(
+            path,
+            ((row, doc_id, store.docstore.search(doc_id)) for row, doc_id in sorted(store.index_to_docstore_id.items())),
+        ),
+    )
+
+    previous = read_pointer(index_path) or {}
+    pointer = {
+        "format": COMPACT_FORMAT,
+        "version": version,
+        "index_type": index_type,
+        "index": index_file,
+        "docstore": docstore_file,
+        "count": int(index.ntotal),
+        "dim": int(index.d),
+        "normalize_L2": bool(getattr(store, "_normalize_L2", False)),
+    }
+    pointer_path = os.path.join(directory, POINTER_FILE)
+    _write_atomically(pointer_path, lambda path: _write_json(path, pointer))
+
+    # Keep the previous version for workers that are still opening it; unlinking is safe for mapped files.
+    keep = {POINTER_FILE, index_file, docstore_file, previous.get("index"), previous.get("docstore")}
+    for name in os.listdir(directory):
+        if name not in keep and not name.endswith(".tmp"):
+            os.remove(os.path.join(directory, name))
+    logger.info("Exported compact index v%s with %s vectors to %s", version, pointer["count"], directory)
+    return pointer
+
+
+def _write_json(path: str, payload: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle)
+
+
+class CompactIndex:
+    """The subset of the LangChain vector store interface the guidance code uses, read-only."""
+
+    def __init__(
+        self, index_path: str, embedding_function: Any, search_parameters: Optional[Dict[str, int]] = None
+    ) -> None:
+        pointer = read_pointer(index_path)
+        if pointer is None:
+            raise FileNotFoundError(f"No compact index under {index_path}")
+        directory = compact_directory(index_path)
+        self.version = int(pointer["version"])
+        self.index_type = pointer.get("index_type", "flat")
+        self.embedding_function = embedding_function
+        self._normalize_L2 = bool(pointer.get("normalize_L2"))
+        self.index = faiss.read_index(os.path.join(directory, pointer["index"]), _mmap_flags())
+        if search_parameters:
+            set_search_parameters(self.index, search_parameters)
+        # Opened now, not per thread on first use: the open file descriptor keeps this version's
+        # docstore readable after a later export unlinks it. immutable: the file is never written
+        # after export, so SQLite skips locking entirely.
+        self._connection = sqlite3.connect(
+            f"file:{os.path.join(directory, pointer['docstore'])}?mode=ro&immutable=1",
+            uri=True,
+            check_same_thread=False,
+        )
+        self._lock = threading.Lock()
+
+    def _fetch(self, column: str, keys: List[Any]) -> Dict[Any, Document]:
+        found: Dict[Any, Document] = {}
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT row, id, content, metadata FROM chunks WHERE {column} IN ({placeholders})", chunk
+                ).fetchall()
+            for row, doc_id, content, metadata in rows:
+                key = row if column == "row" else doc_id
+                found[key] = Document(id=doc_id, page_content=content, metadata=json.loads(metadata))
+        return found
+
+    def _embed_query(self, text: str) -> List[float]:
+        if hasattr(self.embedding_function, "embed_query"):
+            return self.embedding_function.embed_query(text)
+        return self.embedding_function(text)
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        vector = np.asarray([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vector)
+        scores, rows = self.index.search(vector, k)
+        hits = [(int(row), float(score)) for row, score in zip(rows[0], scores[0]) if row != -1]
+        documents = self._fetch("row", [row for row, _ in hits])
+        return [(documents[row], score) for row, score in hits if row in documents]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embed_query(query), k, **kwargs)
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        return list(self._fetch("id", list(ids)).values())
@@ -0,0 +1,374 @@
+"""
+Schema-constrained JSON decoding for the local VLM.
+
+A small character automaton built from a JSON-schema subset (object, array,
+string, number, boolean) decides which continuations are legal. At each step the
+logits processor walks the model's candidates in greedy order and keeps the first
+token whose text the automaton accepts, so the output is the model's own greedy
+answer whenever that answer is valid. Output is compact (no whitespace) with keys
+in schema order, matching the fine-tuning targets, and generation stops as soon as
+the top-level object closes.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STRING_MAX_LENGTH = 64
+DEFAULT_ARRAY_MAX_ITEMS = 8
+NUMBER_MAX_LENGTH = 8
+DEFAULT_TOP_K = 64
+
+# Stand-in for a UTF-8 byte >= 0x80 emitted through a byte-fallback token. It is only
+# legal inside strings, where it can never be mistaken for a quote or backslash.
+OPAQUE_BYTE = "\ue000"
+BYTE_TOKEN_PATTERN = re.compile(r"^<0x([0-9A-Fa-f]{2})>$")
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")
+NUMBER_PREFIX_PATTERN = re.compile(r"^-?(\d+(\.\d*)?)?$")
+STRING_ESCAPES = set('"\\/bfnrt')
+FALLBACK_CHARS = '"]}0,{['
+
+COMPLETE: Tuple = ()
+
+
+@dataclass(frozen=True)
+class Literal:
+    text: str
+
+
+@dataclass(frozen=True)
+class StringValue:
+    max_length: int = DEFAULT_STRING_MAX_LENGTH
+
+
+@dataclass(frozen=True)
+class NumberValue:
+    pass
+
+
+@dataclass(frozen=True)
+class BooleanValue:
+    pass
+
+
+@dataclass(frozen=True)
+class ArrayValue:
+    items: Any
+    max_items: int = DEFAULT_ARRAY_MAX_ITEMS
+
+
+@dataclass(frozen=True)
+class ObjectValue:
+    parts: Tuple[Any, ...]
+
+
+def _object_node(fields: Sequence[Tuple[str, Any]]) -> ObjectValue:
+    parts: List[Any] = []
+    pending = "{"
+    for index, (name, node) in enumerate(fields):
+        pending += ("," if index else "") + f'"{name}":'
+        parts.append(Literal(pending))
+        parts.append(node)
+        pending = ""
+    parts.append(Literal(pending + "}"))
+    return ObjectValue(tuple(parts))
+
+
+def compile_schema(schema: Dict[str, Any]):
+    """Compile the supported JSON-schema subset into automaton nodes."""
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        order = list(schema.get("required") or properties)
+        order += [name for name in properties if name not in order]
+        return _object_node([(name, compile_schema(properties[name])) for name in order])
+    if schema_type == "array":
+        return ArrayValue(compile_schema(schema["items"]), int(schema.get("maxItems", DEFAULT_ARRAY_MAX_ITEMS)))
+    if schema_type == "string":
+        return StringValue(int(schema.get("maxLength", DEFAULT_STRING_MAX_LENGTH)))
+    if schema_type in {"number", "integer"}:
+        return NumberValue()
+    if schema_type == "boolean":
+        return BooleanValue()
+    raise ValueError(f"Unsupported schema type for constrained decoding: {schema_type}")
+
+
+class JsonAutomaton:
+    """
+    Stack machine over characters. A state is an immutable tuple of frames; the
+    innermost frame is last. ``COMPLETE`` means the top-level value has closed.
+    """
+
+    def __init__(self, root) -> None:
+        self.root = root
+
+    def initial_state(self) -> Tuple:
+        stack: List[Tuple] = []
+        self._enter(stack, self.root)
+        return tuple(stack)
+
+    @classmethod
+    def _enter(cls, stack: List[Tuple], node) -> None:
+        if isinstance(node, Literal):
+            stack.append(("lit", node.text, 0))
+        elif isinstance(node, StringValue):
+            # (kind, max_length, length, mode) with mode 0=before quote, 1=inside, 2=after backslash
+            stack.append(("str", node.max_length, 0, 0))
+        elif isinstance(node, NumberValue):
+            stack.append(("num", ""))
+        elif isinstance(node, BooleanValue):
+            stack.append(("bool", ""))
+        elif isinstance(node, ArrayValue):
+            # (kind, node, count, phase) with phase 0=before '[', 1=after '[', 2=after item, 3=after ','
+            stack.append(("arr", node, 0, 0))
+        elif isinstance(node, ObjectValue):
+            stack.append(("seq", node.parts, 0))
+            cls._enter(stack, node.parts[0])
+        else:
+            raise TypeError(f"Unknown automaton node: {node!r}")
+
+    @classmethod
+    def _complete_leaf(cls, stack: List[Tuple]) -> None:
+        stack.pop()
+        while stack:
+            parent = stack[-1]
+            if parent[0] == "seq":
+                _, parts, index = parent
+                if index + 1 < len(parts):
+                    stack[-1] = ("seq", parts, index + 1)
+                    cls._enter(stack, parts[index + 1])
+                    return
+                stack.pop()
+                continue
+            if parent[0] == "arr":
+                _, node, count, _ = parent
+                stack[-1] = ("arr", node, count + 1, 2)
+                return
+            raise AssertionError(f"Frame {parent[0]} cannot contain children")
+
+    def feed(self, state: Tuple, char: str) -> Optional[Tuple]:
+        if not state:
+            return None
+        stack = list(state)
+        while True:
+            frame = stack[-1]
+            kind = frame[0]
+
+            if kind == "lit":
+                _, text, position = frame
+                if char != text[position]:
+                    return None
+                if position + 1 == len(text):
+                    self._complete_leaf(stack)
+                else:
+                    stack[-1] = ("lit", text, position + 1)
+                return tuple(stack)
+
+            if kind == "str":
+                _, max_length, length, mode = frame
+                if mode == 0:
+                    if char != '"':
+                        return None
+                    stack[-1] = ("str", max_length, 0, 1)
+                elif mode == 2:
+                    if char not in STRING_ESCAPES:
+                        return None
+                    stack[-1] = ("str", max_length, length + 1, 1)
+                elif char == '"':
+                    self._complete_leaf(stack)
+                elif ord(char) < 0x20 or length >= max_length:
+                    return None
+                elif char == "\\":
+                    stack[-1] = ("str", max_length, length, 2)
+                else:
+                    stack[-1] = ("str", max_length, length + 1, 1)
+                return tuple(stack)
+
+            if kind == "num":
+                text = frame[1]
+                candidate = text + char
+                if len(candidate) <= NUMBER_MAX_LENGTH and NUMBER_PREFIX_PATTERN.match(candidate):
+                    stack[-1] = ("num", candidate)
+                    return tuple(stack)
+                if not NUMBER_PATTERN.match(text):
+                    return None
+                # The number ended; the character belongs to whatever follows it.
+                self._complete_leaf(stack)
+                if not stack:
+                    return None
+                continue
+
+            if kind == "bool":
+                candidate = frame[1] + char
+                if candidate in {"true", "false"}:
+                    self._complete_leaf(stack)
+                elif "true".startswith(candidate) or "false".startswith(candidate):
+                    stack[-1] = ("bool", candidate)
+                else:
+                    return None
+                return tuple(stack)
+
+            if kind == "arr":
+                _, node, count, phase = frame
+                if phase == 0:
+                    if char != "[":
+                        return None
+                    stack[-1] = ("arr", node, count, 1)
+                    return tuple(stack)
+                if char == "]" and phase in {1, 2}:
+                    self._complete_leaf(stack)
+                    return tuple(stack)
+                if phase == 2:
+                    if char != "," or count >= node.max_items:
+                        return None
+                    stack[-1] = ("arr", node, count, 3)
+                    return tuple(stack)
+                if count >= node.max_items:
+                    return None
+                stack[-1] = ("arr", node, count, 3)
+                self._enter(stack, node.items)
+                continue
+
+            raise AssertionError(f"Frame {kind} cannot receive characters")
+
+    def feed_text(self, state: Tuple, text: str) -> Optional[Tuple]:
+        for char in text:
+            state = self.feed(state, char)
+            if state is None:
+                return None
+        return state
+
+    def fallback_char(self, state: Tuple) -> Optional[str]:
+        """A character that keeps the output valid and moves it towards closing."""
+        if not state:
+            return None
+        frame = state[-1]
+        if frame[0] == "lit":
+            return frame[1][frame[2]]
+        if frame[0] == "bool":
+            return "false"[len(frame[1])] if "false".startswith(frame[1]) else "true"[len(frame[1])]
+        for char in FALLBACK_CHARS:
+            if self.feed(state, char) is not None:
+                return char
+        return None
+
+
+_TOKEN_TEXT_CACHE: Dict[int, List[Optional[str]]] = {}
+
+
+def token_texts(tokenizer) -> List[Optional[str]]:
+    """
+    Surface text of every vocabulary entry, or ``None`` for special tokens.
+
+    Built from SentencePiece pieces (``▁`` is a space) rather than ``decode``, which
+    strips leading spaces from single tokens. Byte-fallback pieces map to their ASCII
+    character or to ``OPAQUE_BYTE``.
+    """
+    cache_key = id(tokenizer)
+    if cache_key in _TOKEN_TEXT_CACHE:
+        return _TOKEN_TEXT_CACHE[cache_key]
+
+    special_ids = set(getattr(tokenizer, "all_special_ids", []) or [])
+    special_ids.update((getattr(tokenizer, "get_added_vocab", lambda: {})() or {}).values())
+    pieces = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+
+    texts: List[Optional[str]] = []
+    for token_id, piece in enumerate(pieces):
+        if token_id in special_ids or not piece:
+            texts.append(None)
+            continue
+        byte_match = BYTE_TOKEN_PATTERN.match(piece)
+        if byte_match:
+            value = int(byte_match.group(1), 16)
+            texts.append(chr(value) if value < 0x80 else OPAQUE_BYTE)
+        else:
+            texts.append(piece.replace("▁", " "))
+    _TOKEN_TEXT_CACHE[cache_key] = texts
+    return texts
+
+
+class JsonSchemaLogitsProcessor:
+    """
+    ``LogitsProcessor`` that keeps each batch row inside the schema grammar.
+
+    Only the ``top_k`` highest-scoring candidates are checked per step. If none of
+    them is legal, the shortest legal continuation (a single-character token) is
+    forced instead, which always makes progress towards closing the object. Rows whose
+    object has closed are forced to EOS.
+    """
+
+    def __init__(self, tokenizer, schema: Dict[str, Any], eos_token_id: int, top_k: int = DEFAULT_TOP_K) -> None:
+        self.automaton = JsonAutomaton(compile_schema(schema))
+        self.texts = token_texts(tokenizer)
+        self.eos_token_id = eos_token_id
+        self.top_k = top_k
+        self.char_tokens: Dict[str, int] = {}
+        for token_id, text in enumerate(self.texts):
+            if text is not None and len(text) == 1:
+                self.char_tokens.setdefault(text, token_id)
+        self.states: Optional[List[Tuple]] = None
+        self.consumed = 0
+
+    def sync(self, input_ids) -> None:
+        """Advance every row's automaton over tokens generated since the last call."""
+        if self.states is None:
+            self.states = [self.automaton.initial_state() for _ in range(input_ids.shape[0])]
+            self.consumed = input_ids.shape[1]
+            return
+
+        for row, token_ids in enumerate(input_ids[:, self.consumed:].tolist()):
+            for token_id in token_ids:
+                state = self.states[row]
+                if not state:
+                    break
+                text = self.texts[token_id] if token_id < len(self.texts) else None
+                next_state = self.automaton.feed_text(state, text) if text else None
+                if next_state is None:
+                    logger.warning("Constrained decoding saw an illegal token %s; ending row %s", token_id, row)
+                    next_state = COMPLETE
+                self.states[row] = next_state
+        self.consumed = input_ids.shape[1]
+
+    def is_complete(self, row: int) -> bool:
+        return self.states is not None and not self.states[row]
+
+    def _choose(self, state: Tuple, row_scores) -> int:
+        if not state:
+            return self.eos_token_id
+        for token_id in row_scores.topk(min(self.top_k, row_scores.shape[-1])).indices.tolist():
+            text = self.texts[token_id] if token_id < len(self.texts) else None
+            if text and self.automaton.feed_text(state, text) is not None:
+                return token_id
+        fallback = self.automaton.fallback_char(state)
+        if fallback is None or fallback not in self.char_tokens:
+            return self.eos_token_id
+        return self.char_tokens[fallback]
+
+    def __call__(self, input_ids, scores):
+        import torch
+
+        self.sync(input_ids)
+        chosen = [self._choose(state, scores[row]) for row, state in enumerate(self.states)]
+        constrained = torch.full_like(scores, float("-inf"))
+        rows = torch.arange(scores.shape[0], device=scores.device)
+        constrained[rows, torch.tensor(chosen, device=scores.device)] = 0.0
+        return constrained
+
+
+class JsonCompleteStoppingCriteria:
+    """Stops each row right after its top-level object closes, without waiting for EOS."""
+
+    def __init__(self, processor: JsonSchemaLogitsProcessor) -> None:
+        self.processor = processor
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        self.processor.sync(input_ids)
+        return torch.tensor(
+            [self.processor.is_complete(row) for row in range(input_ids.shape[0])],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
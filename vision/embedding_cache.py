@@ -0,0 +1,186 @@
+"""
+Content-addressed, on-disk cache for document embeddings.
+
+Vectors are stored in SQLite as float16 blobs keyed by (provider, model,
+sha256 of the chunk text), so rebuilding an index, switching the index format or
+re-chunking the corpus only embeds chunks that were never embedded before.
+float16 halves the footprint; the rounding error (~1e-3 relative) is far below
+what changes a nearest-neighbour ranking. Freshly embedded chunks are rounded
+the same way before they are returned, so an index holds identical vectors
+whether it was built from a cold or a warm cache.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+
+from vision.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_FILE = "embedding_cache.sqlite3"
+LOOKUP_CHUNK = 500  # stays under SQLite's bound-parameter limit
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def embedding_cache_enabled() -> bool:
+    value = str(_setting("RAG_EMBEDDING_CACHE", "true")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: Sequence[float]) -> bytes:
+    return struct.pack(f"<{len(vector)}e", *vector)
+
+
+def _unpack(blob: bytes, dim: int) -> List[float]:
+    return list(struct.unpack(f"<{dim}e", blob))
+
+
+def _round_to_stored(vector: Sequence[float]) -> List[float]:
+    return _unpack(_pack(vector), len(vector))
+
+
+class EmbeddingStore:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " provider TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (provider, model, text_hash)"
+                ") WITHOUT ROWID"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            # WAL lets index builds in other processes read while one writes.
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get_many(self, provider: str, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        connection = self._connection()
+        for start in range(0, len(hashes), LOOKUP_CHUNK):
+            chunk = list(hashes[start:start + LOOKUP_CHUNK])
+            placeholders = ",".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT text_hash, dim, vector FROM embeddings"
+                f" WHERE provider = ? AND model = ? AND text_hash IN ({placeholders})",
+                [provider, model, *chunk],
+            )
+            for digest, dim, blob in rows:
+                found[digest] = _unpack(blob, dim)
+        return found
+
+    def put_many(self, provider: str, model: str, items: Iterable[tuple]) -> None:
+        rows = []
+        for digest, vector in items:
+            rows.append((provider, model, digest, len(vector), _pack(vector)))
+        with self._connection() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (provider, model, text_hash, dim, vector) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def count(self, provider: Optional[str] = None, model: Optional[str] = None) -> int:
+        query = "SELECT COUNT(*) FROM embeddings"
+        params: List[str] = []
+        if provider is not None and model is not None:
+            query += " WHERE provider = ? AND model = ?"
+            params = [provider, model]
+        return int(self._connection().execute(query, params).fetchone()[0])
+
+
+class CachedEmbeddings:
+    """
+    Wraps an embeddings object so ``embed_documents`` only sends unseen chunks to
+    the backend. Queries are passed straight through.
+    """
+
+    def __init__(self, inner: Any, provider: str, model: str, store: EmbeddingStore) -> None:
+        self.inner = inner
+        self.provider = provider
+        self.model = model
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        cached = self.store.get_many(self.provider, self.model, sorted(set(hashes)))
+
+        missing: Dict[str, str] = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in cached and digest not in missing:
+                missing[digest] = text
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            fresh = {digest: _round_to_stored(vector) for digest, vector in zip(missing.keys(), vectors)}
+            self.store.put_many(self.provider, self.model, fresh.items())
+            cached.update(fresh)
+
+        hits = len(texts) - len(missing)
+        self.hits += hits
+        self.misses += len(missing)
+        registry.counter("embedding_cache.hits").inc(hits)
+        registry.counter("embedding_cache.misses").inc(len(missing))
+        if texts:
+            logger.info(
+                "Embedding cache %s/%s: %s of %s chunks cached (%.0f%% hit rate), embedded %s",
+                self.provider, self.model, hits, len(texts), 100.0 * hits / len(texts), len(missing),
+            )
+        return [cached[digest] for digest in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+    def __call__(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+            "stored": self.store.count(self.provider, self.model),
+        }
+
+
+_STORES: Dict[str, EmbeddingStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_embedding_store(path: str) -> EmbeddingStore:
+    with _STORES_LOCK:
+        store = _STORES.get(path)
+        if store is None:
+            store = EmbeddingStore(path)
+            _STORES[path] = store
+        return store
@@ -3,14 +3,18 @@ import logging
 import os
 import re
 import threading
-from base64 import b64decode
-from io import BytesIO
-from typing import Any, Iterable, Optional
+import time
+from typing import Any, Iterable, Optional, Tuple, Union
 
-import requests
 from django.conf import settings
 from openai import OpenAI, OpenAIError
-from vision.models import FoodRecognitionLog
+from project_template.http_clients import get_openai_client as get_pooled_openai_client
+from vision import ollama_client
+from vision.image_preprocessing import PreparedImage, prepare_image
+from vision.hedging import HedgeExhausted, hedged_call
+from vision.provider_router import ProvidersExhausted, ProvidersUnavailable, router as provider_router
+from vision.recognition_log import recognition_log_writer
+from vision.vlm_batching import MicroBatchScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +24,18 @@ LOCAL_VISION_TIMEOUT_SECONDS = 120
 DEFAULT_LOCAL_VLM_MODEL_ID = "google/gemma-4-E4B"
 DEFAULT_LOCAL_VLM_ADAPTER_DIR = "vlm_lora_adapter/gemma4-e4b-food-lora-1000step"
 DEFAULT_LOCAL_VLM_MAX_NEW_TOKENS = 160
+DEFAULT_LOCAL_VLM_BATCH_MAX_SIZE = 4
+DEFAULT_LOCAL_VLM_BATCH_MAX_WAIT_MS = 15
 
 _LOCAL_VLM_LOCK = threading.Lock()
 _LOCAL_VLM_PROCESSOR = None
 _LOCAL_VLM_MODEL = None
+_LOCAL_VLM_SCHEDULER: Optional[MicroBatchScheduler] = None
+_LOCAL_VLM_SCHEDULER_LOCK = threading.Lock()
+
+
+class OpenAICallCancelled(RuntimeError):
+    """The caller gave up on the request (e.g. a hedged call already won)."""
 
 FOOD_RECOGNITION_SCHEMA = {
     "type": "object",
@@ -65,6 +77,31 @@ LOCAL_VLM_USER_PROMPT = (
     "detected_items must be a list of objects with food_name, item_type, and confidence."
 )
 
+# Key order follows the fine-tuning targets in vlm_lora_training/prepare_food_vlm_sft.py.
+LOCAL_VLM_RECOGNITION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "image_type": {"type": "string", "maxLength": 40},
+        "is_food": {"type": "boolean"},
+        "detected_items": {
+            "type": "array",
+            "maxItems": 3,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "food_name": {"type": "string", "maxLength": 60},
+                    "item_type": {"type": "string", "maxLength": 40},
+                    "confidence": {"type": "number"},
+                },
+                "required": ["food_name", "item_type", "confidence"],
+            },
+        },
+        "visible_text": {"type": "string", "maxLength": 120},
+        "needs_clarification": {"type": "boolean"},
+    },
+    "required": ["image_type", "is_food", "detected_items", "visible_text", "needs_clarification"],
+}
+
 UNKNOWN_LOCAL_VLM_NAMES = {
     "",
     "unknown",
@@ -91,6 +128,24 @@ def _vision_provider() -> str:
     return _setting("VISION_PROVIDER", "openai").strip().lower()
 
 
+def _canonical_vision_provider(provider: str) -> str:
+    provider = provider.strip().lower()
+    if provider in {"lora", "local_lora", "peft", "gemma_lora"}:
+        return "lora"
+    if provider in {"ollama", "local"}:
+        return "ollama"
+    return "openai"
+
+
+def _vision_providers() -> tuple[str, ...]:
+    """
+    Backends the router may pick from, in priority order. ``VISION_PROVIDERS`` lists
+    them (e.g. ``ollama,openai``); it defaults to the single ``VISION_PROVIDER``.
+    """
+    configured = _as_model_tuple(_setting("VISION_PROVIDERS"), (_vision_provider(),))
+    return tuple(dict.fromkeys(_canonical_vision_provider(provider) for provider in configured))
+
+
 def _setting_bool(name: str, default: bool = False) -> bool:
     value = str(_setting(name, str(default))).strip().lower()
     return value in {"1", "true", "yes", "y", "on"}
@@ -100,7 +155,7 @@ def get_openai_client() -> OpenAI:
     api_key = _setting("OPENAI_API_KEY", "")
     if not api_key:
         raise ValueError("OPENAI_API_KEY is not configured")
-    return OpenAI(api_key=api_key)
+    return get_pooled_openai_client(api_key)
 
 
 def _openai_vision_models() -> tuple[str, ...]:
@@ -113,7 +168,7 @@ def _openai_vision_models() -> tuple[str, ...]:
     return tuple(model for model in (primary_model, backup_model) if model)
 
 
-def _build_openai_messages(base64_image: str) -> list[dict[str, Any]]:
+def _build_openai_messages(base64_image: str, mime_type: str = "image/jpeg") -> list[dict[str, Any]]:
     return [
         {
             "role": "system",
@@ -129,7 +184,7 @@ def _build_openai_messages(base64_image: str) -> list[dict[str, Any]]:
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}",
+                        "url": f"data:{mime_type};base64,{base64_image}",
                     },
                 },
             ],
@@ -137,18 +192,44 @@ def _build_openai_messages(base64_image: str) -> list[dict[str, Any]]:
     ]
 
 
-def _invoke_openai_vision_model(client: OpenAI, model: str, base64_image: str):
+def _invoke_openai_vision_model(client: OpenAI, model: str, base64_image: str, mime_type: str = "image/jpeg"):
     return client.chat.completions.create(
         model=model,
-        messages=_build_openai_messages(base64_image),
+        messages=_build_openai_messages(base64_image, mime_type),
         response_format={"type": "json_object"},
         temperature=0,
         max_tokens=128,
     )
 
 
-def _ollama_base_url() -> str:
-    return _setting("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+def _stream_openai_vision_content(
+    client: OpenAI, model: str, base64_image: str, mime_type: str, cancel_event: threading.Event
+) -> str:
+    """
+    Streamed counterpart of ``_invoke_openai_vision_model`` that stops reading, and
+    closes the connection, as soon as ``cancel_event`` is set, so a losing hedge frees
+    its executor thread instead of running to completion.
+    """
+    if cancel_event.is_set():
+        raise OpenAICallCancelled(f"OpenAI call to {model} was cancelled before it started")
+    stream = client.chat.completions.create(
+        model=model,
+        messages=_build_openai_messages(base64_image, mime_type),
+        response_format={"type": "json_object"},
+        temperature=0,
+        max_tokens=128,
+        stream=True,
+    )
+    parts = []
+    try:
+        for chunk in stream:
+            if cancel_event.is_set():
+                raise OpenAICallCancelled(f"OpenAI call to {model} was cancelled")
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+    finally:
+        stream.close()
+    return "".join(parts)
 
 
 def _ollama_vision_models() -> tuple[str, ...]:
@@ -161,7 +242,9 @@ def _ollama_vision_models() -> tuple[str, ...]:
     return tuple(model for model in (primary_model, backup_model) if model)
 
 
-def _invoke_ollama_vision_model(model: str, base64_image: str) -> str:
+def _invoke_ollama_vision_model(
+    model: str, base64_image: str, cancel_event: Optional[threading.Event] = None
+) -> str:
     timeout = int(_setting("OLLAMA_TIMEOUT_SECONDS", LOCAL_VISION_TIMEOUT_SECONDS))
     payload = {
         "model": model,
@@ -178,21 +261,13 @@ def _invoke_ollama_vision_model(model: str, base64_image: str) -> str:
         ],
         "format": FOOD_RECOGNITION_SCHEMA,
         "think": False,
-        "stream": False,
         "options": {
             "temperature": 0,
             "num_predict": 128,
         },
     }
 
-    response = requests.post(
-        f"{_ollama_base_url()}/api/chat",
-        json=payload,
-        timeout=timeout,
-    )
-    response.raise_for_status()
-    response_data = response.json()
-    content = response_data.get("message", {}).get("content", "")
+    content = ollama_client.chat_json(payload, timeout=timeout, cancel_event=cancel_event)
     if not content:
         raise ValueError("Ollama returned an empty response")
     return content
@@ -219,13 +294,6 @@ def _build_local_vlm_prompt() -> str:
     )
 
 
-def _decode_base64_image(base64_image: str):
-    from PIL import Image
-
-    image_bytes = b64decode(base64_image, validate=False)
-    return Image.open(BytesIO(image_bytes)).convert("RGB")
-
-
 def _local_vlm_dtype(torch_module):
     dtype_name = str(_setting("LOCAL_VLM_TORCH_DTYPE", "bfloat16")).strip().lower()
     if dtype_name in {"bf16", "bfloat16"}:
@@ -237,6 +305,41 @@ def _local_vlm_dtype(torch_module):
     raise ValueError(f"Unsupported LOCAL_VLM_TORCH_DTYPE: {dtype_name}")
 
 
+def _import_local_vlm_dependencies():
+    try:
+        import torch
+        from peft import PeftModel
+        from transformers import AutoModelForImageTextToText, AutoProcessor
+    except ImportError as exc:
+        raise RuntimeError(
+            "Local VLM dependencies are missing. Install torch, transformers, peft, "
+            "accelerate, safetensors, sentencepiece, and protobuf."
+        ) from exc
+    return torch, PeftModel, AutoModelForImageTextToText, AutoProcessor
+
+
+def _load_peft_local_vlm(device_map: Optional[str] = None):
+    torch, PeftModel, AutoModelForImageTextToText, AutoProcessor = _import_local_vlm_dependencies()
+
+    adapter_dir = _local_vlm_adapter_dir()
+    if not os.path.exists(adapter_dir):
+        raise RuntimeError(f"LOCAL_VLM_ADAPTER_DIR does not exist: {adapter_dir}")
+
+    model_id = _local_vlm_model_id()
+    if device_map is None:
+        device_map = str(_setting("LOCAL_VLM_DEVICE_MAP", "auto")).strip()
+    model_kwargs = {"dtype": _local_vlm_dtype(torch)}
+    if device_map:
+        model_kwargs["device_map"] = device_map
+
+    logger.info("Loading local VLM base model %s with adapter %s", model_id, adapter_dir)
+    processor = AutoProcessor.from_pretrained(model_id)
+    base_model = AutoModelForImageTextToText.from_pretrained(model_id, **model_kwargs)
+    model = PeftModel.from_pretrained(base_model, adapter_dir)
+    model.eval()
+    return processor, model
+
+
 def _load_local_vlm():
     global _LOCAL_VLM_MODEL, _LOCAL_VLM_PROCESSOR
 
@@ -247,34 +350,15 @@ def _load_local_vlm():
         if _LOCAL_VLM_MODEL is not None and _LOCAL_VLM_PROCESSOR is not None:
             return _LOCAL_VLM_PROCESSOR, _LOCAL_VLM_MODEL
 
-        try:
-            import torch
-            from peft import PeftModel
-            from transformers import AutoModelForImageTextToText, AutoProcessor
-        except ImportError as exc:
-            raise RuntimeError(
-                "Local VLM dependencies are missing. Install torch, transformers, peft, "
-                "accelerate, safetensors, sentencepiece, and protobuf."
-            ) from exc
-
-        if _setting_bool("LOCAL_VLM_REQUIRE_CUDA", True) and not torch.cuda.is_available():
-            raise RuntimeError("LOCAL_VLM_REQUIRE_CUDA is true, but CUDA is not available.")
-
-        adapter_dir = _local_vlm_adapter_dir()
-        if not os.path.exists(adapter_dir):
-            raise RuntimeError(f"LOCAL_VLM_ADAPTER_DIR does not exist: {adapter_dir}")
-
-        model_id = _local_vlm_model_id()
-        device_map = str(_setting("LOCAL_VLM_DEVICE_MAP", "auto")).strip()
-        model_kwargs = {"dtype": _local_vlm_dtype(torch)}
-        if device_map:
-            model_kwargs["device_map"] = device_map
+        if _setting_bool("LOCAL_VLM_CPU_MODE", False):
+            from vision.local_vlm_cpu import load_cpu_local_vlm
 
-        logger.info("Loading local VLM base model %s with adapter %s", model_id, adapter_dir)
-        processor = AutoProcessor.from_pretrained(model_id)
-        base_model = AutoModelForImageTextToText.from_pretrained(model_id, **model_kwargs)
-        model = PeftModel.from_pretrained(base_model, adapter_dir)
-        model.eval()
+            processor, model = load_cpu_local_vlm()
+        else:
+            torch = _import_local_vlm_dependencies()[0]
+            if _setting_bool("LOCAL_VLM_REQUIRE_CUDA", True) and not torch.cuda.is_available():
+                raise RuntimeError("LOCAL_VLM_REQUIRE_CUDA is true, but CUDA is not available.")
+            processor, model = _load_peft_local_vlm()
 
         _LOCAL_VLM_PROCESSOR = processor
         _LOCAL_VLM_MODEL = model
@@ -288,43 +372,109 @@ def _model_input_device(model):
     return next(model.parameters()).device
 
 
-def _invoke_local_lora_vision_model(base64_image: str) -> str:
+def _generate_local_vlm_ids(processor, model, images: list[Any]):
+    """Run greedy generation for ``images`` and return only the newly generated token ids."""
     import torch
 
-    processor, model = _load_local_vlm()
-    image = _decode_base64_image(base64_image)
-    inputs = processor(text=[_build_local_vlm_prompt()], images=[image], return_tensors="pt")
+    tokenizer = processor.tokenizer
+    # Decoder-only generation needs left padding so every row continues from its own prompt.
+    tokenizer.padding_side = "left"
+    inputs = processor(
+        text=[_build_local_vlm_prompt()] * len(images),
+        images=[[image] for image in images],
+        padding=True,
+        return_tensors="pt",
+    )
     input_device = _model_input_device(model)
     inputs = {key: value.to(input_device) if hasattr(value, "to") else value for key, value in inputs.items()}
 
+    generate_kwargs = {}
+    if _setting_bool("LOCAL_VLM_CONSTRAINED_DECODING", True):
+        from transformers import LogitsProcessorList, StoppingCriteriaList
+
+        from vision.constrained_decoding import JsonCompleteStoppingCriteria, JsonSchemaLogitsProcessor
+
+        json_processor = JsonSchemaLogitsProcessor(
+            tokenizer,
+            LOCAL_VLM_RECOGNITION_SCHEMA,
+            eos_token_id=tokenizer.eos_token_id,
+            top_k=int(_setting("LOCAL_VLM_CONSTRAINED_TOP_K", 64)),
+        )
+        generate_kwargs["logits_processor"] = LogitsProcessorList([json_processor])
+        generate_kwargs["stopping_criteria"] = StoppingCriteriaList([JsonCompleteStoppingCriteria(json_processor)])
+
     with torch.inference_mode():
         output_ids = model.generate(
             **inputs,
             do_sample=False,
             max_new_tokens=_local_vlm_max_new_tokens(),
-            eos_token_id=processor.tokenizer.eos_token_id,
-            pad_token_id=processor.tokenizer.pad_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.pad_token_id,
+            **generate_kwargs,
         )
 
-    generated_ids = output_ids[0, inputs["input_ids"].shape[1] :]
-    return processor.tokenizer.decode(generated_ids, skip_special_tokens=True).strip()
+    return output_ids[:, inputs["input_ids"].shape[1] :]
+
 
+def _decode_local_vlm_ids(processor, generated_ids) -> list[str]:
+    return [text.strip() for text in processor.tokenizer.batch_decode(generated_ids, skip_special_tokens=True)]
 
-def _local_lora_food_name(raw_result: str) -> str:
-    preprocessed = preprocess_api_response(raw_result)
-    parsed = json.loads(preprocessed)
+
+def _generate_local_vlm_batch(images: list[Any]) -> list[str]:
+    processor, model = _load_local_vlm()
+    return _decode_local_vlm_ids(processor, _generate_local_vlm_ids(processor, model, images))
+
+
+def get_local_vlm_scheduler() -> MicroBatchScheduler:
+    global _LOCAL_VLM_SCHEDULER
+
+    if _LOCAL_VLM_SCHEDULER is None:
+        with _LOCAL_VLM_SCHEDULER_LOCK:
+            if _LOCAL_VLM_SCHEDULER is None:
+                _LOCAL_VLM_SCHEDULER = MicroBatchScheduler(
+                    _generate_local_vlm_batch,
+                    max_batch_size=int(_setting("LOCAL_VLM_BATCH_MAX_SIZE", DEFAULT_LOCAL_VLM_BATCH_MAX_SIZE)),
+                    max_wait_ms=float(_setting("LOCAL_VLM_BATCH_MAX_WAIT_MS", DEFAULT_LOCAL_VLM_BATCH_MAX_WAIT_MS)),
+                    name="local_vlm",
+                )
+    return _LOCAL_VLM_SCHEDULER
+
+
+def peek_local_vlm_scheduler() -> Optional[MicroBatchScheduler]:
+    """The scheduler if this process has started one; never creates it (or its thread)."""
+    return _LOCAL_VLM_SCHEDULER
+
+
+def _invoke_local_lora_vision_model(image) -> str:
+    if _setting("LOCAL_VLM_SERVER_SOCKET"):
+        from vision.local_vlm_server import get_local_vlm_client
+
+        return get_local_vlm_client().generate(image)
+    if not _setting_bool("LOCAL_VLM_BATCHING", True):
+        return _generate_local_vlm_batch([image])[0]
+    return get_local_vlm_scheduler().submit(image)
+
+
+def _local_lora_recognition(raw_result: str) -> Tuple[str, Optional[float]]:
+    """Return the best detected food name and its self-reported confidence."""
+    try:
+        # Constrained decoding already yields bare JSON; only free-form output needs digging out.
+        parsed = json.loads(raw_result)
+    except json.JSONDecodeError:
+        parsed = json.loads(preprocess_api_response(raw_result))
     if not isinstance(parsed, dict):
         raise ValueError("Local VLM response is not a JSON object")
 
     if parsed.get("is_food") is False:
-        return "Unknown"
+        return "Unknown", None
 
+    confidence_score: Optional[float] = None
     if isinstance(parsed.get("food_name"), str):
         food_name = parsed["food_name"].strip()
     else:
         detected_items = parsed.get("detected_items") or []
         if not isinstance(detected_items, list) or not detected_items:
-            return "Unknown"
+            return "Unknown", None
 
         def confidence(item: Any) -> float:
             if not isinstance(item, dict):
@@ -336,11 +486,12 @@ def _local_lora_food_name(raw_result: str) -> str:
 
         best_item = max((item for item in detected_items if isinstance(item, dict)), key=confidence, default={})
         food_name = str(best_item.get("food_name", "")).strip()
+        confidence_score = confidence(best_item) if "confidence" in best_item else None
 
     normalized = food_name.lower().replace("-", " ").strip()
-    if normalized in UNKNOWN_LOCAL_VLM_NAMES:
-        return "Unknown"
-    return food_name or "Unknown"
+    if normalized in UNKNOWN_LOCAL_VLM_NAMES or not food_name:
+        return "Unknown", None
+    return food_name, confidence_score
 
 
 def preprocess_api_response(response: str) -> str:
@@ -386,17 +537,38 @@ def preprocess_api_response(response: str) -> str:
     return response
 
 
-def _save_food_recognition(data: dict, user_id: int) -> dict:
-    getattr(FoodRecognitionLog, "objects").create(
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000.0
+
+
+def _save_food_recognition(
+    data: dict,
+    user_id: int,
+    *,
+    image_hash: str = "",
+    provider: str = "",
+    model_name: str = "",
+    latency_ms: Optional[float] = None,
+    confidence: Optional[float] = None,
+) -> dict:
+    # Buffered and bulk-inserted off the request path.
+    recognition_log_writer.record(
         user_id=user_id,
-        image_url="[Base64 image data not stored]",
         recognized_food=data["food_name"],
-        confidence_score=0.8,
+        confidence_score=confidence,
+        image_hash=image_hash,
+        provider=provider,
+        model_name=model_name[:200],
+        latency_ms=latency_ms,
     )
     return data
 
 
-def _parse_and_log_food_response(raw_result: str, user_id: int, provider_name: str) -> dict:
+def log_food_recognition(food_name: str, user_id: int, **fields: Any) -> dict:
+    return _save_food_recognition({"food_name": food_name}, user_id, **fields)
+
+
+def _parse_food_response(raw_result: str, provider_name: str) -> dict:
     result = raw_result.strip()
     logger.debug("Raw %s vision response: %s", provider_name, result)
 
@@ -434,82 +606,135 @@ def _parse_and_log_food_response(raw_result: str, user_id: int, provider_name: s
         )
         return {"error": "Unexpected API response format: missing 'food_name' field"}
 
-    return _save_food_recognition(data, user_id)
+    return data
+
+
+def _is_food_response(data: Any) -> bool:
+    return isinstance(data, dict) and "error" not in data
 
 
-def _recognize_with_openai(base64_image: str, user_id: int) -> dict:
+def _recognize_with_openai(image: PreparedImage, user_id: int) -> dict:
     client = get_openai_client()
-    response: Optional[Any] = None
-    last_error: Optional[Exception] = None
+    base64_image = image.base64_for("openai")
+    mime_type = image.mime_type_for("openai")
 
-    for model in _openai_vision_models():
-        try:
-            logger.debug("Invoking OpenAI vision model %s for user %s", model, user_id)
-            candidate = _invoke_openai_vision_model(client, model, base64_image)
-            if candidate and candidate.choices and candidate.choices[0].message.content:
-                response = candidate
-                break
+    def invoke(model: str, cancel_event: threading.Event) -> dict:
+        logger.debug("Invoking OpenAI vision model %s for user %s", model, user_id)
+        content = _stream_openai_vision_content(client, model, base64_image, mime_type, cancel_event)
+        if not content:
             logger.warning("OpenAI vision model %s returned empty choices for user %s", model, user_id)
-        except OpenAIError as vision_error:
-            last_error = vision_error
-            logger.warning("OpenAI vision model %s failed with error: %s", model, str(vision_error))
-            continue
-
-    if response is None or not response.choices or not response.choices[0].message.content:
-        if last_error:
-            logger.error("OpenAI vision pipeline failed after trying all models: %s", str(last_error))
-            return {"error": "OpenAI API error", "details": str(last_error)}
+            return {"error": "Empty response from API"}
+        return _parse_food_response(content, "OpenAI")
+
+    started = time.perf_counter()
+    try:
+        model, data = hedged_call("openai_vision", _openai_vision_models(), invoke, _is_food_response)
+    except HedgeExhausted as exhausted:
+        if isinstance(exhausted.last_value, dict):
+            logger.error("OpenAI vision pipeline failed after trying all models: %s", exhausted.last_value)
+            return exhausted.last_value
+        if exhausted.last_error:
+            logger.error("OpenAI vision pipeline failed after trying all models: %s", str(exhausted.last_error))
+            return {"error": "OpenAI API error", "details": str(exhausted.last_error)}
         logger.error("OpenAI API returned empty response")
         return {"error": "Empty response from API"}
 
-    return _parse_and_log_food_response(
-        raw_result=response.choices[0].message.content,
-        user_id=user_id,
-        provider_name="OpenAI",
+    return _save_food_recognition(
+        data,
+        user_id,
+        image_hash=image.content_hash,
+        provider="openai",
+        model_name=model,
+        latency_ms=_elapsed_ms(started),
     )
 
 
-def _recognize_with_ollama(base64_image: str, user_id: int) -> dict:
-    last_error: Optional[Exception] = None
+def _recognize_with_ollama(image: PreparedImage, user_id: int) -> dict:
+    base64_image = image.base64_for("ollama")
 
-    for model in _ollama_vision_models():
-        try:
-            logger.debug("Invoking Ollama vision model %s for user %s", model, user_id)
-            return _parse_and_log_food_response(
-                raw_result=_invoke_ollama_vision_model(model, base64_image),
-                user_id=user_id,
-                provider_name="Ollama",
-            )
-        except (requests.RequestException, ValueError, json.JSONDecodeError) as vision_error:
-            last_error = vision_error
-            logger.warning("Ollama vision model %s failed with error: %s", model, str(vision_error))
-            continue
-
-    if last_error:
-        logger.error("Ollama vision pipeline failed after trying all models: %s", str(last_error))
-        return {"error": "Ollama API error", "details": str(last_error)}
-    return {"error": "No Ollama vision model configured"}
-
-
-def _recognize_with_local_lora(base64_image: str, user_id: int) -> dict:
+    def invoke(model: str, cancel_event: threading.Event) -> dict:
+        logger.debug("Invoking Ollama vision model %s for user %s", model, user_id)
+        return _parse_food_response(_invoke_ollama_vision_model(model, base64_image, cancel_event), "Ollama")
+
+    started = time.perf_counter()
+    try:
+        model, data = hedged_call("ollama_vision", _ollama_vision_models(), invoke, _is_food_response)
+    except HedgeExhausted as exhausted:
+        if isinstance(exhausted.last_value, dict):
+            logger.error("Ollama vision pipeline failed after trying all models: %s", exhausted.last_value)
+            return exhausted.last_value
+        if exhausted.last_error:
+            logger.error("Ollama vision pipeline failed after trying all models: %s", str(exhausted.last_error))
+            return {"error": "Ollama API error", "details": str(exhausted.last_error)}
+        return {"error": "No Ollama vision model configured"}
+
+    return _save_food_recognition(
+        data,
+        user_id,
+        image_hash=image.content_hash,
+        provider="ollama",
+        model_name=model,
+        latency_ms=_elapsed_ms(started),
+    )
+
+
+def _recognize_with_local_lora(image: PreparedImage, user_id: int) -> dict:
+    started = time.perf_counter()
     try:
-        raw_result = _invoke_local_lora_vision_model(base64_image)
+        raw_result = _invoke_local_lora_vision_model(image.image_for("lora"))
         logger.debug("Raw local LoRA vision response: %s", raw_result)
-        food_name = _local_lora_food_name(raw_result)
-        return _save_food_recognition({"food_name": food_name}, user_id)
+        food_name, confidence = _local_lora_recognition(raw_result)
+        return _save_food_recognition(
+            {"food_name": food_name},
+            user_id,
+            image_hash=image.content_hash,
+            provider="lora",
+            model_name=_local_vlm_label(),
+            latency_ms=_elapsed_ms(started),
+            confidence=confidence,
+        )
     except (RuntimeError, ValueError, json.JSONDecodeError) as vision_error:
         logger.error("Local LoRA vision pipeline failed: %s", str(vision_error), exc_info=True)
         return {"error": "Local LoRA vision error", "details": str(vision_error)}
 
 
-def process_food_image(base64_image: str, user_id: int) -> dict:
+VISION_RECOGNIZERS = {
+    "openai": _recognize_with_openai,
+    "ollama": _recognize_with_ollama,
+    "lora": _recognize_with_local_lora,
+}
+
+
+def _local_vlm_label() -> str:
+    return f"{_local_vlm_model_id()}+{os.path.basename(_local_vlm_adapter_dir())}"
+
+
+def _vision_provider_labels() -> dict[str, str]:
+    return {
+        "openai": ",".join(_openai_vision_models()),
+        "ollama": ",".join(_ollama_vision_models()),
+        "lora": _local_vlm_label(),
+    }
+
+
+def process_food_image(image: Union[PreparedImage, str, bytes], user_id: int) -> dict:
     try:
-        provider = _vision_provider()
-        if provider in {"lora", "local_lora", "peft", "gemma_lora"}:
-            return _recognize_with_local_lora(base64_image, user_id)
-        if provider in {"ollama", "local"}:
-            return _recognize_with_ollama(base64_image, user_id)
-        return _recognize_with_openai(base64_image, user_id)
+        if not isinstance(image, PreparedImage):
+            image = prepare_image(image)
+        return provider_router.call(
+            "vision",
+            _vision_providers(),
+            lambda provider: VISION_RECOGNIZERS[provider](image, user_id),
+            is_failure=lambda result: not _is_food_response(result),
+            labels=_vision_provider_labels(),
+        )
+    except ProvidersExhausted as e:
+        # Every provider answered with an error payload; the last one carries the details.
+        logger.error("Every vision provider failed: %s", e.last_result)
+        return e.last_result
+    except ProvidersUnavailable as e:
+        logger.error("No vision provider available: %s", str(e))
+        return {"error": "Vision providers unavailable", "details": str(e)}
     except OpenAIError as e:
         logger.error("OpenAI API error: %s", str(e), exc_info=True)
         return {"error": "OpenAI API error", "details": str(e)}
@@ -0,0 +1,143 @@
+"""
+Keying for the two-layer guidance cache.
+
+The base layer holds style-neutral guidance per food and pregnancy stage (the
+``PregnancyStage`` week ranges, not the raw week). The style layer holds the
+base answer rewritten in a user's speaking style, keyed by the base answer
+itself, so it is only re-rendered when the base changes. ``simulate`` replays
+recognition history against this scheme and the old per-week, per-style key.
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from vision.models import PregnancyStage
+
+NEUTRAL_STYLE = "표준어"
+GENERIC_STAGE_TAG = "generic"
+STAGES_CACHE_KEY = "guidance:pregnancy_stages"
+STAGES_CACHE_SECONDS = 3600
+# Used when no PregnancyStage rows are configured.
+DEFAULT_STAGES = (("1st trimester", 1, 13), ("2nd trimester", 14, 27), ("3rd trimester", 28, 42))
+
+Stage = Tuple[str, int, int]
+
+
+def pregnancy_stages() -> List[Stage]:
+    stages = cache.get(STAGES_CACHE_KEY)
+    if stages is None:
+        stages = list(
+            PregnancyStage.objects.order_by("week_start").values_list("name", "week_start", "week_end")
+        ) or list(DEFAULT_STAGES)
+        cache.set(STAGES_CACHE_KEY, stages, STAGES_CACHE_SECONDS)
+    return stages
+
+
+def stage_for_week(week: int, stages: List[Stage]) -> Stage:
+    for stage in stages:
+        if stage[1] <= week <= stage[2]:
+            return stage
+    # Outside every configured range: clamp to the first or last stage.
+    return stages[0] if week < stages[0][1] else stages[-1]
+
+
+def stage_context(week: Optional[int], stages: Optional[List[Stage]] = None) -> Dict[str, str]:
+    if not week:
+        return {"week_context": "pregnant user", "cache_tag": GENERIC_STAGE_TAG}
+    name, week_start, week_end = stage_for_week(week, stages or pregnancy_stages())
+    return {
+        "week_context": f"pregnant user in {name} (weeks {week_start}-{week_end})",
+        "cache_tag": f"stage:{week_start}-{week_end}",
+    }
+
+
+def week_at(due_date: datetime.date, day: datetime.date) -> int:
+    """Same arithmetic as ``UserPregnancyProfile.current_week``, evaluated on ``day``."""
+    return max(40 - (due_date - day).days // 7, 1)
+
+
+class TTLCacheSimulator:
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._expires: Dict[Any, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def access(self, key: Any, now: float) -> bool:
+        if self._expires.get(key, 0.0) > now:
+            self.hits += 1
+            return True
+        self.misses += 1
+        self._expires[key] = now + self.ttl_seconds
+        return False
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class SimulationResult:
+    requests: int
+    legacy_hit_rate: float
+    legacy_generations: int
+    legacy_keys: int
+    layered_hit_rate: float
+    base_hit_rate: float
+    layered_generations: int
+    style_renders: int
+    base_keys: int
+    styled_keys: int
+
+
+def simulate(
+    events: Iterable[Tuple[datetime.datetime, str, str, Optional[int]]],
+    *,
+    legacy_ttl: float,
+    base_ttl: float,
+    style_ttl: float,
+    stages: List[Stage],
+) -> SimulationResult:
+    """
+    Replay ``(timestamp, food, style, week)`` events in time order.
+
+    Legacy: one key per (food, week, style), a miss is a full RAG generation.
+    Layered: a style-layer hit answers directly; on a miss the base layer is
+    consulted (a base miss is a generation) and non-neutral styles pay a render.
+    """
+    legacy = TTLCacheSimulator(legacy_ttl)
+    base = TTLCacheSimulator(base_ttl)
+    styled = TTLCacheSimulator(style_ttl)
+    requests = layered_hits = style_renders = 0
+
+    for timestamp, food, style, week in events:
+        now = timestamp.timestamp()
+        food = " ".join(food.split()).lower()
+        requests += 1
+        legacy.access((food, f"week:{week}" if week else GENERIC_STAGE_TAG, style), now)
+
+        stage_tag = stage_context(week, stages)["cache_tag"]
+        if style == NEUTRAL_STYLE:
+            layered_hits += base.access((food, stage_tag), now)
+            continue
+        if styled.access((food, stage_tag, style), now):
+            layered_hits += 1
+            continue
+        base.access((food, stage_tag), now)
+        style_renders += 1
+
+    return SimulationResult(
+        requests=requests,
+        legacy_hit_rate=legacy.hit_rate,
+        legacy_generations=legacy.misses,
+        legacy_keys=len(legacy._expires),
+        layered_hit_rate=layered_hits / requests if requests else 0.0,
+        base_hit_rate=base.hit_rate,
+        layered_generations=base.misses,
+        style_renders=style_renders,
+        base_keys=len(base._expires),
+        styled_keys=len(styled._expires),
+    )
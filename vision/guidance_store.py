@@ -0,0 +1,91 @@
+"""
+Durable store for generated guidance (``GuidanceEntry``).
+
+Sits behind the Django cache: a cache miss reads the table before paying for an
+LLM call, and every generation is written through. Entries are keyed by the
+vector index name and version, so a re-synced index never serves answers built
+from the old evidence; ``purge_stale`` deletes them. ``generator`` records the
+backend that actually answered (after any router failover); lookups accept any
+of the configured generators, in priority order.
+"""
+import hashlib
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Max
+
+from vision.guidance_cache import NEUTRAL_STYLE
+from vision.metrics import registry
+from vision.models import GuidanceEntry
+
+logger = logging.getLogger(__name__)
+
+GUIDANCE_FIELDS = ("safety_summary", "is_safe", "nutritional_advice")
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def guidance_store_enabled() -> bool:
+    value = str(_setting("GUIDANCE_STORE_ENABLED", "true")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+def style_key(dialect_style: Optional[str]) -> str:
+    """``NEUTRAL_STYLE`` for the base layer, otherwise a hash of the (possibly long) style prompt."""
+    if dialect_style is None:
+        return NEUTRAL_STYLE
+    return hashlib.sha256(dialect_style.encode("utf-8")).hexdigest()
+
+
+def load_guidance(key: Dict[str, Any], generators: List[str]) -> Optional[Dict[str, Any]]:
+    if not guidance_store_enabled():
+        return None
+    try:
+        rows = {
+            row.pop("generator"): row
+            for row in GuidanceEntry.objects.filter(**key, generator__in=generators).values("generator", *GUIDANCE_FIELDS)
+        }
+    except Exception as exc:  # pylint: disable=broad-except
+        # The store is an optimization; a database hiccup falls back to generating.
+        logger.warning("Guidance store lookup failed: %s", str(exc))
+        return None
+    row = next((rows[generator] for generator in generators if generator in rows), None)
+    registry.counter("guidance_store.hits" if row else "guidance_store.misses").inc()
+    return row
+
+
+def save_guidance(key: Dict[str, Any], generator: str, guidance: Dict[str, Any]) -> None:
+    if not guidance_store_enabled():
+        return
+    try:
+        GuidanceEntry.objects.update_or_create(
+            **key, generator=generator, defaults={field: guidance[field] for field in GUIDANCE_FIELDS}
+        )
+        registry.counter("guidance_store.writes").inc()
+    except IntegrityError:
+        # Another worker wrote the same entry first.
+        pass
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("Guidance store write failed: %s", str(exc))
+
+
+def latest_version(index_name: str) -> int:
+    """Highest index version any entry was built on; a rebuilt index must start above it."""
+    try:
+        latest = GuidanceEntry.objects.filter(index_name=index_name).aggregate(Max("index_version"))
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("Guidance store version lookup failed: %s", str(exc))
+        return 0
+    return latest["index_version__max"] or 0
+
+
+def purge_stale(index_name: str, index_version: int) -> int:
+    deleted, _ = GuidanceEntry.objects.filter(index_name=index_name).exclude(index_version=index_version).delete()
+    if deleted:
+        logger.info("Deleted %s guidance entries built on older versions of %s", deleted, index_name)
+    return deleted
@@ -0,0 +1,178 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from vision.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_DELAY_MS = 5000
+DEFAULT_HEDGE_MIN_DELAY_MS = 250
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+DEFAULT_HEDGE_MAX_WORKERS = 16
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_PID: Optional[int] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+class HedgeExhausted(Exception):
+    """Every model failed or returned an unacceptable result."""
+
+    def __init__(self, last_error: Optional[BaseException], last_value: Any = None) -> None:
+        super().__init__(str(last_error) if last_error else "No model returned an acceptable result")
+        self.last_error = last_error
+        self.last_value = last_value
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def _hedging_enabled() -> bool:
+    value = str(_setting("VISION_HEDGING", "true")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR, _EXECUTOR_PID
+
+    if _EXECUTOR is not None and _EXECUTOR_PID == os.getpid():
+        return _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None or _EXECUTOR_PID != os.getpid():
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=int(_setting("VISION_HEDGE_MAX_WORKERS", DEFAULT_HEDGE_MAX_WORKERS)),
+                thread_name_prefix="vision-hedge",
+            )
+            _EXECUTOR_PID = os.getpid()
+        return _EXECUTOR
+
+
+def _latency_histogram(name: str, model: str):
+    return registry.histogram(f"{name}.latency_ms.{model}")
+
+
+def hedge_delay_seconds(name: str, model: str) -> float:
+    """
+    How long to wait on ``model`` before firing a backup: its observed latency at
+    ``VISION_HEDGE_PERCENTILE``, or ``VISION_HEDGE_DELAY_MS`` until enough samples exist.
+    """
+    histogram = _latency_histogram(name, model)
+    min_delay_ms = float(_setting("VISION_HEDGE_MIN_DELAY_MS", DEFAULT_HEDGE_MIN_DELAY_MS))
+    if histogram.count < int(_setting("VISION_HEDGE_MIN_SAMPLES", DEFAULT_HEDGE_MIN_SAMPLES)):
+        delay_ms = float(_setting("VISION_HEDGE_DELAY_MS", DEFAULT_HEDGE_DELAY_MS))
+    else:
+        delay_ms = histogram.percentile(float(_setting("VISION_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE)))
+    return max(min_delay_ms, delay_ms or 0.0) / 1000.0
+
+
+def hedged_call(
+    name: str,
+    models: Sequence[str],
+    invoke: Callable[[str, threading.Event], Any],
+    accept: Callable[[Any], bool],
+) -> Tuple[str, Any]:
+    """
+    Call ``models`` in priority order, hedging slow attempts with the next model.
+
+    A model that fails moves on to the next one immediately, as before. A model that
+    is still running after its hedge delay gets the next model fired alongside it,
+    and the first acceptable result wins. Losers have their cancel event set so
+    cooperative invokers can stop reading, and their futures are discarded; the time
+    a loser had already run is recorded as a lower bound of its latency.
+    """
+    if not models:
+        raise HedgeExhausted(None)
+
+    hedging = _hedging_enabled() and len(models) > 1
+    pending: Dict[Future, Tuple[int, str, threading.Event, float]] = {}
+    next_index = 0
+    last_error: Optional[BaseException] = None
+    last_value: Any = None
+    hedged = False
+
+    def launch() -> None:
+        nonlocal next_index
+        model = models[next_index]
+        cancel_event = threading.Event()
+        future = _executor().submit(invoke, model, cancel_event)
+        pending[future] = (next_index, model, cancel_event, time.monotonic())
+        next_index += 1
+
+    def cancel_pending() -> None:
+        for future, (_, model, cancel_event, started) in pending.items():
+            if not future.done():
+                # Censored sample: the call would have taken at least this long. Dropping it
+                # would leave only the fast calls in the window and pull the percentile down.
+                _latency_histogram(name, model).observe((time.monotonic() - started) * 1000.0)
+                registry.counter(f"{name}.latency_censored.{model}").inc()
+            cancel_event.set()
+            future.cancel()
+            logger.debug("%s: cancelled hedged call to %s", name, model)
+
+    registry.counter(f"{name}.hedge.requests").inc()
+    launch()
+    try:
+        while pending:
+            timeout = None
+            if hedging and next_index < len(models):
+                newest_started = max(started for _, _, _, started in pending.values())
+                newest_model = models[next_index - 1]
+                timeout = max(0.0, newest_started + hedge_delay_seconds(name, newest_model) - time.monotonic())
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.info("%s: %s exceeded hedge delay, firing %s", name, models[next_index - 1], models[next_index])
+                registry.counter(f"{name}.hedge.fired").inc()
+                hedged = True
+                launch()
+                continue
+
+            for future in done:
+                index, model, _, started = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    last_error = exc
+                    logger.warning("%s model %s failed with error: %s", name, model, str(exc))
+                    continue
+
+                _latency_histogram(name, model).observe((time.monotonic() - started) * 1000.0)
+                if not accept(value):
+                    last_value = value
+                    logger.warning("%s model %s returned an unusable result", name, model)
+                    continue
+
+                if hedged:
+                    winner = "backup" if index > 0 else "primary"
+                    registry.counter(f"{name}.hedge.won_by_{winner}").inc()
+                return model, value
+
+            if not pending and next_index < len(models):
+                launch()
+    finally:
+        cancel_pending()
+
+    raise HedgeExhausted(last_error, last_value)
+
+
+def hedge_stats(name: str) -> Dict[str, Any]:
+    requests_total = registry.counter(f"{name}.hedge.requests").value
+    fired = registry.counter(f"{name}.hedge.fired").value
+    backup_wins = registry.counter(f"{name}.hedge.won_by_backup").value
+    primary_wins = registry.counter(f"{name}.hedge.won_by_primary").value
+    decided = backup_wins + primary_wins
+    return {
+        "requests": requests_total,
+        "hedges_fired": fired,
+        "hedge_rate": fired / requests_total if requests_total else 0.0,
+        "backup_wins": backup_wins,
+        "backup_win_rate": backup_wins / decided if decided else 0.0,
+    }
@@ -0,0 +1,155 @@
+import logging
+import os
+from functools import lru_cache, reduce
+from operator import or_
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from vision.image_preprocessing import PreparedImage
+from vision.metrics import registry
+from vision.models import ImageFingerprint
+
+logger = logging.getLogger(__name__)
+
+DHASH_SIZE = 8
+BAND_BITS = 16
+BAND_COUNT = 64 // BAND_BITS
+# Pigeonhole: hashes within BAND_COUNT - 1 bits differ in at most that many bands, so one band matches.
+MAX_FULL_RECALL_DISTANCE = BAND_COUNT - 1
+DEFAULT_MAX_HAMMING_DISTANCE = 3
+FLAT_IMAGE_HASHES = {0, (1 << 64) - 1}
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def _fingerprint_enabled() -> bool:
+    value = str(_setting("VISION_FINGERPRINT_CACHE", "true")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+@lru_cache(maxsize=None)
+def _clamp_distance(configured: int) -> int:
+    # Cached per configured value, so the warning is logged once rather than per lookup.
+    if configured <= MAX_FULL_RECALL_DISTANCE:
+        return configured
+    logger.warning(
+        "VISION_FINGERPRINT_MAX_DISTANCE=%s exceeds %s, the largest distance the %s-bit band lookup "
+        "finds every match for; using %s.",
+        configured, MAX_FULL_RECALL_DISTANCE, BAND_BITS, MAX_FULL_RECALL_DISTANCE,
+    )
+    return MAX_FULL_RECALL_DISTANCE
+
+
+def _max_hamming_distance() -> int:
+    return _clamp_distance(int(_setting("VISION_FINGERPRINT_MAX_DISTANCE", DEFAULT_MAX_HAMMING_DISTANCE)))
+
+
+def compute_dhash(image) -> int:
+    """
+    64-bit difference hash over a 9x8 grayscale thumbnail of an oriented image.
+
+    Each bit records whether a pixel is brighter than its right neighbour, so the
+    hash survives re-encoding, resizing and mild colour shifts.
+    """
+    from PIL import Image
+
+    thumbnail = image.convert("L").resize(
+        (DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS
+    )
+    pixels = list(thumbnail.getdata())
+    value = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            value = (value << 1) | int(pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(left: int, right: int) -> int:
+    return bin(left ^ right).count("1")
+
+
+def hash_bands(value: int) -> tuple[int, ...]:
+    mask = (1 << BAND_BITS) - 1
+    return tuple((value >> (BAND_BITS * index)) & mask for index in range(BAND_COUNT))
+
+
+def _image_dhash(image: PreparedImage) -> Optional[int]:
+    # Hashing a small memoized rendition keeps the 9x8 thumbnail resize cheap.
+    value = compute_dhash(image.resized(256))
+    # Blank or single-colour frames collapse to the same hash and would match each other.
+    if value in FLAT_IMAGE_HASHES:
+        return None
+    return value
+
+
+def find_near_duplicate(dhash: int) -> Optional[ImageFingerprint]:
+    """
+    Return the closest stored fingerprint within the configured Hamming distance.
+
+    Candidates are narrowed with 16-bit bands: two hashes within distance 3 always
+    share at least one identical band, so thresholds up to 3 have full recall and
+    larger configured thresholds are clamped to 3.
+    """
+    max_distance = _max_hamming_distance()
+    bands = hash_bands(dhash)
+    band_filter = reduce(or_, (Q(**{f"band_{index}": band}) for index, band in enumerate(bands)))
+
+    best: Optional[ImageFingerprint] = None
+    best_distance = max_distance + 1
+    for candidate in ImageFingerprint.objects.filter(band_filter).only("id", "dhash", "food_name"):
+        distance = hamming_distance(dhash, int(candidate.dhash, 16))
+        if distance < best_distance:
+            best, best_distance = candidate, distance
+            if distance == 0:
+                break
+    return best
+
+
+def lookup_food_by_fingerprint(image: PreparedImage) -> Optional[str]:
+    if not _fingerprint_enabled():
+        return None
+
+    dhash = _image_dhash(image)
+    if dhash is None:
+        return None
+
+    match = find_near_duplicate(dhash)
+    if match is None:
+        registry.counter("vision.fingerprint.misses").inc()
+        return None
+
+    registry.counter("vision.fingerprint.hits").inc()
+    ImageFingerprint.objects.filter(pk=match.pk).update(
+        hit_count=F("hit_count") + 1, last_seen_at=timezone.now()
+    )
+    logger.debug("Fingerprint %016x matched stored %s (%s)", dhash, match.dhash, match.food_name)
+    return match.food_name
+
+
+def remember_food_fingerprint(image: PreparedImage, food_name: str) -> None:
+    if not _fingerprint_enabled() or not food_name or food_name == "Unknown":
+        return
+
+    dhash = _image_dhash(image)
+    if dhash is None:
+        return
+
+    bands = hash_bands(dhash)
+    try:
+        ImageFingerprint.objects.get_or_create(
+            dhash=f"{dhash:016x}",
+            defaults={
+                "food_name": food_name,
+                **{f"band_{index}": band for index, band in enumerate(bands)},
+            },
+        )
+    except IntegrityError:
+        # Another worker stored the same hash concurrently.
+        pass
@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import os
+import threading
+from base64 import b64decode, b64encode
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple, Union
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIDE = {
+    "openai": 1024,
+    "ollama": 896,
+    "lora": 896,
+}
+DEFAULT_IMAGE_FORMAT = "jpeg"
+DEFAULT_IMAGE_QUALITY = 85
+
+MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def _normalization_enabled() -> bool:
+    value = str(_setting("VISION_IMAGE_NORMALIZATION", "true")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+def _provider_key(provider: str) -> str:
+    provider = provider.strip().lower()
+    if provider in {"lora", "local_lora", "peft", "gemma_lora"}:
+        return "lora"
+    if provider in {"ollama", "local"}:
+        return "ollama"
+    return "openai"
+
+
+def max_side_for(provider: str) -> int:
+    key = _provider_key(provider)
+    return int(_setting(f"VISION_IMAGE_MAX_SIDE_{key.upper()}", DEFAULT_MAX_SIDE[key]))
+
+
+def _image_format() -> str:
+    value = str(_setting("VISION_IMAGE_FORMAT", DEFAULT_IMAGE_FORMAT)).strip().lower()
+    if value in {"jpg", "jpeg"}:
+        return "jpeg"
+    if value == "webp":
+        return "webp"
+    raise ValueError(f"Unsupported VISION_IMAGE_FORMAT: {value}")
+
+
+def _image_quality() -> int:
+    return int(_setting("VISION_IMAGE_QUALITY", DEFAULT_IMAGE_QUALITY))
+
+
+def strip_data_url_prefix(base64_image: str) -> str:
+    if "base64," in base64_image:
+        base64_image = base64_image.split("base64,", 1)[1]
+    return base64_image.strip()
+
+
+class ImageUpload:
+    """
+    Raw image bytes as received from a request, with their sha256 computed while
+    they were read. ``source_base64`` is kept when the client sent base64.
+    """
+
+    __slots__ = ("data", "content_hash", "source_base64")
+
+    def __init__(self, data: bytes, content_hash: str, source_base64: Optional[str] = None) -> None:
+        self.data = data
+        self.content_hash = content_hash
+        self.source_base64 = source_base64
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @classmethod
+    def from_base64(cls, value: str) -> "ImageUpload":
+        source_base64 = strip_data_url_prefix(value)
+        try:
+            data = b64decode(source_base64, validate=False)
+        except ValueError as exc:
+            raise ValueError("Image payload is not valid base64") from exc
+        return cls(data, hashlib.sha256(data).hexdigest(), source_base64=source_base64)
+
+
+class PreparedImage:
+    """
+    An uploaded image decoded once and shared by every vision provider.
+
+    The decoded frame is EXIF-oriented RGB. Provider-specific renditions are
+    downscaled to ``VISION_IMAGE_MAX_SIDE_<PROVIDER>`` and re-encoded lazily,
+    then memoized so hedged or fallback calls reuse the same payload.
+    """
+
+    def __init__(
+        self,
+        image,
+        *,
+        source_bytes: int,
+        content_hash: str,
+        source_base64: Optional[str] = None,
+        source_data: Optional[bytes] = None,
+        source_mime: Optional[str] = None,
+    ) -> None:
+        self.image = image
+        self.source_bytes = source_bytes
+        self.content_hash = content_hash
+        self._source_base64 = source_base64
+        self._source_data = source_data
+        self._source_mime = source_mime
+        self._lock = threading.Lock()
+        self._resized: Dict[int, Any] = {}
+        self._encoded: Dict[Tuple[int, str, int], str] = {}
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.size
+
+    def resized(self, max_side: int):
+        from PIL import Image
+
+        width, height = self.image.size
+        if max_side <= 0 or max(width, height) <= max_side:
+            return self.image
+
+        with self._lock:
+            cached = self._resized.get(max_side)
+            if cached is not None:
+                return cached
+            scale = max_side / float(max(width, height))
+            target = (max(1, round(width * scale)), max(1, round(height * scale)))
+            resized = self.image.resize(target, Image.Resampling.LANCZOS)
+            self._resized[max_side] = resized
+            return resized
+
+    def image_for(self, provider: str):
+        if not _normalization_enabled():
+            return self.image
+        return self.resized(max_side_for(provider))
+
+    def mime_type_for(self, provider: str) -> str:
+        if not _normalization_enabled():
+            return self._source_mime or "image/jpeg"
+        return MIME_TYPES[_image_format()]
+
+    def base64_for(self, provider: str) -> str:
+        if not _normalization_enabled():
+            if self._source_base64 is None and self._source_data is not None:
+                # Binary uploads are encoded once, only for providers that need base64.
+                self._source_base64 = b64encode(self._source_data).decode("ascii")
+            if self._source_base64 is not None:
+                return self._source_base64
+
+        max_side = max_side_for(provider) if _normalization_enabled() else 0
+        image_format = _image_format()
+        quality = _image_quality()
+        key = (max_side, image_format, quality)
+        cached = self._encoded.get(key)
+        if cached is not None:
+            return cached
+
+        buffer = BytesIO()
+        frame = self.resized(max_side)
+        if image_format == "webp":
+            frame.save(buffer, format="WEBP", quality=quality, method=4)
+        else:
+            frame.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+        encoded = b64encode(buffer.getvalue()).decode("ascii")
+        self._encoded[key] = encoded
+        return encoded
+
+
+def prepare_image(data: Union[bytes, str, ImageUpload]) -> PreparedImage:
+    """
+    Decode an ``ImageUpload``, raw bytes or a (data URL) base64 string into a
+    ``PreparedImage``.
+
+    Raises ``ValueError`` when the payload is not a decodable image.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    if isinstance(data, str):
+        data = ImageUpload.from_base64(data)
+    elif not isinstance(data, ImageUpload):
+        data = ImageUpload(data, hashlib.sha256(data).hexdigest())
+    image_bytes = data.data
+
+    if not image_bytes:
+        raise ValueError("Image payload is empty")
+
+    try:
+        with Image.open(BytesIO(image_bytes)) as opened:
+            # draft() lets libjpeg decode at a reduced scale when the source is far
+            # larger than any provider needs.
+            if _normalization_enabled() and opened.format == "JPEG":
+                largest_side = max(max_side_for(provider) for provider in DEFAULT_MAX_SIDE)
+                opened.draft("RGB", (largest_side, largest_side))
+            source_mime = Image.MIME.get(opened.format or "")
+            image = ImageOps.exif_transpose(opened).convert("RGB")
+    except (UnidentifiedImageError, OSError) as exc:
+        raise ValueError(f"Image payload could not be decoded: {exc}") from exc
+
+    return PreparedImage(
+        image,
+        source_bytes=len(image_bytes),
+        content_hash=data.content_hash,
+        source_base64=data.source_base64,
+        # The original bytes are only sent as-is when normalization is off.
+        source_data=None if _normalization_enabled() else image_bytes,
+        source_mime=source_mime,
+    )
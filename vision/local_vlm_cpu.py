@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from vision.food_recognition import (
+    _import_local_vlm_dependencies,
+    _load_peft_local_vlm,
+    _local_vlm_adapter_dir,
+    _local_vlm_model_id,
+)
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = ("peft", "merged", "merged_int8", "merged_int8_compiled")
+MERGE_INFO_FILE = "merge_info.json"
+ADAPTER_FILES = ("adapter_config.json", "adapter_model.safetensors", "adapter_model.bin")
+MERGED_DTYPE = "float32"
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def _setting_bool(name: str, default: bool = False) -> bool:
+    value = str(_setting(name, str(default))).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+def cpu_variant() -> str:
+    """Variant served by ``LOCAL_VLM_CPU_MODE``, derived from the quantize/compile switches."""
+    if not _setting_bool("LOCAL_VLM_CPU_QUANTIZE", True):
+        return "merged"
+    if _setting_bool("LOCAL_VLM_TORCH_COMPILE", False):
+        return "merged_int8_compiled"
+    return "merged_int8"
+
+
+def configure_cpu_threads(torch_module) -> int:
+    threads = int(_setting("LOCAL_VLM_CPU_THREADS", 0) or 0)
+    if threads > 0:
+        torch_module.set_num_threads(threads)
+        try:
+            torch_module.set_num_interop_threads(max(1, threads // 4))
+        except RuntimeError:
+            # Inter-op threads can only be set before the first parallel op in the process.
+            pass
+    return torch_module.get_num_threads()
+
+
+def merged_checkpoint_dir() -> str:
+    configured = _setting("LOCAL_VLM_MERGED_DIR")
+    if configured:
+        return str(configured)
+    adapter_dir = _local_vlm_adapter_dir().rstrip("/\\")
+    return f"{adapter_dir}-merged"
+
+
+def _adapter_signature() -> Dict[str, str]:
+    adapter_dir = _local_vlm_adapter_dir()
+    digest = hashlib.sha256()
+    for name in ADAPTER_FILES:
+        path = os.path.join(adapter_dir, name)
+        if not os.path.exists(path):
+            continue
+        digest.update(name.encode("utf-8"))
+        with open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                digest.update(chunk)
+    # The dtype is part of the signature so checkpoints merged at another precision are redone.
+    return {"base_model": _local_vlm_model_id(), "adapter_sha256": digest.hexdigest(), "dtype": MERGED_DTYPE}
+
+
+def _read_merge_info(directory: str) -> Optional[Dict[str, str]]:
+    try:
+        with open(os.path.join(directory, MERGE_INFO_FILE), encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_merged_checkpoint() -> str:
+    """
+    Merge the LoRA adapter into the base weights once and cache the result as safetensors.
+
+    The merge and the saved weights are float32, the dtype the CPU variants load, so
+    the low-rank update is never rounded into bf16 base weights. The merged directory records the base model id and an adapter hash, so retraining
+    the adapter or switching the base model triggers a fresh merge. Concurrent workers
+    merge into private temp directories and the first one to finish wins the rename.
+    """
+    target_dir = merged_checkpoint_dir()
+    signature = _adapter_signature()
+    if _read_merge_info(target_dir) == signature:
+        return target_dir
+
+    torch = _import_local_vlm_dependencies()[0]
+    logger.info("Merging LoRA adapter %s into %s", _local_vlm_adapter_dir(), target_dir)
+    processor, model = _load_peft_local_vlm(device_map="cpu")
+    # Merge and save in float32 so the low-rank update is not rounded away in the base weights.
+    model = model.to(getattr(torch, MERGED_DTYPE)).merge_and_unload()
+
+    temp_dir = f"{target_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    model.save_pretrained(temp_dir, safe_serialization=True)
+    processor.save_pretrained(temp_dir)
+    with open(os.path.join(temp_dir, MERGE_INFO_FILE), "w", encoding="utf-8") as handle:
+        json.dump(signature, handle)
+
+    if _read_merge_info(target_dir) != signature:
+        shutil.rmtree(target_dir, ignore_errors=True)
+    try:
+        os.replace(temp_dir, target_dir)
+    except OSError:
+        # Another worker published the same merge first.
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return target_dir
+
+
+def _compile_model(torch_module, model):
+    try:
+        model.forward = torch_module.compile(model.forward, dynamic=True)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("torch.compile is unavailable for the local VLM, serving eagerly: %s", str(exc))
+    return model
+
+
+def load_local_vlm_variant(variant: str):
+    """
+    Load one CPU serving variant: ``peft`` (adapter applied on every forward),
+    ``merged`` (float32 merged weights), ``merged_int8`` (dynamic int8 Linear layers)
+    or ``merged_int8_compiled`` (int8 plus ``torch.compile``).
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown local VLM variant: {variant}")
+
+    torch, _, AutoModelForImageTextToText, AutoProcessor = _import_local_vlm_dependencies()
+    threads = configure_cpu_threads(torch)
+
+    if variant == "peft":
+        return _load_peft_local_vlm(device_map="cpu")
+
+    merged_dir = ensure_merged_checkpoint()
+    logger.info("Loading merged local VLM %s as %s with %s threads", merged_dir, variant, threads)
+    processor = AutoProcessor.from_pretrained(merged_dir)
+    model = AutoModelForImageTextToText.from_pretrained(merged_dir, dtype=torch.float32)
+    model.eval()
+
+    if "int8" in variant:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if variant.endswith("_compiled"):
+        model = _compile_model(torch, model)
+    return processor, model
+
+
+def load_cpu_local_vlm():
+    return load_local_vlm_variant(cpu_variant())
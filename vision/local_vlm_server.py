@@ -0,0 +1,317 @@
+"""
+Out-of-process inference server for the local LoRA food model.
+
+One ``run_local_vlm_server`` process owns the model and any number of web workers
+share it. Requests travel over a Unix socket as length-prefixed JSON frames; the
+decoded RGB pixels travel through a ``multiprocessing.shared_memory`` segment, so
+neither side copies image bytes through the socket. Requests from every worker
+feed the same ``MicroBatchScheduler``, so concurrent web traffic is batched into
+single ``generate`` calls.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from vision.vlm_batching import MicroBatchScheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/local_vlm.sock"
+DEFAULT_CLIENT_TIMEOUT_SECONDS = 120
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 1024 * 1024
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def server_socket_path() -> str:
+    return str(_setting("LOCAL_VLM_SERVER_SOCKET", "") or "")
+
+
+def _recv_exact(connection: socket.socket, size: int) -> Optional[bytes]:
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = connection.recv(size - len(chunks))
+        if not chunk:
+            return None
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+def recv_message(connection: socket.socket) -> Optional[Dict[str, Any]]:
+    header = _recv_exact(connection, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds the {MAX_FRAME_BYTES} byte limit")
+    body = _recv_exact(connection, length)
+    if body is None:
+        return None
+    return json.loads(body.decode("utf-8"))
+
+
+def send_message(connection: socket.socket, message: Dict[str, Any]) -> None:
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    connection.sendall(FRAME_HEADER.pack(len(body)) + body)
+
+
+def _attach_shared_memory(name: str, owner_pid: Optional[int] = None) -> shared_memory.SharedMemory:
+    """
+    Attach to a segment created by a client without taking ownership of it.
+
+    Before Python 3.13 attaching also registers the segment with this process's
+    resource tracker, which would unlink the client's segment when the server exits.
+    A client in this same process shares the tracker entry, so it is left alone.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        if owner_pid != os.getpid():
+            resource_tracker.unregister(segment._name, "shared_memory")  # pylint: disable=protected-access
+        return segment
+
+
+def _image_from_shared_memory(request: Dict[str, Any]):
+    from PIL import Image
+
+    width, height = (int(value) for value in request["size"])
+    mode = str(request.get("mode", "RGB"))
+    length = width * height * len(mode)
+    segment = _attach_shared_memory(str(request["shm"]), request.get("pid"))
+    try:
+        # Copy out so the client can free the segment as soon as it has our reply.
+        pixels = bytes(segment.buf[:length])
+    finally:
+        segment.close()
+    return Image.frombytes(mode, (width, height), pixels)
+
+
+def fake_generate_batch(images: List[Any]) -> List[str]:
+    """
+    Deterministic stand-in for the model: names each image after its mean colour.
+
+    Lets the socket, shared-memory and batching path be exercised on machines
+    without the weights. ``LOCAL_VLM_FAKE_LATENCY_MS`` simulates generate time.
+    """
+    delay_ms = float(_setting("LOCAL_VLM_FAKE_LATENCY_MS", 0) or 0)
+    if delay_ms:
+        time.sleep(delay_ms / 1000.0)
+    results = []
+    for image in images:
+        red, green, blue = image.convert("RGB").resize((1, 1)).getpixel((0, 0))
+        results.append(json.dumps({
+            "image_type": "dish",
+            "is_food": True,
+            "detected_items": [
+                {"food_name": f"fake-{red:02x}{green:02x}{blue:02x}", "item_type": "dish", "confidence": 1.0}
+            ],
+            "visible_text": "",
+            "needs_clarification": False,
+        }, separators=(",", ":")))
+    return results
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def setup(self) -> None:
+        self.server.track_connection(self.request, open_=True)
+
+    def finish(self) -> None:
+        self.server.track_connection(self.request, open_=False)
+
+    def handle(self) -> None:
+        # Clients keep connections open, so serve requests until they hang up.
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (OSError, ValueError) as exc:
+                logger.warning("Dropping local VLM client connection: %s", str(exc))
+                return
+            if request is None:
+                return
+            try:
+                response = self.server.dispatch(request)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error("Local VLM request failed: %s", str(exc), exc_info=True)
+                response = {"ok": False, "error": str(exc)}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class LocalVLMServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, scheduler: MicroBatchScheduler, *, fake: bool = False) -> None:
+        self.socket_path = socket_path
+        self.scheduler = scheduler
+        self.fake = fake
+        self._connections: set = set()
+        self._connections_lock = threading.Lock()
+        self._remove_stale_socket(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+    @staticmethod
+    def _remove_stale_socket(socket_path: str) -> None:
+        if not os.path.exists(socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"A local VLM server is already listening on {socket_path}")
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        operation = request.get("op")
+        if operation == "generate":
+            image = _image_from_shared_memory(request)
+            return {"ok": True, "text": self.scheduler.submit(image)}
+        if operation == "ping":
+            return {"ok": True, "pid": os.getpid(), "fake": self.fake, "batching": self.scheduler.stats()}
+        return {"ok": False, "error": f"Unknown operation: {operation}"}
+
+    def track_connection(self, connection: socket.socket, *, open_: bool) -> None:
+        with self._connections_lock:
+            if open_:
+                self._connections.add(connection)
+            else:
+                self._connections.discard(connection)
+
+    def server_close(self) -> None:
+        super().server_close()
+        # Handler threads block on idle keep-alive connections; hang them up so
+        # clients reconnect to the next server instead of talking to a dead one.
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class LocalVLMClient:
+    """
+    Per-process client with a small pool of persistent socket connections, one in
+    use per concurrent request thread.
+    """
+
+    def __init__(self, socket_path: str, timeout: float) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _borrow(self) -> tuple[socket.socket, bool]:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Never share a parent's sockets after fork.
+                self._idle = []
+                self._pid = os.getpid()
+            if self._idle:
+                return self._idle.pop(), True
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        try:
+            connection.connect(self.socket_path)
+        except OSError:
+            connection.close()
+            raise
+        return connection, False
+
+    def _discard_idle(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _release(self, connection: socket.socket) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        for _ in range(2):
+            try:
+                connection, reused = self._borrow()
+            except OSError as exc:
+                raise RuntimeError(f"Local VLM server is unavailable at {self.socket_path}: {exc}") from exc
+            try:
+                send_message(connection, message)
+                response = recv_message(connection)
+            except (OSError, ValueError) as exc:
+                connection.close()
+                if reused:
+                    # The server restarted, so every pooled connection is dead; retry on a fresh one.
+                    self._discard_idle()
+                    continue
+                raise RuntimeError(f"Local VLM server request failed: {exc}") from exc
+            if response is None:
+                connection.close()
+                if reused:
+                    self._discard_idle()
+                    continue
+                raise RuntimeError("Local VLM server closed the connection")
+            self._release(connection)
+            if not response.get("ok"):
+                raise RuntimeError(f"Local VLM server error: {response.get('error')}")
+            return response
+        raise RuntimeError("Local VLM server request failed after reconnecting")
+
+    def generate(self, image) -> str:
+        image = image.convert("RGB")
+        pixels = image.tobytes()
+        segment = shared_memory.SharedMemory(create=True, size=max(1, len(pixels)))
+        try:
+            segment.buf[: len(pixels)] = pixels
+            response = self.request({
+                "op": "generate",
+                "pid": os.getpid(),
+                "shm": segment.name,
+                "size": list(image.size),
+                "mode": image.mode,
+            })
+        finally:
+            segment.close()
+            segment.unlink()
+        return str(response.get("text", ""))
+
+    def ping(self) -> Dict[str, Any]:
+        return self.request({"op": "ping"})
+
+
+_CLIENT: Optional[LocalVLMClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_local_vlm_client() -> LocalVLMClient:
+    global _CLIENT
+
+    socket_path = server_socket_path() or DEFAULT_SOCKET_PATH
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT.socket_path != socket_path:
+            timeout = float(_setting("LOCAL_VLM_SERVER_TIMEOUT_SECONDS", DEFAULT_CLIENT_TIMEOUT_SECONDS))
+            _CLIENT = LocalVLMClient(socket_path, timeout)
+        return _CLIENT
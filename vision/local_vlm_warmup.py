@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DISABLED = "disabled"
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+WARMUP_IMAGE_SIZE = (224, 224)
+
+_STATE_LOCK = threading.Lock()
+_STATE: Dict[str, Any] = {"state": DISABLED, "pid": None, "error": "", "started_at": None, "finished_at": None}
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def preload_enabled() -> bool:
+    value = str(_setting("LOCAL_VLM_PRELOAD", "false")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+def _set_state(state: str, **fields: Any) -> None:
+    with _STATE_LOCK:
+        _STATE.update(state=state, pid=os.getpid(), **fields)
+
+
+def _warm_up() -> None:
+    started = time.monotonic()
+    _set_state(LOADING, started_at=time.time(), finished_at=None, error="")
+    try:
+        from PIL import Image
+
+        from vision.food_recognition import _generate_local_vlm_batch, _load_local_vlm
+
+        if _setting("LOCAL_VLM_SERVER_SOCKET"):
+            from vision.local_vlm_server import get_local_vlm_client
+
+            # The inference server owns the model and only listens once it is warm.
+            get_local_vlm_client().ping()
+            load_seconds = time.monotonic() - started
+        else:
+            _load_local_vlm()
+            load_seconds = time.monotonic() - started
+            # One real generate pass compiles/caches the CUDA kernels the first request would otherwise pay for.
+            _generate_local_vlm_batch([Image.new("RGB", WARMUP_IMAGE_SIZE, (128, 128, 128))])
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("Local VLM warm-up failed: %s", str(exc), exc_info=True)
+        _set_state(FAILED, finished_at=time.time(), error=str(exc))
+        return
+
+    _set_state(
+        READY,
+        finished_at=time.time(),
+        load_seconds=round(load_seconds, 2),
+        warmup_seconds=round(time.monotonic() - started - load_seconds, 2),
+    )
+    logger.info("Local VLM is ready in worker %s after %.1fs", os.getpid(), time.monotonic() - started)
+
+
+def start_local_vlm_warmup() -> Optional[threading.Thread]:
+    """
+    Load and warm the local VLM on a background thread of the current worker.
+
+    Called from gunicorn's ``post_worker_init`` hook. Loading in the hook itself would
+    block the worker's heartbeat and get it killed by the arbiter's timeout, so the
+    worker starts serving immediately while ``/api/vision/ready/`` reports 503.
+    """
+    if not preload_enabled():
+        return None
+
+    with _STATE_LOCK:
+        if _STATE["state"] in {PENDING, LOADING, READY} and _STATE["pid"] == os.getpid():
+            return None
+        _STATE.update(state=PENDING, pid=os.getpid(), error="")
+
+    thread = threading.Thread(target=_warm_up, name="local-vlm-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_status() -> Dict[str, Any]:
+    with _STATE_LOCK:
+        status = dict(_STATE)
+    if not preload_enabled():
+        status["state"] = DISABLED
+    elif status["pid"] != os.getpid():
+        # Preload is on but this process never started it (e.g. runserver).
+        status.update(state=PENDING, pid=os.getpid())
+    return status
+
+
+def is_ready() -> bool:
+    return warmup_status()["state"] in {DISABLED, READY}
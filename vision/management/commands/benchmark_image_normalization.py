@@ -0,0 +1,166 @@
+import os
+import statistics
+import time
+from base64 import b64encode
+from io import BytesIO
+from typing import Callable, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vision import food_recognition
+from vision.image_preprocessing import prepare_image
+
+PROVIDERS = ("openai", "ollama", "lora")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+SYNTHETIC_PREFIX = "synthetic:"
+
+
+def _synthetic_photo(size: Tuple[int, int], orientation: int = 1, image_format: str = "JPEG") -> bytes:
+    """
+    Phone-camera sized frame with smooth gradients plus sensor-like noise, so JPEG
+    sizes land in the same multi-megabyte range as real uploads.
+    """
+    from PIL import Image
+
+    red = Image.radial_gradient("L").resize(size)
+    green = Image.effect_noise(size, 48).point(lambda value: value // 2 + 64)
+    blue = Image.linear_gradient("L").resize(size)
+    image = Image.merge("RGB", (red, green, blue))
+
+    buffer = BytesIO()
+    save_kwargs = {"format": image_format}
+    if image_format == "JPEG":
+        save_kwargs["quality"] = 92
+        if orientation != 1:
+            exif = Image.Exif()
+            exif[0x0112] = orientation
+            save_kwargs["exif"] = exif.tobytes()
+    image.save(buffer, **save_kwargs)
+    return buffer.getvalue()
+
+
+def _synthetic_fixtures() -> List[Tuple[str, bytes]]:
+    # Noise compresses worse than food photos, so these only smoke-test the command.
+    return [
+        (SYNTHETIC_PREFIX + "phone_12mp_landscape.jpg", _synthetic_photo((4032, 3024))),
+        (SYNTHETIC_PREFIX + "phone_12mp_portrait_exif6.jpg", _synthetic_photo((4032, 3024), orientation=6)),
+        (SYNTHETIC_PREFIX + "phone_50mp.jpg", _synthetic_photo((8160, 6120))),
+        (SYNTHETIC_PREFIX + "screenshot.png", _synthetic_photo((1179, 2556), image_format="PNG")),
+    ]
+
+
+def _load_fixtures(directory: str) -> List[Tuple[str, bytes]]:
+    if not os.path.isdir(directory):
+        raise CommandError(f"Fixture directory does not exist: {directory}")
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+            with open(os.path.join(directory, name), "rb") as handle:
+                fixtures.append((name, handle.read()))
+    if not fixtures:
+        raise CommandError(f"No image fixtures found in {directory}")
+    return fixtures
+
+
+def _detected_mime_type(image_bytes: bytes) -> str:
+    from PIL import Image
+
+    with Image.open(BytesIO(image_bytes)) as image:
+        return Image.MIME.get(image.format or "", "image/jpeg")
+
+
+def _timed(func: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare vision payload size and latency with and without server-side image normalization "
+        "on a directory of real photos (--fixtures-dir)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fixtures-dir",
+            help="Directory of real photos to measure. Without it, synthetic noise images are used and labelled as such.",
+        )
+        parser.add_argument("--providers", default=",".join(PROVIDERS), help="Comma separated providers to measure.")
+        parser.add_argument("--call-provider", action="store_true", help="Also measure end-to-end provider latency.")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        providers = [provider.strip() for provider in options["providers"].split(",") if provider.strip()]
+        unknown = set(providers) - set(PROVIDERS)
+        if unknown:
+            raise CommandError(f"Unknown providers: {', '.join(sorted(unknown))}")
+
+        repeat = max(1, options["repeat"])
+        if options["fixtures_dir"]:
+            fixtures = _load_fixtures(options["fixtures_dir"])
+        else:
+            fixtures = _synthetic_fixtures()
+            self.stdout.write(
+                self.style.WARNING(
+                    "No --fixtures-dir given: measuring SYNTHETIC images. Sizes and ratios do not "
+                    "represent real uploads; pass a directory of real photos for meaningful numbers."
+                )
+            )
+
+        self.stdout.write(
+            f"{'fixture':42} {'provider':8} {'raw KB':>9} {'norm KB':>9} {'ratio':>7} "
+            f"{'prep ms':>9} {'raw e2e ms':>11} {'norm e2e ms':>12}"
+        )
+        for name, image_bytes in fixtures:
+            raw_base64 = b64encode(image_bytes).decode("ascii")
+            raw_mime_type = _detected_mime_type(image_bytes)
+            for provider in providers:
+                prepare_ms = _timed(lambda: prepare_image(image_bytes).base64_for(provider), repeat)
+                prepared = prepare_image(image_bytes)
+                normalized_base64 = prepared.base64_for(provider)
+
+                raw_e2e = norm_e2e = "-"
+                if options["call_provider"]:
+                    raw_e2e = f"{_timed(lambda: self._invoke_raw(provider, raw_base64, raw_mime_type, image_bytes), repeat):.0f}"
+                    norm_e2e = f"{_timed(lambda: self._invoke_normalized(provider, image_bytes), repeat):.0f}"
+
+                self.stdout.write(
+                    f"{name[:42]:42} {provider:8} {len(raw_base64) / 1024:9.0f} "
+                    f"{len(normalized_base64) / 1024:9.0f} {len(raw_base64) / max(1, len(normalized_base64)):6.1f}x "
+                    f"{prepare_ms:9.1f} {raw_e2e:>11} {norm_e2e:>12}"
+                )
+
+    @staticmethod
+    def _invoke_raw(provider: str, raw_base64: str, mime_type: str, image_bytes: bytes) -> None:
+        # Mirrors the previous behaviour: the client payload goes to the provider untouched.
+        if provider == "openai":
+            client = food_recognition.get_openai_client()
+            model = food_recognition._openai_vision_models()[0]
+            food_recognition._invoke_openai_vision_model(client, model, raw_base64, mime_type)
+        elif provider == "ollama":
+            food_recognition._invoke_ollama_vision_model(food_recognition._ollama_vision_models()[0], raw_base64)
+        else:
+            from PIL import Image
+
+            image = Image.open(BytesIO(image_bytes)).convert("RGB")
+            food_recognition._generate_local_vlm_batch([image])
+
+    @staticmethod
+    def _invoke_normalized(provider: str, image_bytes: bytes) -> None:
+        prepared = prepare_image(image_bytes)
+        if provider == "openai":
+            client = food_recognition.get_openai_client()
+            model = food_recognition._openai_vision_models()[0]
+            food_recognition._invoke_openai_vision_model(
+                client, model, prepared.base64_for("openai"), prepared.mime_type_for("openai")
+            )
+        elif provider == "ollama":
+            food_recognition._invoke_ollama_vision_model(
+                food_recognition._ollama_vision_models()[0], prepared.base64_for("ollama")
+            )
+        else:
+            food_recognition._generate_local_vlm_batch([prepared.image_for("lora")])
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vision import rag_utils
+from vision.compact_index import read_pointer
+
+FORMATS = ("faiss", "compact")
+
+
+def _memory_kb():
+    """VmRSS from /proc/self/status and Pss (shared pages split across the processes mapping them)."""
+    memory = {"rss_kb": None, "pss_kb": None}
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    memory["rss_kb"] = int(line.split()[1])
+        with open("/proc/self/smaps_rollup", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("Pss:"):
+                    memory["pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return memory
+
+
+def _mb(kb):
+    return f"{kb / 1024:8.1f}" if kb is not None else f"{'-':>8}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Start N worker processes per index format, as gunicorn would, and report each worker's "
+        "index load time and RSS/PSS while all of them hold the index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent worker processes per format.")
+        parser.add_argument("--formats", default=",".join(FORMATS), help="Comma-separated: faiss, compact.")
+        parser.add_argument("--child", choices=FORMATS, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["child"]:
+            self._child()
+            return
+
+        formats = [name.strip() for name in options["formats"].split(",") if name.strip()]
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise CommandError(f"Unknown formats: {', '.join(sorted(unknown))}")
+        index_path = rag_utils._index_path(rag_utils._active_index_name("nutrition_index"))
+        if not os.path.exists(os.path.join(index_path, "index.faiss")):
+            raise CommandError(f"No FAISS index under {index_path}; workers would build one instead of loading it.")
+        if "compact" in formats and read_pointer(index_path) is None:
+            raise CommandError("No compact index yet; run `python manage.py convert_faiss_index` first.")
+
+        self.stdout.write(
+            f"{'format':8} {'worker':>6} {'load ms':>9} {'RSS before':>11} {'RSS after':>10} {'PSS after':>10}  (MB)"
+        )
+        for index_format in formats:
+            results = self._run_workers(index_format, max(1, options["workers"]))
+            for worker, result in enumerate(results):
+                self.stdout.write(
+                    f"{index_format:8} {worker:6} {result['load_ms']:9.0f} {_mb(result['before']['rss_kb']):>11} "
+                    f"{_mb(result['after']['rss_kb']):>10} {_mb(result['after']['pss_kb']):>10}"
+                )
+            pss = [result["after"]["pss_kb"] for result in results]
+            if all(value is not None for value in pss):
+                self.stdout.write(self.style.SUCCESS(
+                    f"{index_format}: {len(results)} workers hold {sum(pss) / 1024:.1f} MB PSS in total"
+                ))
+
+    def _run_workers(self, index_format, workers):
+        command = [sys.executable, sys.argv[0], "benchmark_index_load", "--child", index_format]
+        env = dict(os.environ, RAG_INDEX_FORMAT=index_format)
+        processes = [
+            subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            for _ in range(workers)
+        ]
+        try:
+            # Memory is read only once every worker holds the index, so PSS splits the shared pages.
+            for process in processes:
+                if process.stdout.readline().strip() != "ready":
+                    raise CommandError(f"A {index_format} worker failed to load the index; see its log above.")
+            for process in processes:
+                process.stdin.write("\n")
+                process.stdin.flush()
+            return [json.loads(process.stdout.readline()) for process in processes]
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+
+    def _child(self):
+        before = _memory_kb()
+        started = time.perf_counter()
+        store = rag_utils.create_or_load_index(
+            rag_utils._active_index_name("nutrition_index"), rag_utils.pdf_directory
+        )
+        load_ms = (time.perf_counter() - started) * 1000.0
+        if store is None:
+            sys.stdout.write("failed\n")
+            return
+        # One search so the vectors are actually touched, as the first request of a worker would.
+        store.similarity_search_by_vector([0.0] * store.index.d, k=rag_utils._retrieval_k())
+        sys.stdout.write("ready\n")
+        sys.stdout.flush()
+        sys.stdin.readline()
+        sys.stdout.write(json.dumps({"load_ms": load_ms, "before": before, "after": _memory_kb()}) + "\n")
+        sys.stdout.flush()
@@ -0,0 +1,60 @@
+import gc
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vision import food_recognition
+from vision.image_preprocessing import prepare_image
+from vision.local_vlm_cpu import VARIANTS, load_local_vlm_variant
+from vision.management.commands.benchmark_image_normalization import _synthetic_fixtures, _load_fixtures
+
+
+class Command(BaseCommand):
+    help = "Report per-image latency and tokens/s of the local LoRA food model for each CPU serving variant."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--variants", default=",".join(VARIANTS), help="Comma separated variants to measure.")
+        parser.add_argument("--fixtures-dir", help="Directory of real photos. Synthetic phone-sized photos are used when omitted.")
+        parser.add_argument("--repeat", type=int, default=2, help="Passes over the fixtures per variant.")
+        parser.add_argument("--warmup", type=int, default=1, help="Untimed generations before measuring.")
+
+    def handle(self, *args, **options):
+        variants = [variant.strip() for variant in options["variants"].split(",") if variant.strip()]
+        unknown = set(variants) - set(VARIANTS)
+        if unknown:
+            raise CommandError(f"Unknown variants: {', '.join(sorted(unknown))}")
+
+        fixtures = _load_fixtures(options["fixtures_dir"]) if options["fixtures_dir"] else _synthetic_fixtures()
+        images = [prepare_image(image_bytes).image_for("lora") for _, image_bytes in fixtures]
+
+        self.stdout.write(
+            f"{'variant':22} {'load s':>8} {'p50 ms':>9} {'p95 ms':>9} {'tokens/s':>9} {'avg tokens':>11}"
+        )
+        for variant in variants:
+            started = time.perf_counter()
+            processor, model = load_local_vlm_variant(variant)
+            load_seconds = time.perf_counter() - started
+
+            for image in images[: max(0, options["warmup"])]:
+                food_recognition._generate_local_vlm_ids(processor, model, [image])
+
+            latencies_ms = []
+            token_counts = []
+            pad_token_id = processor.tokenizer.pad_token_id
+            for _ in range(max(1, options["repeat"])):
+                for image in images:
+                    started = time.perf_counter()
+                    generated_ids = food_recognition._generate_local_vlm_ids(processor, model, [image])
+                    latencies_ms.append((time.perf_counter() - started) * 1000.0)
+                    token_counts.append(int((generated_ids[0] != pad_token_id).sum()))
+
+            total_seconds = sum(latencies_ms) / 1000.0
+            p95_ms = statistics.quantiles(latencies_ms, n=20)[-1] if len(latencies_ms) > 1 else latencies_ms[0]
+            self.stdout.write(
+                f"{variant:22} {load_seconds:8.1f} {statistics.median(latencies_ms):9.0f} {p95_ms:9.0f} "
+                f"{sum(token_counts) / total_seconds:9.1f} {statistics.mean(token_counts):11.1f}"
+            )
+
+            del processor, model
+            gc.collect()
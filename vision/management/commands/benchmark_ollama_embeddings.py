@@ -0,0 +1,133 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from django.core.management.base import BaseCommand
+
+from vision import rag_utils
+from vision.metrics import registry
+from vision.ollama_embeddings import OllamaEmbeddings
+
+
+def _stub_vector(text: str, dim: int) -> List[float]:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [digest[index % len(digest)] / 255.0 for index in range(dim)]
+
+
+class StubEmbeddingServer(ThreadingHTTPServer):
+    """
+    Local stand-in for ``/api/embed``: ``parallel`` requests are served at a time
+    (like Ollama's ``OLLAMA_NUM_PARALLEL``), each taking ``base_ms`` plus
+    ``per_item_ms`` per input, and ``failure_rate`` of them answer 503.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, parallel: int, base_ms: float, per_item_ms: float, failure_rate: float, dim: int) -> None:
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.slots = threading.BoundedSemaphore(max(1, parallel))
+        self.base_ms = base_ms
+        self.per_item_ms = per_item_ms
+        self.failure_rate = failure_rate
+        self.dim = dim
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):  # noqa: N802
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        inputs = body.get("input") or []
+        with self.server.slots:
+            time.sleep((self.server.base_ms + self.server.per_item_ms * len(inputs)) / 1000.0)
+        if random.random() < self.server.failure_rate:
+            self._reply(503, {"error": "stub overloaded"})
+            return
+        self._reply(200, {"embeddings": [_stub_vector(text, self.server.dim) for text in inputs]})
+
+    def _reply(self, status_code: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+def _synthetic_chunks(count: int) -> List[str]:
+    rng = random.Random(7)
+    words = ["folate", "iron", "calcium", "pregnancy", "trimester", "fish", "mercury", "caffeine", "vitamin", "iodine"]
+    return [f"{index} " + " ".join(rng.choice(words) for _ in range(rng.randint(30, 160))) for index in range(count)]
+
+
+class Command(BaseCommand):
+    help = "Measure embedding throughput of sequential fixed batches against concurrent adaptive batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--texts", type=int, default=2000, help="Number of synthetic chunks to embed.")
+        parser.add_argument("--live", action="store_true", help="Use OLLAMA_BASE_URL instead of the local stub server.")
+        parser.add_argument("--stub-parallel", type=int, default=4, help="Requests the stub serves at once.")
+        parser.add_argument("--stub-base-ms", type=float, default=40.0, help="Fixed stub latency per request.")
+        parser.add_argument("--stub-per-item-ms", type=float, default=3.0, help="Stub latency per input text.")
+        parser.add_argument("--stub-failure-rate", type=float, default=0.02, help="Share of stub requests answering 503.")
+        parser.add_argument("--dim", type=int, default=64, help="Stub vector size.")
+
+    def handle(self, *args, **options):
+        texts = _synthetic_chunks(max(1, options["texts"]))
+        server = None
+        if options["live"]:
+            base_url, model = rag_utils._ollama_base_url(), rag_utils._ollama_embed_model()
+        else:
+            server = StubEmbeddingServer(
+                options["stub_parallel"], options["stub_base_ms"], options["stub_per_item_ms"],
+                options["stub_failure_rate"], options["dim"],
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url, model = server.url, "stub"
+
+        configured = rag_utils._ollama_embeddings()
+        candidates = {
+            "sequential": OllamaEmbeddings(
+                model, base_url, configured.timeout, configured.batch_size,
+                max_batch_size=configured.batch_size, max_in_flight=1,
+                retry_backoff_ms=configured.retry_backoff_ms,
+            ),
+            "concurrent": OllamaEmbeddings(
+                model, base_url, configured.timeout, configured.batch_size,
+                max_batch_size=configured.sizer.maximum, max_batch_chars=configured.max_batch_chars,
+                max_in_flight=configured.max_in_flight, target_batch_ms=configured.sizer.target_ms,
+                max_retries=configured.max_retries, retry_backoff_ms=configured.retry_backoff_ms,
+            ),
+        }
+
+        self.stdout.write(f"{len(texts)} texts against {base_url} ({model})")
+        self.stdout.write(f"{'client':12} {'seconds':>9} {'texts/s':>9} {'retries':>8} {'batch size':>11} {'ordered':>8}")
+        try:
+            for name, client in candidates.items():
+                retries_before = registry.counter("ollama_embed.retries").value
+                started = time.perf_counter()
+                vectors = client.embed_documents(texts)
+                seconds = time.perf_counter() - started
+                ordered = "-" if server is None else str(
+                    all(vector == _stub_vector(text, options["dim"]) for text, vector in zip(texts, vectors))
+                )
+                self.stdout.write(
+                    f"{name:12} {seconds:9.2f} {len(texts) / seconds:9.1f} "
+                    f"{registry.counter('ollama_embed.retries').value - retries_before:8} "
+                    f"{client.sizer.current:11} {ordered:>8}"
+                )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
@@ -0,0 +1,124 @@
+import os
+import time
+
+import faiss
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from vision import rag_utils
+from vision.models import FoodRecognitionLog
+from vision.vector_index import (
+    INDEX_TYPES,
+    build_index,
+    effective_type,
+    factory_string,
+    index_bytes,
+    set_search_parameters,
+)
+
+
+def _int_list(value):
+    return [int(item) for item in str(value).split(",") if item.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Embed the most recognized food names as retrieval queries and compare FAISS index types "
+        "against the exact flat index: recall@k, per-query latency and index size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=500, help="Most recognized food names to use as queries.")
+        parser.add_argument("--k", type=int, default=rag_utils._retrieval_k())
+        parser.add_argument("--types", default=",".join(INDEX_TYPES), help="Comma-separated index types to compare.")
+        parser.add_argument("--ef-search", default="16,32,64,128", help="HNSW efSearch values to sweep.")
+        parser.add_argument("--nprobe", default="1,4,8,16,32", help="IVF nprobe values to sweep.")
+
+    def handle(self, *args, **options):
+        index_types = [name.strip() for name in options["types"].split(",") if name.strip()]
+        unknown = set(index_types) - set(INDEX_TYPES)
+        if unknown:
+            raise CommandError(f"Unknown index types: {', '.join(sorted(unknown))}")
+        index_path = rag_utils._index_path(rag_utils._active_index_name("nutrition_index"))
+        if not os.path.exists(os.path.join(index_path, "index.faiss")):
+            raise CommandError(f"No FAISS index under {index_path}.")
+
+        embeddings = rag_utils.get_embeddings()
+        store = rag_utils._load_faiss(index_path, embeddings)
+        vectors = store.index.reconstruct_n(0, store.index.ntotal)
+        queries = self._query_vectors(embeddings, options["queries"], getattr(store, "_normalize_L2", False))
+        k = max(1, options["k"])
+        self.stdout.write(
+            f"{store.index.ntotal} vectors x {store.index.d} dims, {len(queries)} queries, k={k}"
+        )
+
+        started = time.perf_counter()
+        flat = build_index(vectors, "flat", store.index.metric_type)
+        flat_seconds = time.perf_counter() - started
+        _, truth = flat.search(queries, k)
+        params = rag_utils._faiss_index_params()
+        self.stdout.write(
+            f"{'type':8} {'factory':22} {'param':>12} {'build s':>8} {'MB':>8} {'B/vec':>7} "
+            f"{'p50 ms':>7} {'p95 ms':>7} {'recall@' + str(k):>9}"
+        )
+        for index_type in index_types:
+            if index_type == "flat":
+                index, build_seconds = flat, flat_seconds
+            else:
+                started = time.perf_counter()
+                index = build_index(vectors, index_type, store.index.metric_type, params)
+                build_seconds = time.perf_counter() - started
+            size = index_bytes(index)
+            if hasattr(index, "hnsw"):
+                sweep = [("efSearch", value) for value in _int_list(options["ef_search"])]
+            elif faiss.try_extract_index_ivf(index) is not None:
+                sweep = [("nprobe", value) for value in _int_list(options["nprobe"])]
+            else:
+                sweep = [(None, None)]
+            description = factory_string(
+                effective_type(index_type, index.ntotal), store.index.d, store.index.ntotal, params
+            )
+            for name, value in sweep:
+                if name:
+                    set_search_parameters(index, {name: value})
+                p50, p95, recall = self._measure(index, queries, truth, k)
+                self.stdout.write(
+                    f"{index_type:8} {description:22} {(f'{name}={value}' if name else '-'):>12} "
+                    f"{build_seconds:8.1f} {size / 1e6:8.2f} {size / max(1, index.ntotal):7.0f} "
+                    f"{p50:7.3f} {p95:7.3f} {recall:9.3f}"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            "Set RAG_FAISS_INDEX_TYPE and the matching RAG_FAISS_* search setting, then run sync_nutrition_index "
+            "or convert_faiss_index."
+        ))
+
+    def _query_vectors(self, embeddings, limit, normalize):
+        names = (
+            FoodRecognitionLog.objects.exclude(recognized_food__in=["", "Unknown"])
+            .values("recognized_food")
+            .annotate(count=Count("id"))
+            .order_by("-count")[: max(1, limit)]
+        )
+        foods = list(dict.fromkeys(rag_utils._normalize_food(row["recognized_food"]) for row in names))
+        if not foods:
+            raise CommandError("No recognized foods in FoodRecognitionLog to use as queries.")
+        # The same query text retrieve_food_documents embeds in production.
+        queries = np.asarray(
+            embeddings.embed_documents([rag_utils._retrieval_query(food) for food in foods]), dtype=np.float32
+        )
+        if normalize:
+            faiss.normalize_L2(queries)
+        return queries
+
+    def _measure(self, index, queries, truth, k):
+        # One query per search call, as each request does.
+        latencies = []
+        found = np.empty_like(truth)
+        for row in range(len(queries)):
+            started = time.perf_counter()
+            _, found[row : row + 1] = index.search(queries[row : row + 1], k)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+        recall = np.mean([len(set(found[row]) & set(truth[row]) - {-1}) / k for row in range(len(queries))])
+        p50, p95 = np.percentile(latencies, [50, 95])
+        return float(p50), float(p95), float(recall)
@@ -0,0 +1,54 @@
+import gc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vision import food_recognition
+from vision.image_preprocessing import prepare_image
+from vision.local_vlm_cpu import MERGED_DTYPE, load_local_vlm_variant
+from vision.management.commands.benchmark_image_normalization import _synthetic_fixtures, _load_fixtures
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the merged CPU checkpoint gives the same greedy output as the base model "
+        "with the LoRA adapter applied, on fixture images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fixtures-dir", help="Directory of real photos. Synthetic phone-sized photos are used when omitted.")
+
+    def handle(self, *args, **options):
+        fixtures = _load_fixtures(options["fixtures_dir"]) if options["fixtures_dir"] else _synthetic_fixtures()
+        images = [prepare_image(image_bytes).image_for("lora") for _, image_bytes in fixtures]
+
+        # Both sides run at the merge dtype, so any difference comes from the merge itself.
+        unmerged = self._generate("peft", images, cast=True)
+        merged = self._generate("merged", images)
+
+        mismatches = 0
+        for (name, _), before, after in zip(fixtures, unmerged, merged):
+            if before == after:
+                self.stdout.write(f"{name}: identical")
+                continue
+            mismatches += 1
+            self.stdout.write(self.style.WARNING(f"{name}: differs\n  adapter: {before}\n  merged:  {after}"))
+        if mismatches:
+            raise CommandError(f"{mismatches} of {len(images)} fixtures differ after merging.")
+        self.stdout.write(self.style.SUCCESS(f"Merged checkpoint matches the adapter on {len(images)} fixtures."))
+
+    @staticmethod
+    def _generate(variant, images, cast=False):
+        processor, model = load_local_vlm_variant(variant)
+        if cast:
+            import torch
+
+            model = model.to(getattr(torch, MERGED_DTYPE))
+        outputs = [
+            food_recognition._decode_local_vlm_ids(
+                processor, food_recognition._generate_local_vlm_ids(processor, model, [image])
+            )[0]
+            for image in images
+        ]
+        del processor, model
+        gc.collect()
+        return outputs
@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vision import rag_utils
+from vision.compact_index import compact_directory
+from vision.rag_ingestion import MANIFEST_FILE, IngestionManifest
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the FAISS index (index.faiss + pickled index.pkl) as the compact, memory-mappable "
+        "index with an SQLite docstore that web workers load instead, built as RAG_FAISS_INDEX_TYPE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--index-name", default=None, help="Index to convert (default: the active index).")
+
+    def handle(self, *args, **options):
+        index_path = rag_utils._index_path(options["index_name"] or rag_utils._active_index_name("nutrition_index"))
+        if not os.path.exists(os.path.join(index_path, "index.faiss")):
+            raise CommandError(f"No FAISS index under {index_path}.")
+
+        started = time.perf_counter()
+        store = rag_utils._load_faiss(index_path, rag_utils.get_embeddings())
+        loaded = time.perf_counter()
+        version = IngestionManifest.load(os.path.join(index_path, MANIFEST_FILE)).version
+        pointer = rag_utils._export_compact(store, index_path, version)
+        exported = time.perf_counter()
+
+        directory = compact_directory(index_path)
+        self.stdout.write(f"vectors:            {pointer['count']} x {pointer['dim']} ({pointer['index_type']})")
+        self.stdout.write(f"pickle load:        {(loaded - started) * 1000:9.0f} ms")
+        self.stdout.write(f"export:             {(exported - loaded) * 1000:9.0f} ms")
+        self.stdout.write(f"index.faiss:        {_size(os.path.join(index_path, 'index.faiss')):>12,} bytes")
+        self.stdout.write(f"index.pkl:          {_size(os.path.join(index_path, 'index.pkl')):>12,} bytes")
+        self.stdout.write(f"compact index:      {_size(os.path.join(directory, pointer['index'])):>12,} bytes")
+        self.stdout.write(
+            f"compact docstore:   {_size(os.path.join(directory, pointer['docstore'])):>12,} bytes"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Compact index v{version} written to {directory}."))
@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+
+from vision import guidance_cache, guidance_store, rag_utils
+from vision.metrics import registry
+from vision.models import Food, FoodRecognitionLog, ResponseStyle
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-generate durable guidance for every Food and the most recognized food names, "
+        "for each pregnancy stage and optionally every response style."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=200, help="Most recognized names from FoodRecognitionLog to include.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Guidance generations in flight at once.")
+        parser.add_argument("--with-styles", action="store_true", help="Also render every ResponseStyle on top of the base.")
+        parser.add_argument("--limit", type=int, default=0, help="Only process the first N food names (0 = all).")
+
+    def handle(self, *args, **options):
+        store = rag_utils.get_qa_chain()
+        if store is None:
+            raise CommandError("The vector store could not be initialized; see the log for details.")
+        guidance_store.purge_stale(rag_utils._active_index_name("nutrition_index"), rag_utils.index_version())
+
+        names = {}
+        for name in Food.objects.values_list("name", flat=True):
+            names.setdefault(rag_utils._normalize_food(name), name.strip())
+        top_names = (
+            FoodRecognitionLog.objects.exclude(recognized_food__in=["", "Unknown"])
+            .values("recognized_food")
+            .annotate(count=Count("id"))
+            .order_by("-count")[: max(0, options["top"])]
+        )
+        for row in top_names:
+            names.setdefault(rag_utils._normalize_food(row["recognized_food"]), row["recognized_food"].strip())
+        foods = sorted(names.values())
+        if options["limit"]:
+            foods = foods[: options["limit"]]
+
+        stages = [guidance_cache.stage_context(None)] + [
+            guidance_cache.stage_context(week_start) for _, week_start, _ in guidance_cache.pregnancy_stages()
+        ]
+        styles = [None]
+        if options["with_styles"]:
+            styles += [prompt for prompt in ResponseStyle.objects.values_list("prompt", flat=True)
+                       if not rag_utils._is_neutral_style(prompt)]
+        tasks = [(food, stage) for food in foods for stage in stages]
+
+        def run(task):
+            food, stage = task
+            try:
+                base = rag_utils._base_food_guidance(store, food, stage)
+                for style in styles[1:]:
+                    rag_utils._styled_food_guidance(base, style, food, stage)
+            finally:
+                connections.close_all()
+
+        self.stdout.write(
+            f"{len(foods)} foods x {len(stages)} stages x {len(styles)} styles "
+            f"at index version {rag_utils.index_version()}"
+        )
+        hits_before = registry.counter("guidance_store.hits").value
+        writes_before = registry.counter("guidance_store.writes").value
+        started = time.perf_counter()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options["concurrency"]), thread_name_prefix="pregenerate") as pool:
+            futures = {pool.submit(run, task): task for task in tasks}
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    failed += 1
+                    food, stage = futures[future]
+                    self.stderr.write(f"{food} [{stage['cache_tag']}]: {exc}")
+                if done % 50 == 0 or done == len(tasks):
+                    self.stdout.write(f"  {done}/{len(tasks)} ({time.perf_counter() - started:.0f}s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"generated {registry.counter('guidance_store.writes').value - writes_before}, "
+            f"already stored {registry.counter('guidance_store.hits').value - hits_before}, "
+            f"failed {failed} in {time.perf_counter() - started:.0f}s"
+        ))
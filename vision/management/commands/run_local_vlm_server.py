@@ -0,0 +1,58 @@
+import signal
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vision import food_recognition
+from vision.local_vlm_server import DEFAULT_SOCKET_PATH, LocalVLMServer, fake_generate_batch, server_socket_path
+from vision.vlm_batching import MicroBatchScheduler
+
+
+class Command(BaseCommand):
+    help = "Serve the local LoRA food model to web workers over a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=server_socket_path() or DEFAULT_SOCKET_PATH)
+        parser.add_argument(
+            "--fake-model",
+            action="store_true",
+            help="Answer with a deterministic fake model instead of loading the weights.",
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options["socket"]
+        if options["fake_model"]:
+            scheduler = MicroBatchScheduler(
+                fake_generate_batch,
+                max_batch_size=int(food_recognition._setting(
+                    "LOCAL_VLM_BATCH_MAX_SIZE", food_recognition.DEFAULT_LOCAL_VLM_BATCH_MAX_SIZE
+                )),
+                max_wait_ms=float(food_recognition._setting(
+                    "LOCAL_VLM_BATCH_MAX_WAIT_MS", food_recognition.DEFAULT_LOCAL_VLM_BATCH_MAX_WAIT_MS
+                )),
+                name="local_vlm",
+            )
+        else:
+            from PIL import Image
+
+            # Load and warm before binding, so a connectable socket means a ready model.
+            self.stdout.write("Loading local VLM...")
+            food_recognition._load_local_vlm()
+            food_recognition._generate_local_vlm_batch([Image.new("RGB", (224, 224), (128, 128, 128))])
+            scheduler = food_recognition.get_local_vlm_scheduler()
+
+        try:
+            server = LocalVLMServer(socket_path, scheduler, fake=options["fake_model"])
+        except RuntimeError as exc:
+            raise CommandError(str(exc)) from exc
+
+        # Let `docker stop` shut down cleanly and remove the socket file.
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        mode = "fake model" if options["fake_model"] else food_recognition._local_vlm_model_id()
+        self.stdout.write(self.style.SUCCESS(f"Local VLM server ({mode}) listening on {socket_path}"))
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            server.server_close()
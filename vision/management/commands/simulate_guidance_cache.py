@@ -0,0 +1,62 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from vision.guidance_cache import NEUTRAL_STYLE, pregnancy_stages, simulate, week_at
+from vision.models import FoodRecognitionLog, UserPregnancyProfile
+
+LEGACY_TTL_SECONDS = 1800
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay FoodRecognitionLog history against the old per-week, per-style guidance cache key "
+        "and the stage-bucketed, style-layered cache, and report hit rates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="How much recognition history to replay.")
+        # All layers default to the same TTL, so the comparison measures the keying schemes alone.
+        parser.add_argument("--legacy-ttl", type=int, default=LEGACY_TTL_SECONDS)
+        parser.add_argument("--base-ttl", type=int, default=LEGACY_TTL_SECONDS)
+        parser.add_argument("--style-ttl", type=int, default=LEGACY_TTL_SECONDS)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - datetime.timedelta(days=max(1, options["days"]))
+        due_dates = dict(UserPregnancyProfile.objects.values_list("user_id", "due_date"))
+        rows = (
+            FoodRecognitionLog.objects.filter(date__gte=since)
+            .exclude(recognized_food__in=["", "Unknown"])
+            .order_by("date")
+            .values_list("date", "recognized_food", "user_id", "user__preferred_speaking_style")
+        )
+
+        def events():
+            for date, food, user_id, style in rows.iterator():
+                due_date = due_dates.get(user_id)
+                week = week_at(due_date, date.date()) if due_date else None
+                # The log does not record the style used, so the user's current preference stands in.
+                yield date, food, style or NEUTRAL_STYLE, week
+
+        result = simulate(
+            events(),
+            legacy_ttl=options["legacy_ttl"],
+            base_ttl=options["base_ttl"],
+            style_ttl=options["style_ttl"],
+            stages=pregnancy_stages(),
+        )
+        if not result.requests:
+            raise CommandError(f"No recognition logs since {since:%Y-%m-%d}.")
+
+        self.stdout.write(f"replayed {result.requests} recognitions since {since:%Y-%m-%d}")
+        self.stdout.write(f"{'scheme':28} {'hit rate':>9} {'RAG generations':>16} {'style renders':>14} {'keys':>7}")
+        self.stdout.write(
+            f"{'week x style (legacy)':28} {result.legacy_hit_rate:9.1%} {result.legacy_generations:16} "
+            f"{'-':>14} {result.legacy_keys:7}"
+        )
+        self.stdout.write(
+            f"{'stage base + style layer':28} {result.layered_hit_rate:9.1%} {result.layered_generations:16} "
+            f"{result.style_renders:14} {result.base_keys + result.styled_keys:7}"
+        )
+        self.stdout.write(f"base layer hit rate: {result.base_hit_rate:.1%}")
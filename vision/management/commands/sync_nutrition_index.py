@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vision import rag_utils
+
+
+class Command(BaseCommand):
+    help = "Ingest new or changed nutrition PDFs into the vector index and drop the vectors of removed ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            help="PDF directory to sync (default: nutrition_pdfs). Index entries from other directories are left alone.",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Rebuild the index from scratch, e.g. after changing the chunking.",
+        )
+
+    def handle(self, *args, **options):
+        report = rag_utils.sync_index(options["directory"], rebuild=options["rebuild"])
+        if report is None:
+            raise CommandError("The vector store could not be initialized; see the log for details.")
+
+        self.stdout.write(f"files added:            {len(report.files_added)}")
+        self.stdout.write(f"files removed/changed:  {len(report.files_removed)}")
+        self.stdout.write(f"duplicate files skipped: {len(report.duplicate_files)}")
+        self.stdout.write(f"chunks added:           {report.chunks_added}")
+        self.stdout.write(f"chunks deleted:         {report.chunks_deleted}")
+        self.stdout.write(f"duplicate chunks:       {report.chunks_deduplicated}")
+        self.stdout.write("stage timings (load/split summed over workers):")
+        for stage, elapsed in report.timings.items():
+            self.stdout.write(f"  {stage[:-3]:22} {elapsed:9.0f} ms")
+        for key in report.failed_files:
+            self.stderr.write(f"failed to parse {key}; it will be retried on the next sync")
+        self.stdout.write(self.style.SUCCESS(f"Index {rag_utils.index_location} is at version {report.version}."))
@@ -0,0 +1,140 @@
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Dict, Iterable, Optional
+
+DEFAULT_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+DEFAULT_SAMPLE_WINDOW = 1024
+
+
+class Counter:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def snapshot(self) -> int:
+        return self._value
+
+
+class Gauge:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._value = 0.0
+        self._max = 0.0
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+            self._max = max(self._max, value)
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+            self._max = max(self._max, self._value)
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> Dict[str, float]:
+        return {"value": self._value, "max": self._max}
+
+
+class Histogram:
+    """
+    Cumulative bucket counts plus a sliding window of recent samples for percentiles.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS_MS, window: int = DEFAULT_SAMPLE_WINDOW) -> None:
+        self._lock = threading.Lock()
+        self._bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._samples: deque = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self._bounds, value)] += 1
+            self._samples.append(value)
+            self._count += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(q / 100.0 * (len(samples) - 1)))))
+        return samples[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            count = self._count
+            total = self._sum
+        buckets = {f"le_{bound:g}": counts[idx] for idx, bound in enumerate(self._bounds)}
+        buckets["le_inf"] = counts[-1]
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics store. Each gunicorn worker keeps its own registry.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {}
+
+    def _get_or_create(self, name: str, factory) -> Any:
+        metric = self._metrics.get(name)
+        if metric is not None:
+            return metric
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str) -> Counter:
+        return self._get_or_create(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        return self._get_or_create(name, Gauge)
+
+    def histogram(self, name: str, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS_MS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(buckets))
+
+    def snapshot(self, prefix: str = "") -> Dict[str, Any]:
+        with self._lock:
+            items = sorted(self._metrics.items())
+        return {name: metric.snapshot() for name, metric in items if name.startswith(prefix)}
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.7 on 2026-10-16 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vision', '0003_imagefingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodrecognitionlog',
+            name='image_url',
+            field=models.URLField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='foodrecognitionlog',
+            name='confidence_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='foodrecognitionlog',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='foodrecognitionlog',
+            name='provider',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='foodrecognitionlog',
+            name='model_name',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='foodrecognitionlog',
+            name='latency_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
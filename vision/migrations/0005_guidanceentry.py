@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-16 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vision', '0004_foodrecognitionlog_performance_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuidanceEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('food_name', models.CharField(max_length=200)),
+                ('stage', models.CharField(max_length=50)),
+                ('style', models.CharField(max_length=64)),
+                ('generator', models.CharField(max_length=200)),
+                ('index_name', models.CharField(max_length=200)),
+                ('index_version', models.IntegerField()),
+                ('safety_summary', models.TextField()),
+                ('is_safe', models.BooleanField(default=False)),
+                ('nutritional_advice', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['index_name', 'index_version'], name='guidance_index_version_idx')],
+                'constraints': [models.UniqueConstraint(fields=('food_name', 'stage', 'style', 'generator', 'index_name', 'index_version'), name='unique_guidance_entry')],
+            },
+        ),
+    ]
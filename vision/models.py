@@ -157,9 +157,13 @@ class NutritionDatabase(models.Model):
 
 class FoodRecognitionLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    image_url = models.URLField()
+    image_url = models.URLField(blank=True, default='')
+    image_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
     recognized_food = models.CharField(max_length=200)
-    confidence_score = models.FloatField()
+    confidence_score = models.FloatField(null=True, blank=True)
+    provider = models.CharField(max_length=20, blank=True, default='')
+    model_name = models.CharField(max_length=200, blank=True, default='')
+    latency_ms = models.FloatField(null=True, blank=True)
     date = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -167,4 +171,44 @@ class FoodRecognitionLog(models.Model):
 
 class ResponseStyle(models.Model):
     name = models.CharField(max_length=50, unique=True)
-    prompt = models.TextField()
\ No newline at end of file
+    prompt = models.TextField()
+
+class ImageFingerprint(models.Model):
+    dhash = models.CharField(max_length=16, unique=True)
+    band_0 = models.IntegerField(db_index=True)
+    band_1 = models.IntegerField(db_index=True)
+    band_2 = models.IntegerField(db_index=True)
+    band_3 = models.IntegerField(db_index=True)
+    food_name = models.CharField(max_length=200)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.dhash} -> {self.food_name} ({self.hit_count} hits)"
+
+class GuidanceEntry(models.Model):
+    food_name = models.CharField(max_length=200)
+    stage = models.CharField(max_length=50)
+    style = models.CharField(max_length=64)
+    generator = models.CharField(max_length=200)
+    index_name = models.CharField(max_length=200)
+    index_version = models.IntegerField()
+    safety_summary = models.TextField()
+    is_safe = models.BooleanField(default=False)
+    nutritional_advice = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['food_name', 'stage', 'style', 'generator', 'index_name', 'index_version'],
+                name='unique_guidance_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['index_name', 'index_version'], name='guidance_index_version_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.food_name} [{self.stage}, {self.style[:8]}] v{self.index_version}"
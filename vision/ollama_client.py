@@ -0,0 +1,186 @@
+"""
+Streaming client for Ollama's ``/api/chat``.
+
+Every call streams NDJSON chunks and stops reading as soon as the top-level JSON
+object in the reply is closed. Closing the response makes Ollama abort the
+generation, so grammar-constrained replies do not keep producing trailing
+whitespace up to ``num_predict``. Calls pin the model with an explicit
+``keep_alive`` and wait for a per-model slot, so bursts queue here instead of
+overloading the server into timeouts. ``OLLAMA_NUM_PARALLEL`` is the server's
+limit; each gunicorn worker process gets an equal share of it (see
+``num_parallel``).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+
+from project_template.http_clients import get_requests_session
+from vision.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+DEFAULT_KEEP_ALIVE = "30m"
+DEFAULT_NUM_PARALLEL = 4
+SLOT_POLL_SECONDS = 0.05
+
+_SLOTS: Dict[Tuple[int, str], threading.BoundedSemaphore] = {}
+_SLOTS_LOCK = threading.Lock()
+
+
+class OllamaCancelled(RuntimeError):
+    """The caller gave up on the request (e.g. a hedged call already won)."""
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def base_url() -> str:
+    return str(_setting("OLLAMA_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+
+
+def keep_alive() -> Any:
+    value = str(_setting("OLLAMA_KEEP_ALIVE", DEFAULT_KEEP_ALIVE)).strip()
+    # Ollama takes either a duration string ("30m") or seconds (-1 keeps the model loaded forever).
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def num_parallel() -> int:
+    """
+    Slots per model in this process: ``OLLAMA_NUM_PARALLEL`` split across
+    ``GUNICORN_WORKERS`` so all workers together stay within the server's limit.
+    Each worker keeps at least one slot.
+    """
+    server_parallel = int(_setting("OLLAMA_NUM_PARALLEL", DEFAULT_NUM_PARALLEL))
+    workers = max(1, int(_setting("GUNICORN_WORKERS", 1)))
+    return max(1, server_parallel // workers)
+
+
+def _slot(model: str) -> threading.BoundedSemaphore:
+    key = (os.getpid(), model)
+    semaphore = _SLOTS.get(key)
+    if semaphore is not None:
+        return semaphore
+    with _SLOTS_LOCK:
+        semaphore = _SLOTS.get(key)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(num_parallel())
+            _SLOTS[key] = semaphore
+        return semaphore
+
+
+@contextmanager
+def model_slot(model: str, timeout: float, cancel_event: Optional[threading.Event] = None) -> Iterator[None]:
+    semaphore = _slot(model)
+    started = time.monotonic()
+    deadline = started + timeout
+    while not semaphore.acquire(timeout=SLOT_POLL_SECONDS):
+        if cancel_event is not None and cancel_event.is_set():
+            raise OllamaCancelled(f"Cancelled while waiting for an Ollama slot for {model}")
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"No Ollama slot for {model} within {timeout:.0f}s")
+    registry.histogram(f"ollama.slot_wait_ms.{model}").observe((time.monotonic() - started) * 1000.0)
+    in_flight = registry.gauge(f"ollama.in_flight.{model}")
+    in_flight.inc()
+    try:
+        yield
+    finally:
+        in_flight.dec()
+        semaphore.release()
+
+
+class JsonObjectTracker:
+    """Finds where the first top-level JSON object in a text stream closes."""
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> Optional[int]:
+        """Return the index just past the closing brace within ``text``, if it is there."""
+        for index, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = self.started
+            elif char == "{":
+                self.started = True
+                self.depth += 1
+            elif char == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return index + 1
+        return None
+
+
+def stream_chat(
+    payload: Dict[str, Any], *, timeout: float, cancel_event: Optional[threading.Event] = None
+) -> Iterator[str]:
+    """Yield content deltas of a chat completion until Ollama reports ``done``."""
+    model = str(payload["model"])
+    body = dict(payload, stream=True, keep_alive=keep_alive())
+    with model_slot(model, timeout, cancel_event):
+        with get_requests_session("ollama").post(
+            f"{base_url()}/api/chat",
+            json=body,
+            timeout=timeout,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if cancel_event is not None and cancel_event.is_set():
+                    raise OllamaCancelled(f"Ollama call to {model} was cancelled")
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama error from {model}: {chunk['error']}")
+                content = chunk.get("message", {}).get("content", "")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    return
+
+
+def stream_chat_json(
+    payload: Dict[str, Any], *, timeout: float, cancel_event: Optional[threading.Event] = None
+) -> Iterator[str]:
+    """
+    Like ``stream_chat`` but ends as soon as the reply's top-level JSON object is
+    complete; the last delta is trimmed to the closing brace.
+    """
+    tracker = JsonObjectTracker()
+    deltas = stream_chat(payload, timeout=timeout, cancel_event=cancel_event)
+    try:
+        for delta in deltas:
+            end = tracker.feed(delta)
+            if end is not None:
+                registry.counter("ollama.early_stop").inc()
+                if delta[:end]:
+                    yield delta[:end]
+                return
+            yield delta
+    finally:
+        # Drops the HTTP stream, which tells Ollama to stop generating.
+        deltas.close()
+
+
+def chat_json(payload: Dict[str, Any], *, timeout: float, cancel_event: Optional[threading.Event] = None) -> str:
+    return "".join(stream_chat_json(payload, timeout=timeout, cancel_event=cancel_event))
@@ -0,0 +1,177 @@
+"""
+Bulk embedding client for Ollama's ``/api/embed``.
+
+``embed_documents`` keeps up to ``max_in_flight`` batches in flight. The batch
+size adapts as results come back: it grows while batches finish under
+``target_batch_ms`` and halves when they run slow or fail. Batches are also cut
+at ``max_batch_chars`` so a run of long chunks does not turn into one huge
+request. A failed batch is retried on its own with exponential backoff, and the
+vectors are put back in input order.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from project_template.http_clients import get_requests_session
+from vision.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_MAX_BATCH_SIZE = 128
+DEFAULT_MAX_BATCH_CHARS = 64000
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_TARGET_BATCH_MS = 1000
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF_MS = 500
+GROWTH_FACTOR = 1.25
+SHRINK_FACTOR = 0.5
+
+
+class AdaptiveBatchSize:
+    """Additive-increase/multiplicative-decrease controller for the batch size."""
+
+    def __init__(self, initial: int, maximum: int, target_ms: float) -> None:
+        self.maximum = max(1, maximum)
+        self.size = float(min(max(1, initial), self.maximum))
+        self.target_ms = target_ms
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> int:
+        return int(self.size)
+
+    def observe(self, count: int, latency_ms: float) -> None:
+        with self._lock:
+            if latency_ms > self.target_ms:
+                self.size = max(1.0, self.size * SHRINK_FACTOR)
+            elif count >= int(self.size):
+                # Only full batches say anything about whether a bigger one would fit.
+                self.size = min(float(self.maximum), max(self.size + 1, self.size * GROWTH_FACTOR))
+
+    def failed(self) -> None:
+        with self._lock:
+            self.size = max(1.0, self.size * SHRINK_FACTOR)
+
+
+def _retryable(exc: BaseException) -> bool:
+    status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    # Client errors other than throttling will fail the same way again.
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+class OllamaEmbeddings:
+    def __init__(
+        self,
+        model: str,
+        base_url: str,
+        timeout: int,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        *,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_batch_chars: int = DEFAULT_MAX_BATCH_CHARS,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        target_batch_ms: float = DEFAULT_TARGET_BATCH_MS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_backoff_ms: float = DEFAULT_RETRY_BACKOFF_MS,
+    ) -> None:
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.max_batch_chars = max(1, max_batch_chars)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff_ms = retry_backoff_ms
+        # Shared across calls, so a long index build keeps what it learned between add_documents batches.
+        self.sizer = AdaptiveBatchSize(batch_size, max(batch_size, max_batch_size), target_batch_ms)
+
+    def _post(self, batch: List[str]) -> List[List[float]]:
+        response = get_requests_session("ollama").post(
+            f"{self.base_url}/api/embed",
+            json={"model": self.model, "input": batch},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        batch_embeddings = data.get("embeddings")
+        if not isinstance(batch_embeddings, list) or len(batch_embeddings) != len(batch):
+            raise ValueError("Ollama embedding response did not include one embedding per input")
+        return batch_embeddings
+
+    def _post_with_retry(self, batch: List[str]) -> Tuple[List[List[float]], float]:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                vectors = self._post(batch)
+            except Exception as exc:  # pylint: disable=broad-except
+                if attempt >= self.max_retries or not _retryable(exc):
+                    raise
+                self.sizer.failed()
+                registry.counter("ollama_embed.retries").inc()
+                delay_ms = self.retry_backoff_ms * (2 ** attempt) * random.uniform(0.5, 1.5)
+                attempt += 1
+                logger.warning(
+                    "Embedding batch of %s failed (%s); retry %s/%s in %.0f ms",
+                    len(batch), exc, attempt, self.max_retries, delay_ms,
+                )
+                time.sleep(delay_ms / 1000.0)
+                continue
+            return vectors, (time.perf_counter() - started) * 1000.0
+
+    def _next_batch(self, texts: List[str], start: int) -> int:
+        """End index of the next batch starting at ``start``."""
+        end = start
+        chars = 0
+        limit = min(len(texts), start + self.sizer.current)
+        while end < limit:
+            chars += len(texts[end])
+            if end > start and chars > self.max_batch_chars:
+                break
+            end += 1
+        return end
+
+    def _observe(self, count: int, latency_ms: float) -> None:
+        self.sizer.observe(count, latency_ms)
+        registry.histogram("ollama_embed.batch_ms").observe(latency_ms)
+        registry.gauge("ollama_embed.batch_size").set(self.sizer.current)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self._next_batch(texts, 0) == len(texts):
+            vectors, latency_ms = self._post_with_retry(list(texts))
+            self._observe(len(texts), latency_ms)
+            return vectors
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        in_flight: Dict[Future, Tuple[int, int]] = {}
+        cursor = 0
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="ollama-embed") as pool:
+            try:
+                while cursor < len(texts) or in_flight:
+                    while cursor < len(texts) and len(in_flight) < self.max_in_flight:
+                        end = self._next_batch(texts, cursor)
+                        in_flight[pool.submit(self._post_with_retry, texts[cursor:end])] = (cursor, end)
+                        cursor = end
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start, end = in_flight.pop(future)
+                        vectors, latency_ms = future.result()
+                        results[start:end] = vectors
+                        self._observe(end - start, latency_ms)
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
+        return results  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._post_with_retry([text])[0][0]
+
+    def __call__(self, text: str) -> List[float]:
+        return self.embed_query(text)
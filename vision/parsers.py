@@ -0,0 +1,80 @@
+import hashlib
+import os
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import BaseParser
+
+from .image_preprocessing import ImageUpload
+
+DEFAULT_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "이미지 크기가 너무 큽니다."
+    default_code = "image_too_large"
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def max_upload_bytes() -> int:
+    return int(_setting("VISION_UPLOAD_MAX_BYTES", DEFAULT_UPLOAD_MAX_BYTES))
+
+
+def read_image_chunks(chunks: Iterable[bytes]) -> ImageUpload:
+    """Buffer an upload, hashing each chunk as it arrives instead of rescanning the whole body."""
+    limit = max_upload_bytes()
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    for chunk in chunks:
+        if len(buffer) + len(chunk) > limit:
+            raise ImageTooLarge()
+        digest.update(chunk)
+        buffer.extend(chunk)
+    return ImageUpload(bytes(buffer), digest.hexdigest())
+
+
+def read_image_stream(stream) -> ImageUpload:
+    if stream is None:
+        return ImageUpload(b"", hashlib.sha256().hexdigest())
+    return read_image_chunks(iter(lambda: stream.read(READ_CHUNK_BYTES), b""))
+
+
+def image_upload_from(value: Any) -> Optional[ImageUpload]:
+    """
+    Normalize the ``image`` field of a request: a base64 string from a JSON body,
+    a file from ``multipart/form-data`` or a body already read by ``RawImageParser``.
+
+    Raises ``ValueError`` for undecodable base64 and ``ImageTooLarge`` past
+    ``VISION_UPLOAD_MAX_BYTES``.
+    """
+    if isinstance(value, ImageUpload):
+        return value
+    if isinstance(value, UploadedFile):
+        if value.size is not None and value.size > max_upload_bytes():
+            raise ImageTooLarge()
+        return read_image_chunks(value.chunks(READ_CHUNK_BYTES))
+    if isinstance(value, str) and value:
+        return ImageUpload.from_base64(value)
+    return None
+
+
+class RawImageParser(BaseParser):
+    """
+    Accept the image itself as the request body (``Content-Type: image/jpeg`` etc.).
+
+    The parsed data is ``{"image": ImageUpload}``, the same shape the JSON and
+    multipart bodies produce.
+    """
+
+    media_type = "image/*"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {"image": read_image_stream(stream)}
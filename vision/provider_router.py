@@ -0,0 +1,366 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EWMA_ALPHA = 0.2
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_ERROR_RATE_THRESHOLD = 0.5
+DEFAULT_MIN_CALLS_FOR_ERROR_RATE = 10
+DEFAULT_COOLDOWN_SECONDS = 30
+DEFAULT_ERROR_PENALTY_MS = 5000
+DEFAULT_SCORE_HALF_LIFE_SECONDS = 300
+DEFAULT_SCORE_TOLERANCE = 0.25
+DEFAULT_SCORE_TOLERANCE_MS = 50
+RECENT_DECISIONS = 50
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProvidersUnavailable(Exception):
+    """Every eligible backend has an open circuit."""
+
+
+class ProvidersExhausted(ProvidersUnavailable):
+    """Every backend that ran returned a result ``is_failure`` rejected; the last one is attached."""
+
+    def __init__(self, message: str, last_result: Any) -> None:
+        super().__init__(message)
+        self.last_result = last_result
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+class BackendHealth:
+    """
+    EWMA latency / error rate and a circuit breaker for one backend.
+
+    The breaker opens after ``PROVIDER_BREAKER_FAILURE_THRESHOLD`` consecutive
+    failures, or when the EWMA error rate crosses ``PROVIDER_BREAKER_ERROR_RATE``.
+    After ``PROVIDER_BREAKER_COOLDOWN_SECONDS`` a single half-open probe is let
+    through; its outcome closes or re-opens the circuit.
+
+    Measurements go stale: with no traffic the weight of the averages halves every
+    ``PROVIDER_SCORE_HALF_LIFE_SECONDS`` (0 disables it), so ``score`` drifts back
+    to the optimistic prior of an unmeasured backend and the next sample mostly
+    replaces the old average. A backend that was slow once is retried and can
+    recover instead of being ranked last forever.
+    """
+
+    def __init__(self, kind: str, name: str, label: str = "") -> None:
+        self.kind = kind
+        self.name = name
+        self.label = label
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.ewma_latency_ms: Optional[float] = None
+        self.ewma_error_rate = 0.0
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.observed_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.last_error = ""
+
+    @staticmethod
+    def _alpha() -> float:
+        return float(_setting("PROVIDER_EWMA_ALPHA", DEFAULT_EWMA_ALPHA))
+
+    def _cooldown(self) -> float:
+        return float(_setting("PROVIDER_BREAKER_COOLDOWN_SECONDS", DEFAULT_COOLDOWN_SECONDS))
+
+    def try_acquire(self, now: float) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.opened_at is not None and now - self.opened_at >= self._cooldown():
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def is_eligible(self, now: float) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                return not self.probe_in_flight
+            return self.opened_at is not None and now - self.opened_at >= self._cooldown()
+
+    def release_probe(self) -> None:
+        with self._lock:
+            self.probe_in_flight = False
+
+    def _freshness(self, now: float) -> float:
+        """Weight left on the averages ``now``: 1.0 when just measured, halving per half-life."""
+        half_life = float(_setting("PROVIDER_SCORE_HALF_LIFE_SECONDS", DEFAULT_SCORE_HALF_LIFE_SECONDS))
+        if self.observed_at is None or half_life <= 0:
+            return 1.0
+        return 0.5 ** (max(0.0, now - self.observed_at) / half_life)
+
+    def _observe(self, latency_ms: float, failed: bool, now: float) -> None:
+        # The old averages keep (1 - alpha) of their weight, less whatever went stale.
+        keep = (1 - self._alpha()) * self._freshness(now)
+        if self.ewma_latency_ms is None:
+            self.ewma_latency_ms = latency_ms
+        else:
+            self.ewma_latency_ms = (1 - keep) * latency_ms + keep * self.ewma_latency_ms
+        self.ewma_error_rate = (1 - keep) * float(failed) + keep * self.ewma_error_rate
+        self.observed_at = now
+
+    def record_success(self, latency_ms: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self._observe(latency_ms, False, time.monotonic())
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info("%s backend %s recovered, closing circuit", self.kind, self.name)
+            self.state = CLOSED
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self, latency_ms: float, error: str = "") -> None:
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            # A fast failure must not make the backend look quick.
+            self._observe(max(latency_ms, self.ewma_latency_ms or 0.0), True, time.monotonic())
+            self.consecutive_failures += 1
+            self.last_error = error[:300]
+
+            failure_threshold = int(_setting("PROVIDER_BREAKER_FAILURE_THRESHOLD", DEFAULT_FAILURE_THRESHOLD))
+            error_rate_threshold = float(_setting("PROVIDER_BREAKER_ERROR_RATE", DEFAULT_ERROR_RATE_THRESHOLD))
+            min_calls = int(_setting("PROVIDER_BREAKER_MIN_CALLS", DEFAULT_MIN_CALLS_FOR_ERROR_RATE))
+            should_open = (
+                self.state == HALF_OPEN
+                or self.consecutive_failures >= failure_threshold
+                or (self.calls >= min_calls and self.ewma_error_rate >= error_rate_threshold)
+            )
+            if should_open:
+                if self.state != OPEN:
+                    logger.warning(
+                        "%s backend %s tripped its circuit breaker (%s consecutive failures, error rate %.2f)",
+                        self.kind,
+                        self.name,
+                        self.consecutive_failures,
+                        self.ewma_error_rate,
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def score(self, now: Optional[float] = None) -> float:
+        # Unmeasured backends score as instantly fast so each one gets tried early;
+        # stale measurements decay toward that prior.
+        now = time.monotonic() if now is None else now
+        latency = self.ewma_latency_ms or 0.0
+        penalty_ms = float(_setting("PROVIDER_ERROR_PENALTY_MS", DEFAULT_ERROR_PENALTY_MS))
+        return (latency + penalty_ms * self.ewma_error_rate) * self._freshness(now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN and self.opened_at is not None:
+                retry_in = max(0.0, self._cooldown() - (time.monotonic() - self.opened_at))
+            return {
+                "backend": self.name,
+                "label": self.label,
+                "state": self.state,
+                "ewma_latency_ms": self.ewma_latency_ms,
+                "ewma_error_rate": round(self.ewma_error_rate, 4),
+                "consecutive_failures": self.consecutive_failures,
+                "calls": self.calls,
+                "failures": self.failures,
+                "half_open_retry_in_seconds": retry_in,
+                "last_error": self.last_error,
+                "score": self.score(),
+            }
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.monotonic() - started) * 1000.0
+
+
+class ProviderRouter:
+    """
+    Orders eligible backends by health for each call and records the outcome.
+
+    State is per worker process; each gunicorn worker learns backend health from
+    its own traffic.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._backends: Dict[Tuple[str, str], BackendHealth] = {}
+        self._decisions: deque = deque(maxlen=RECENT_DECISIONS)
+
+    def backend(self, kind: str, name: str, label: str = "") -> BackendHealth:
+        key = (kind, name)
+        with self._lock:
+            health = self._backends.get(key)
+            if health is None:
+                health = BackendHealth(kind, name, label)
+                self._backends[key] = health
+            elif label:
+                health.label = label
+            return health
+
+    def plan(self, kind: str, candidates: Sequence[str], labels: Optional[Dict[str, str]] = None) -> List[str]:
+        labels = labels or {}
+        now = time.monotonic()
+        healths = [self.backend(kind, name, labels.get(name, "")) for name in candidates]
+        eligible = [health for health in healths if health.is_eligible(now)]
+        if not eligible:
+            return []
+        scores = {health.name: health.score(now) for health in eligible}
+        # Backends within the tolerance band of the best score keep the configured
+        # priority; noise of a few milliseconds should not reorder them.
+        best = min(scores.values())
+        tolerance = float(_setting("PROVIDER_SCORE_TOLERANCE", DEFAULT_SCORE_TOLERANCE))
+        tolerance_ms = float(_setting("PROVIDER_SCORE_TOLERANCE_MS", DEFAULT_SCORE_TOLERANCE_MS))
+        band_limit = best * (1 + tolerance) + tolerance_ms
+        preferred = [health.name for health in eligible if scores[health.name] <= band_limit]
+        # Stable sort keeps the configured priority among equally healthy backends.
+        rest = sorted((health.name for health in eligible if scores[health.name] > band_limit), key=scores.get)
+        return preferred + rest
+
+    def call(
+        self,
+        kind: str,
+        candidates: Sequence[str],
+        invoke: Callable[[str], Any],
+        is_failure: Callable[[Any], bool] = lambda result: False,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Any:
+        """
+        Invoke the healthiest eligible backend, falling through to the next one on
+        failure. Raises ``ProvidersUnavailable`` when every circuit is open,
+        ``ProvidersExhausted`` (carrying the last rejected result) when every
+        backend that answered was rejected by ``is_failure``, or re-raises the last
+        backend exception when no backend produced a result.
+        """
+        order = self.plan(kind, candidates, labels)
+        attempts: List[Dict[str, Any]] = []
+        last_result: Any = None
+        last_error: Optional[BaseException] = None
+        has_result = False
+
+        for name in order:
+            health = self.backend(kind, name)
+            if not health.try_acquire(time.monotonic()):
+                continue
+
+            started = time.monotonic()
+            try:
+                result = invoke(name)
+            except Exception as exc:  # pylint: disable=broad-except
+                latency_ms = _elapsed_ms(started)
+                health.record_failure(latency_ms, str(exc))
+                attempts.append({"backend": name, "outcome": "exception", "latency_ms": round(latency_ms, 1)})
+                last_error = exc
+                continue
+
+            latency_ms = _elapsed_ms(started)
+            last_result, has_result = result, True
+            if is_failure(result):
+                health.record_failure(latency_ms, str(result))
+                attempts.append({"backend": name, "outcome": "failure", "latency_ms": round(latency_ms, 1)})
+                continue
+
+            health.record_success(latency_ms)
+            attempts.append({"backend": name, "outcome": "success", "latency_ms": round(latency_ms, 1)})
+            self._record_decision(kind, candidates, order, attempts)
+            return result
+
+        self._record_decision(kind, candidates, order, attempts)
+        if has_result:
+            raise ProvidersExhausted(f"Every {kind} backend returned an unusable result", last_result)
+        if last_error is not None:
+            raise last_error
+        raise ProvidersUnavailable(f"No {kind} backend available; open circuits: {', '.join(candidates)}")
+
+    def stream(
+        self,
+        kind: str,
+        candidates: Sequence[str],
+        open_stream: Callable[[str], Iterable[Any]],
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Iterator[Any]:
+        """
+        Streaming counterpart of ``call``. A backend that fails before yielding
+        anything falls through to the next one; a failure after the first item is
+        recorded and re-raised, since the caller has already consumed part of it.
+        """
+        order = self.plan(kind, candidates, labels)
+        attempts: List[Dict[str, Any]] = []
+        last_error: Optional[BaseException] = None
+
+        for name in order:
+            health = self.backend(kind, name)
+            if not health.try_acquire(time.monotonic()):
+                continue
+
+            started = time.monotonic()
+            produced = recorded = False
+            try:
+                for item in open_stream(name):
+                    produced = True
+                    yield item
+                recorded = True
+                health.record_success(_elapsed_ms(started))
+                attempts.append({"backend": name, "outcome": "success", "latency_ms": round(_elapsed_ms(started), 1)})
+                self._record_decision(kind, candidates, order, attempts)
+                return
+            except Exception as exc:  # pylint: disable=broad-except
+                recorded = True
+                health.record_failure(_elapsed_ms(started), str(exc))
+                attempts.append({"backend": name, "outcome": "exception", "latency_ms": round(_elapsed_ms(started), 1)})
+                if produced:
+                    self._record_decision(kind, candidates, order, attempts)
+                    raise
+                last_error = exc
+            finally:
+                # The consumer closed the stream early; free a half-open probe slot.
+                if not recorded:
+                    health.release_probe()
+
+        self._record_decision(kind, candidates, order, attempts)
+        if last_error is not None:
+            raise last_error
+        raise ProvidersUnavailable(f"No {kind} backend available; open circuits: {', '.join(candidates)}")
+
+    def _record_decision(self, kind: str, candidates: Sequence[str], order: List[str], attempts: List[dict]) -> None:
+        self._decisions.append({
+            "at": time.time(),
+            "kind": kind,
+            "configured": list(candidates),
+            "routed_order": order,
+            "attempts": attempts,
+        })
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            backends = list(self._backends.values())
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for health in backends:
+            grouped.setdefault(health.kind, []).append(health.snapshot())
+        return {
+            "backends": grouped,
+            "recent_decisions": list(self._decisions),
+        }
+
+
+router = ProviderRouter()
@@ -0,0 +1,358 @@
+"""
+Incremental, deduplicated ingestion of the nutrition PDF corpus.
+
+A JSON manifest next to the vector index records the sha256 of every ingested
+PDF and the ids of the chunks it contributed. Chunk ids are the sha256 of the
+chunk text, so they are stable across runs and double as vector store ids.
+
+A sync only parses PDFs whose content hash is not in the manifest yet, skips
+byte-identical copies of a file that is already ingested, skips chunks another
+file already contributed, and deletes the vectors of PDFs that were removed or
+changed. Every sync that changes the index bumps the manifest ``version``.
+
+PDFs are parsed and split on a process pool, one file per task, and chunks are
+handed to the embedding stage in batches as files finish instead of after the
+whole corpus is loaded.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "ingestion_manifest.json"
+MANIFEST_FORMAT = 1
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+HASH_BLOCK_BYTES = 1024 * 1024
+DEFAULT_EMBED_BATCH_SIZE = 256
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def list_pdfs(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(".pdf") and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000.0
+
+
+def parse_pdf(path: str) -> Tuple[List[Any], Dict[str, float]]:
+    """
+    Parse one PDF and split it the same way the index has always been built.
+
+    Runs in pool workers, so it only touches the file and the langchain loaders.
+    """
+    started = time.perf_counter()
+    documents = PyPDFLoader(path).load()
+    load_ms = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    source_file = os.path.basename(path)
+    for doc in documents:
+        doc.page_content += f"\nSource: {source_file}"
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = splitter.split_documents(documents)
+    return chunks, {"load_ms": load_ms, "split_ms": _elapsed_ms(started)}
+
+
+def load_pdf_chunks(path: str) -> List[Any]:
+    return parse_pdf(path)[0]
+
+
+def iter_parsed_pdfs(
+    paths: List[str], workers: int
+) -> Iterator[Tuple[str, Optional[List[Any]], Dict[str, float], Optional[BaseException]]]:
+    """
+    Yield ``(path, chunks, timings, error)`` per PDF in completion order, parsing
+    one PDF per task on ``workers`` processes (in-process when ``workers`` <= 1).
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            try:
+                chunks, timings = parse_pdf(path)
+            except Exception as exc:  # pylint: disable=broad-except
+                yield path, None, {}, exc
+            else:
+                yield path, chunks, timings, None
+        return
+
+    # spawn, not fork: the caller may be a threaded web worker.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=context) as pool:
+        futures = {pool.submit(parse_pdf, path): path for path in paths}
+        try:
+            for future in as_completed(futures):
+                try:
+                    chunks, timings = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    yield futures[future], None, {}, exc
+                else:
+                    yield futures[future], chunks, timings, None
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+class IngestionManifest:
+    def __init__(self, path: str, data: Optional[Dict[str, Any]] = None) -> None:
+        data = data or {}
+        self.path = path
+        self.version = int(data.get("version", 0))
+        # file key -> {"sha256": ..., "chunks": [ids]} or {"sha256": ..., "duplicate_of": key}
+        self.files: Dict[str, Dict[str, Any]] = data.get("files", {})
+        # chunk id -> file keys whose chunks produced it
+        self.chunks: Dict[str, List[str]] = data.get("chunks", {})
+
+    @classmethod
+    def load(cls, path: str) -> "IngestionManifest":
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable ingestion manifest %s: %s", path, exc)
+            return cls(path)
+        if data.get("format") != MANIFEST_FORMAT:
+            logger.warning("Ignoring ingestion manifest %s with unknown format %s", path, data.get("format"))
+            return cls(path)
+        return cls(path, data)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"format": MANIFEST_FORMAT, "version": self.version, "files": self.files, "chunks": self.chunks},
+                handle,
+                ensure_ascii=False,
+                indent=1,
+                sort_keys=True,
+            )
+        # Readers in other workers never see a half-written manifest.
+        os.replace(temp_path, self.path)
+
+    def ingested_by_sha(self) -> Dict[str, str]:
+        return {
+            entry["sha256"]: key
+            for key, entry in self.files.items()
+            if not entry.get("duplicate_of")
+        }
+
+    def release(self, key: str) -> Set[str]:
+        """Forget a file and return the chunk ids no other file references any more."""
+        entry = self.files.pop(key, None) or {}
+        orphaned: Set[str] = set()
+        for cid in entry.get("chunks", []):
+            owners = [owner for owner in self.chunks.get(cid, []) if owner != key]
+            if owners:
+                self.chunks[cid] = owners
+            else:
+                self.chunks.pop(cid, None)
+                orphaned.add(cid)
+        return orphaned
+
+
+@dataclass
+class SyncReport:
+    version: int = 0
+    files_added: List[str] = field(default_factory=list)
+    files_removed: List[str] = field(default_factory=list)
+    duplicate_files: List[str] = field(default_factory=list)
+    failed_files: List[str] = field(default_factory=list)
+    chunks_added: int = 0
+    chunks_deleted: int = 0
+    chunks_deduplicated: int = 0
+    # Stage -> milliseconds. load/split are summed over pool workers, so they can exceed total.
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def format_timings(self) -> str:
+        return ", ".join(f"{stage[:-3]} {elapsed:.0f} ms" for stage, elapsed in self.timings.items())
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.files_added or self.files_removed or self.chunks_added or self.chunks_deleted)
+
+
+def _file_key(path: str, base_dir: str) -> str:
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(base_dir))
+    key = os.path.abspath(path) if relative.startswith("..") else relative
+    return key.replace(os.sep, "/")
+
+
+def _in_directory(key: str, directory_key: str) -> bool:
+    return directory_key in {"", "."} or key.startswith(f"{directory_key}/")
+
+
+def _stored_ids(store: Any) -> Optional[Set[str]]:
+    # FAISS keeps its ids in memory; a manifest saved before a crash may lag behind them.
+    mapping = getattr(store, "index_to_docstore_id", None)
+    return set(mapping.values()) if isinstance(mapping, dict) else None
+
+
+def sync_directory(
+    directory: str,
+    manifest: IngestionManifest,
+    store: Optional[Any],
+    *,
+    create_store: Callable[[List[Any], List[str]], Any],
+    base_dir: str,
+    workers: int = 1,
+    embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+) -> Tuple[Optional[Any], SyncReport]:
+    """
+    Bring ``store`` in line with the PDFs currently in ``directory``.
+
+    Only manifest entries under ``directory`` are considered for removal, so
+    syncing a drop folder of new PDFs leaves the rest of the corpus alone.
+    ``create_store(documents, ids)`` builds the store when ``store`` is None.
+    New PDFs are parsed by ``workers`` processes and their chunks are embedded
+    in batches of ``embed_batch_size`` while the remaining files are still
+    being parsed. The caller persists the store and then saves the manifest.
+    """
+    started = time.perf_counter()
+    report = SyncReport(version=manifest.version)
+    directory_key = _file_key(directory, base_dir)
+    current = {_file_key(path, base_dir): path for path in list_pdfs(directory)}
+    hashes = {key: file_sha256(path) for key, path in current.items()}
+    report.timings["hash_ms"] = _elapsed_ms(started)
+
+    orphaned: Set[str] = set()
+    for key in [key for key in manifest.files if _in_directory(key, directory_key)]:
+        entry = manifest.files[key]
+        if entry.get("duplicate_of"):
+            # Re-decided below; the file it duplicated may be gone now.
+            manifest.files.pop(key)
+            continue
+        if hashes.get(key) != entry["sha256"]:
+            orphaned |= manifest.release(key)
+            report.files_removed.append(key)
+
+    ingested = manifest.ingested_by_sha()
+    to_parse: Dict[str, str] = {}
+    copies: Dict[str, List[str]] = {}
+    # Shortest name first, so "x.pdf" is ingested and "x (1).pdf" is recorded as its copy.
+    for key in sorted(current, key=lambda key: (len(key), key)):
+        sha = hashes[key]
+        if key in manifest.files:
+            continue
+        if sha in ingested:
+            manifest.files[key] = {"sha256": sha, "duplicate_of": ingested[sha]}
+            report.duplicate_files.append(key)
+        elif sha in to_parse:
+            copies[to_parse[sha]].append(key)
+        else:
+            to_parse[sha] = key
+            copies[key] = []
+
+    stored = _stored_ids(store) if store is not None else None
+    pending_documents: List[Any] = []
+    pending_ids: List[str] = []
+
+    def flush() -> None:
+        nonlocal store
+        if not pending_documents:
+            return
+        flush_started = time.perf_counter()
+        if store is None:
+            store = create_store(list(pending_documents), list(pending_ids))
+        else:
+            store.add_documents(list(pending_documents), ids=list(pending_ids))
+        report.timings["embed_ms"] = report.timings.get("embed_ms", 0.0) + _elapsed_ms(flush_started)
+        report.chunks_added += len(pending_documents)
+        del pending_documents[:], pending_ids[:]
+
+    paths = [current[key] for key in to_parse.values()]
+    keys_by_path = {current[key]: key for key in to_parse.values()}
+    for path, chunks, timings, error in iter_parsed_pdfs(paths, workers):
+        key = keys_by_path[path]
+        for stage, elapsed in timings.items():
+            report.timings[stage] = report.timings.get(stage, 0.0) + elapsed
+        if error is not None:
+            # Not recorded, so the next sync retries the file and its copies.
+            logger.error("Failed to parse %s, skipping it: %s", path, error)
+            report.failed_files.append(key)
+            continue
+
+        chunk_ids: List[str] = []
+        seen: Set[str] = set()
+        for chunk in chunks:
+            cid = chunk_id(chunk.page_content)
+            if cid in seen:
+                report.chunks_deduplicated += 1
+                continue
+            seen.add(cid)
+            chunk_ids.append(cid)
+            owners = manifest.chunks.setdefault(cid, [])
+            owners.append(key)
+            if len(owners) > 1:
+                report.chunks_deduplicated += 1
+            elif cid in orphaned:
+                # A changed file kept this chunk; its vector is still in the store.
+                orphaned.discard(cid)
+            elif stored is None or cid not in stored:
+                pending_documents.append(chunk)
+                pending_ids.append(cid)
+        sha = hashes[key]
+        manifest.files[key] = {"sha256": sha, "chunks": chunk_ids}
+        for copy in copies[key]:
+            manifest.files[copy] = {"sha256": sha, "duplicate_of": key}
+            report.duplicate_files.append(copy)
+        report.files_added.append(key)
+        if len(pending_documents) >= embed_batch_size:
+            flush()
+    flush()
+
+    if stored is not None:
+        orphaned &= stored
+    if orphaned and store is not None:
+        delete_started = time.perf_counter()
+        store.delete(ids=sorted(orphaned))
+        report.timings["delete_ms"] = _elapsed_ms(delete_started)
+        report.chunks_deleted = len(orphaned)
+
+    if report.changed:
+        manifest.version += 1
+    report.version = manifest.version
+    report.timings["total_ms"] = _elapsed_ms(started)
+    logger.info(
+        "Synced %s (index version %s): %s files added, %s removed, %s duplicate files skipped, "
+        "%s chunks added, %s deleted, %s duplicate chunks skipped; %s",
+        directory, report.version, len(report.files_added), len(report.files_removed),
+        len(report.duplicate_files), report.chunks_added, report.chunks_deleted, report.chunks_deduplicated,
+        report.format_timings(),
+    )
+    return store, report
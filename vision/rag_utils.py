@@ -3,27 +3,61 @@ import json
 import logging
 import os
 import re
-from typing import Any, Dict, Iterable, List, Optional, cast
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, cast
 
-import requests
 from django.conf import settings
 from django.core.cache import cache
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
 from langchain_community.vectorstores import Chroma, FAISS
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from vision.models import UserPregnancyProfile
+from langchain_openai import ChatOpenAI
+from project_template.http_clients import get_chat_openai, get_openai_embeddings
+from vision import guidance_cache, guidance_store, ollama_client
+from vision.compact_index import CompactIndex, export_compact, read_pointer
+from vision.embedding_cache import (
+    DEFAULT_CACHE_FILE as DEFAULT_EMBEDDING_CACHE_FILE,
+    CachedEmbeddings,
+    embedding_cache_enabled,
+    get_embedding_store,
+)
+from vision.guidance_cache import NEUTRAL_STYLE
+from vision.metrics import registry
+from vision.models import ResponseStyle, UserPregnancyProfile
+from vision.ollama_embeddings import (
+    DEFAULT_MAX_BATCH_CHARS as DEFAULT_OLLAMA_EMBED_MAX_BATCH_CHARS,
+    DEFAULT_MAX_BATCH_SIZE as DEFAULT_OLLAMA_EMBED_MAX_BATCH_SIZE,
+    DEFAULT_MAX_IN_FLIGHT as DEFAULT_OLLAMA_EMBED_CONCURRENCY,
+    DEFAULT_MAX_RETRIES as DEFAULT_OLLAMA_EMBED_MAX_RETRIES,
+    DEFAULT_TARGET_BATCH_MS as DEFAULT_OLLAMA_EMBED_TARGET_BATCH_MS,
+    OllamaEmbeddings,
+)
+from vision.provider_router import router as provider_router
+from vision.rag_ingestion import (
+    DEFAULT_EMBED_BATCH_SIZE as DEFAULT_INGEST_EMBED_BATCH_SIZE,
+    MANIFEST_FILE,
+    IngestionManifest,
+    SyncReport,
+    chunk_id,
+    iter_parsed_pdfs,
+    list_pdfs,
+    sync_directory,
+)
+from vision.singleflight import guidance_flight
+from vision.vector_index import INDEX_TYPES as FAISS_INDEX_TYPES, IndexParams, rebuild_from
 
+ResponseStyle = cast(Any, ResponseStyle)
 UserPregnancyProfile = cast(Any, UserPregnancyProfile)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-GUIDANCE_CACHE_TIMEOUT = 1800
+DEFAULT_GUIDANCE_BASE_CACHE_SECONDS = 1800
+DEFAULT_GUIDANCE_STYLE_CACHE_SECONDS = 1800
 DEFAULT_LOCAL_RAG_MODEL = "gemma4:e4b"
 DEFAULT_LOCAL_EMBED_MODEL = "bge-m3"
 DEFAULT_OPENAI_RAG_MODEL = "gpt-4o-mini"
 DEFAULT_RETRIEVAL_K = 5
+DEFAULT_RETRIEVAL_CACHE_SECONDS = 7 * 24 * 3600
+UNRESOLVABLE_IDS_LOG_EVERY = 1000
 DEFAULT_OLLAMA_TIMEOUT_SECONDS = 120
 DEFAULT_OLLAMA_EMBED_BATCH_SIZE = 16
 
@@ -38,12 +72,28 @@ GUIDANCE_SCHEMA = {
     "additionalProperties": False,
 }
 
+# styled field -> base field it restyles, for answers that fill both cache layers at once
+STYLED_GUIDANCE_FIELDS = {
+    "styled_safety_summary": "safety_summary",
+    "styled_nutritional_advice": "nutritional_advice",
+}
+
+LAYERED_GUIDANCE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **GUIDANCE_SCHEMA["properties"],
+        **{field: {"type": "string"} for field in STYLED_GUIDANCE_FIELDS},
+    },
+    "required": [*GUIDANCE_SCHEMA["required"], *STYLED_GUIDANCE_FIELDS],
+    "additionalProperties": False,
+}
+
 RAG_SYSTEM_PROMPT = (
     "You are a cautious prenatal nutrition assistant. Use the provided retrieved "
     "context when it is relevant. If the context is incomplete, say so briefly "
     "inside the summary and give conservative general guidance. Return only valid "
-    "JSON with keys safety_summary, is_safe, and nutritional_advice. Write the "
-    "values in Korean. Do not include markdown, citations, or extra fields."
+    "JSON with keys {keys}. Write the values in Korean. Do not include markdown, "
+    "citations, or extra fields."
 )
 
 
@@ -63,6 +113,29 @@ def _rag_provider() -> str:
     return str(_setting("RAG_PROVIDER", _vision_provider())).strip().lower()
 
 
+def _rag_providers() -> List[str]:
+    """
+    Guidance LLM backends the router may pick from, in priority order. Embeddings
+    stay on ``EMBEDDING_PROVIDER`` because the index is tied to one embedding model.
+    """
+    configured = _setting("RAG_PROVIDERS") or _rag_provider()
+    if isinstance(configured, str):
+        configured = configured.split(",")
+    providers = []
+    for name in configured:
+        name = str(name).strip().lower()
+        if name:
+            providers.append("ollama" if name in {"ollama", "local"} else "openai")
+    return list(dict.fromkeys(providers))
+
+
+def _rag_provider_labels() -> Dict[str, str]:
+    return {
+        "ollama": _ollama_rag_model(),
+        "openai": str(_setting("OPENAI_RAG_MODEL", DEFAULT_OPENAI_RAG_MODEL)),
+    }
+
+
 def _embedding_provider() -> str:
     return str(_setting("EMBEDDING_PROVIDER", _rag_provider())).strip().lower()
 
@@ -102,49 +175,27 @@ def _active_index_name(base_index_name: str = "nutrition_index") -> str:
     return base_index_name
 
 
-class OllamaEmbeddings:
-    def __init__(self, model: str, base_url: str, timeout: int, batch_size: int) -> None:
-        self.model = model
-        self.base_url = base_url.rstrip("/")
-        self.timeout = timeout
-        self.batch_size = batch_size
-
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        embeddings: List[List[float]] = []
-        for start in range(0, len(texts), self.batch_size):
-            batch = texts[start:start + self.batch_size]
-            response = requests.post(
-                f"{self.base_url}/api/embed",
-                json={"model": self.model, "input": batch},
-                timeout=self.timeout,
-            )
-            response.raise_for_status()
-            data = response.json()
-            batch_embeddings = data.get("embeddings")
-            if not isinstance(batch_embeddings, list):
-                raise ValueError("Ollama embedding response did not include embeddings")
-            embeddings.extend(batch_embeddings)
-        return embeddings
-
-    def embed_query(self, text: str) -> List[float]:
-        return self.embed_documents([text])[0]
-
-    def __call__(self, text: str) -> List[float]:
-        return self.embed_query(text)
+def _ollama_embeddings() -> OllamaEmbeddings:
+    return OllamaEmbeddings(
+        model=_ollama_embed_model(),
+        base_url=_ollama_base_url(),
+        timeout=_ollama_timeout_seconds(),
+        batch_size=int(_setting("OLLAMA_EMBED_BATCH_SIZE", DEFAULT_OLLAMA_EMBED_BATCH_SIZE)),
+        max_batch_size=int(_setting("OLLAMA_EMBED_MAX_BATCH_SIZE", DEFAULT_OLLAMA_EMBED_MAX_BATCH_SIZE)),
+        max_batch_chars=int(_setting("OLLAMA_EMBED_MAX_BATCH_CHARS", DEFAULT_OLLAMA_EMBED_MAX_BATCH_CHARS)),
+        max_in_flight=int(_setting("OLLAMA_EMBED_CONCURRENCY", DEFAULT_OLLAMA_EMBED_CONCURRENCY)),
+        target_batch_ms=float(_setting("OLLAMA_EMBED_TARGET_BATCH_MS", DEFAULT_OLLAMA_EMBED_TARGET_BATCH_MS)),
+        max_retries=int(_setting("OLLAMA_EMBED_MAX_RETRIES", DEFAULT_OLLAMA_EMBED_MAX_RETRIES)),
+    )
 
 
 def initialize_embeddings(api_key: str) -> Any:
     if _embedding_provider() in {"ollama", "local"}:
         logger.info("Initializing Ollama embeddings with model %s", _ollama_embed_model())
-        return OllamaEmbeddings(
-            model=_ollama_embed_model(),
-            base_url=_ollama_base_url(),
-            timeout=_ollama_timeout_seconds(),
-            batch_size=int(_setting("OLLAMA_EMBED_BATCH_SIZE", DEFAULT_OLLAMA_EMBED_BATCH_SIZE)),
-        )
+        return _ollama_embeddings()
 
     try:
-        embeddings = OpenAIEmbeddings(openai_api_key=api_key)
+        embeddings = get_openai_embeddings(api_key)
         logger.info("OpenAI embeddings initialized successfully.")
         return embeddings
     except Exception as e:
@@ -152,14 +203,31 @@ def initialize_embeddings(api_key: str) -> Any:
         raise
 
 
+def _embedding_cache_path() -> str:
+    return str(_setting(
+        "RAG_EMBEDDING_CACHE_PATH",
+        os.path.join(_base_dir(), "nutrition_index", DEFAULT_EMBEDDING_CACHE_FILE),
+    ))
+
+
+def _with_embedding_cache(embeddings: Any) -> Any:
+    if not embedding_cache_enabled():
+        return embeddings
+    if _embedding_provider() in {"ollama", "local"}:
+        provider, model = "ollama", _ollama_embed_model()
+    else:
+        provider, model = "openai", str(getattr(embeddings, "model", "default"))
+    return CachedEmbeddings(embeddings, provider, model, get_embedding_store(_embedding_cache_path()))
+
+
 def get_embeddings() -> Any:
     if _embedding_provider() in {"ollama", "local"}:
-        return initialize_embeddings("")
+        return _with_embedding_cache(initialize_embeddings(""))
 
     api_key = _setting("OPENAI_API_KEY", "")
     if not api_key:
         raise ValueError("OPENAI_API_KEY is not configured")
-    return initialize_embeddings(api_key)
+    return _with_embedding_cache(initialize_embeddings(api_key))
 
 
 def load_and_process_pdfs(directory: str) -> List[Any]:
@@ -169,49 +237,204 @@ def load_and_process_pdfs(directory: str) -> List[Any]:
         logger.error("Directory does not exist: %s", directory)
         return []
 
+    texts: List[Any] = []
+    for path, chunks, _, error in iter_parsed_pdfs(list_pdfs(directory), _ingest_workers()):
+        if error is not None:
+            logger.error("Error during PDF loading and processing of %s: %s", path, error)
+            continue
+        texts.extend(chunks)
+    logger.info("Split documents into %s text chunks", len(texts))
+    return texts
+
+
+def _ingest_workers() -> int:
+    configured = _setting("RAG_INGEST_WORKERS")
+    if configured not in (None, ""):
+        return max(1, int(configured))
+    return max(1, min(os.cpu_count() or 1, 8))
+
+
+def _sync_directory(
+    directory: str, manifest: IngestionManifest, store: Optional[Any], create_store: Callable[[List[Any], List[str]], Any]
+) -> Tuple[Optional[Any], SyncReport]:
+    return sync_directory(
+        directory,
+        manifest,
+        store,
+        create_store=create_store,
+        base_dir=_base_dir(),
+        workers=_ingest_workers(),
+        embed_batch_size=int(_setting("RAG_INGEST_EMBED_BATCH_SIZE", DEFAULT_INGEST_EMBED_BATCH_SIZE)),
+    )
+
+
+def _persist_timed(store: Any, path: str, report: SyncReport) -> None:
+    started = time.perf_counter()
+    _persist_index(store, path)
+    report.timings["persist_ms"] = (time.perf_counter() - started) * 1000.0
+    if isinstance(store, FAISS) and _index_format() != "faiss":
+        started = time.perf_counter()
+        _export_compact(store, path, report.version)
+        report.timings["compact_ms"] = (time.perf_counter() - started) * 1000.0
+    logger.info("Index %s build stages: %s", path, report.format_timings())
+
+
+def _index_path(index_name: str) -> str:
+    return os.path.join(_base_dir(), index_name)
+
+
+def _index_format() -> str:
+    """``auto`` serves the compact index when it matches the manifest, ``compact`` always, ``faiss`` never."""
+    value = str(_setting("RAG_INDEX_FORMAT", "auto")).strip().lower()
+    return value if value in {"auto", "compact", "faiss"} else "auto"
+
+
+def _faiss_index_type() -> str:
+    value = str(_setting("RAG_FAISS_INDEX_TYPE", "flat")).strip().lower()
+    if value not in FAISS_INDEX_TYPES:
+        logger.warning("Unknown RAG_FAISS_INDEX_TYPE %r; using flat.", value)
+        return "flat"
+    return value
+
+
+def _faiss_index_params() -> IndexParams:
+    defaults = IndexParams()
+    return IndexParams(
+        hnsw_m=int(_setting("RAG_FAISS_HNSW_M", defaults.hnsw_m)),
+        hnsw_ef_construction=int(_setting("RAG_FAISS_HNSW_EF_CONSTRUCTION", defaults.hnsw_ef_construction)),
+        hnsw_ef_search=int(_setting("RAG_FAISS_HNSW_EF_SEARCH", defaults.hnsw_ef_search)),
+        ivf_nlist=int(_setting("RAG_FAISS_IVF_NLIST", defaults.ivf_nlist)),
+        ivf_nprobe=int(_setting("RAG_FAISS_IVF_NPROBE", defaults.ivf_nprobe)),
+        pq_m=int(_setting("RAG_FAISS_PQ_M", defaults.pq_m)),
+    )
+
+
+def _export_compact(store: Any, index_path: str, version: int) -> Dict[str, Any]:
+    """The served index is built as ``RAG_FAISS_INDEX_TYPE`` from the exact flat index ingestion maintains."""
+    index_type = _faiss_index_type()
+    index = rebuild_from(store.index, index_type, _faiss_index_params()) if index_type != "flat" else None
+    return export_compact(store, index_path, version, index=index, index_type=index_type)
+
+
+def _load_faiss(index_path: str, embeddings: Any) -> Any:
     try:
-        loader = DirectoryLoader(directory, glob="*.pdf", loader_cls=PyPDFLoader)
-        documents = loader.load()
-        logger.info("Loaded %s documents from %s", len(documents), directory)
-
-        if not documents:
-            logger.warning("No documents were loaded. Please check the directory for PDF files.")
-            return []
-
-        for doc in documents:
-            source_file = os.path.basename(doc.metadata.get("source", "Unknown source"))
-            doc.page_content += f"\nSource: {source_file}"
-
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        texts = text_splitter.split_documents(documents)
-        logger.info("Split documents into %s text chunks", len(texts))
-        return texts
-    except Exception as e:
-        logger.error("Error during PDF loading and processing: %s", e)
-        return []
+        return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    except TypeError:
+        return FAISS.load_local(index_path, embeddings)
+
+
+def _load_compact(index_path: str, embeddings: Any) -> Optional[CompactIndex]:
+    index_format = _index_format()
+    pointer = read_pointer(index_path)
+    if index_format == "faiss" or pointer is None:
+        if _faiss_index_type() != "flat":
+            logger.warning("RAG_FAISS_INDEX_TYPE only applies to the compact index; %s is served flat.", index_path)
+        if index_format == "compact":
+            logger.warning(
+                "No compact index under %s; run `python manage.py convert_faiss_index`.", index_path
+            )
+        return None
+    manifest_version = IngestionManifest.load(os.path.join(index_path, MANIFEST_FILE)).version
+    if index_format == "auto" and pointer["version"] != manifest_version:
+        logger.warning(
+            "Compact index under %s is at version %s, the manifest at %s; loading the FAISS pickle.",
+            index_path, pointer["version"], manifest_version,
+        )
+        return None
+    if pointer.get("index_type", "flat") != _faiss_index_type():
+        logger.warning(
+            "Compact index under %s is %s, RAG_FAISS_INDEX_TYPE is %s; it changes on the next sync or "
+            "`convert_faiss_index`.", index_path, pointer.get("index_type", "flat"), _faiss_index_type(),
+        )
+    return CompactIndex(index_path, embeddings, _faiss_index_params().search_parameters())
+
+
+def _faiss_factory(embeddings: Any) -> Callable[[List[Any], List[str]], Any]:
+    return lambda documents, ids: FAISS.from_documents(documents, embeddings, ids=ids)
+
+
+def _chroma_factory(embeddings: Any, chroma_path: str) -> Callable[[List[Any], List[str]], Any]:
+    return lambda documents, ids: Chroma.from_documents(
+        documents=documents, embedding=embeddings, ids=ids, persist_directory=chroma_path
+    )
+
+
+def _persist_index(store: Any, path: str) -> None:
+    if hasattr(store, "save_local"):
+        store.save_local(path)
+    elif hasattr(store, "persist"):
+        try:
+            store.persist()
+        except Exception:
+            pass
+
+
+def _load_manifest(path: str) -> None:
+    global index_manifest, index_location
+    index_location = path
+    index_manifest = IngestionManifest.load(os.path.join(path, MANIFEST_FILE))
+    if not index_manifest.exists:
+        logger.warning(
+            "Index %s has no ingestion manifest; run `python manage.py sync_nutrition_index` "
+            "to rebuild it without duplicate chunks.", path,
+        )
+
+
+def _fresh_manifest(path: str) -> IngestionManifest:
+    """
+    An empty manifest for a from-scratch build that continues above every version
+    handed out for this index before, so version-keyed caches, stored guidance and
+    compact files of an older build are never mistaken for the new one.
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    versions = [
+        IngestionManifest.load(manifest_path).version,
+        guidance_store.latest_version(_active_index_name("nutrition_index")),
+    ]
+    if index_manifest is not None:
+        versions.append(index_manifest.version)
+    pointer = read_pointer(path)
+    if pointer is not None:
+        versions.append(int(pointer["version"]))
+    manifest = IngestionManifest(manifest_path)
+    # The build's first sync bumps this by one.
+    manifest.version = max(versions)
+    return manifest
+
+
+def _build_index(path: str, pdf_directory: str, create_store: Callable[[List[Any], List[str]], Any]) -> Optional[Any]:
+    global index_manifest, index_location
+    manifest = _fresh_manifest(path)
+    store, report = _sync_directory(pdf_directory, manifest, None, create_store)
+    if store is None:
+        logger.error("No texts available for creating index. Index creation aborted.")
+        return None
+    _persist_timed(store, path, report)
+    manifest.save()
+    index_manifest, index_location = manifest, path
+    return store
 
 
 def create_or_load_index(index_name: str, pdf_directory: str) -> Optional[Any]:
     embeddings = get_embeddings()
-    index_path = os.path.join(_base_dir(), index_name)
+    index_path = _index_path(index_name)
     faiss_file = os.path.join(index_path, "index.faiss")
 
     try:
         if os.path.exists(faiss_file):
-            logger.info("Loading existing FAISS index from %s", index_path)
-            try:
-                return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
-            except TypeError:
-                return FAISS.load_local(index_path, embeddings)
+            db_local = _load_compact(index_path, embeddings)
+            if db_local is not None:
+                logger.info("Memory-mapped compact index v%s from %s", db_local.version, index_path)
+            else:
+                logger.info("Loading existing FAISS index from %s", index_path)
+                db_local = _load_faiss(index_path, embeddings)
+            _load_manifest(index_path)
+            return db_local
 
         logger.info("Creating new FAISS index: %s", index_path)
-        texts = load_and_process_pdfs(pdf_directory)
-        if not texts:
-            logger.error("No texts available for creating index. Index creation aborted.")
-            return None
-        db_local = FAISS.from_documents(texts, embeddings)
-        db_local.save_local(index_path)
-        logger.info("FAISS index created and saved successfully: %s", index_path)
+        db_local = _build_index(index_path, pdf_directory, _faiss_factory(embeddings))
+        if db_local is not None:
+            logger.info("FAISS index created and saved successfully: %s", index_path)
         return db_local
     except Exception as e:
         logger.critical("Error using FAISS vector store (will fallback to Chroma): %s", e)
@@ -220,19 +443,14 @@ def create_or_load_index(index_name: str, pdf_directory: str) -> Optional[Any]:
     try:
         if os.path.isdir(chroma_path):
             logger.info("Loading existing Chroma index from %s", chroma_path)
-            return Chroma(persist_directory=chroma_path, embedding_function=embeddings)
+            db_local = Chroma(persist_directory=chroma_path, embedding_function=embeddings)
+            _load_manifest(chroma_path)
+            return db_local
 
         logger.info("Creating new Chroma index: %s", chroma_path)
-        texts = load_and_process_pdfs(pdf_directory)
-        if not texts:
-            logger.error("No texts available for creating index. Index creation aborted.")
-            return None
-        db_local = Chroma.from_documents(documents=texts, embedding=embeddings, persist_directory=chroma_path)
-        try:
-            db_local.persist()
-        except Exception:
-            pass
-        logger.info("Chroma index created and saved successfully: %s", chroma_path)
+        db_local = _build_index(chroma_path, pdf_directory, _chroma_factory(embeddings, chroma_path))
+        if db_local is not None:
+            logger.info("Chroma index created and saved successfully: %s", chroma_path)
         return db_local
     except Exception as e:
         logger.critical("Error during Chroma index creation/loading: %s", e)
@@ -241,6 +459,13 @@ def create_or_load_index(index_name: str, pdf_directory: str) -> Optional[Any]:
 
 pdf_directory = os.path.join(_base_dir(), "nutrition_pdfs")
 db: Optional[Any] = None
+index_manifest: Optional[IngestionManifest] = None
+index_location: Optional[str] = None
+
+
+def index_version() -> int:
+    """Version of the loaded index; bumped by every ingestion sync that changed it."""
+    return index_manifest.version if index_manifest is not None else 0
 
 
 def get_qa_chain() -> Optional[Any]:
@@ -286,20 +511,14 @@ def _coerce_bool(value: Any) -> bool:
 
 
 def _resolve_stage_context(user: Optional[Any]) -> Dict[str, str]:
-    default_context = {"week_context": "pregnant user", "cache_tag": "generic"}
+    # Guidance is shared per PregnancyStage week range, not per exact week.
     if user is None:
-        return default_context
+        return guidance_cache.stage_context(None)
     try:
         profile = UserPregnancyProfile.objects.get(user=user)  # type: ignore
-        current_week = getattr(profile, "current_week", None)
-        if current_week:
-            return {
-                "week_context": f"pregnant user at week {current_week}",
-                "cache_tag": f"week:{current_week}",
-            }
+        return guidance_cache.stage_context(getattr(profile, "current_week", None))
     except UserPregnancyProfile.DoesNotExist:  # type: ignore
-        pass
-    return default_context
+        return guidance_cache.stage_context(None)
 
 
 def _format_source_documents(documents: Iterable[Any]) -> str:
@@ -311,6 +530,97 @@ def _format_source_documents(documents: Iterable[Any]) -> str:
     return "\n\n".join(blocks)
 
 
+def _normalize_food(food_name: str) -> str:
+    return " ".join(food_name.split()).lower()
+
+
+def _retrieval_query(normalized_food: str) -> str:
+    # Only the food: style and week context change the answer, not which evidence is relevant.
+    return f"{normalized_food} pregnancy food safety nutrition"
+
+
+def _retrieval_cache_key(kind: str, normalized_food: str) -> str:
+    cache_payload = (
+        f"{index_version()}|{_embedding_provider()}|{_ollama_embed_model()}|{_retrieval_k()}|{normalized_food}"
+    )
+    return f"food_retrieval:{kind}:{hashlib.sha256(cache_payload.encode('utf-8')).hexdigest()}"
+
+
+def _embed_query(store: Any, text: str) -> List[float]:
+    embeddings = getattr(store, "embedding_function", None) or getattr(store, "_embedding_function", None)
+    if hasattr(embeddings, "embed_query"):
+        return embeddings.embed_query(text)
+    if callable(embeddings):
+        return embeddings(text)
+    return get_embeddings().embed_query(text)
+
+
+def _document_id(doc: Any) -> str:
+    # Indexes built by rag_ingestion use the chunk hash as id, so it can be recomputed from the text.
+    return getattr(doc, "id", None) or chunk_id(doc.page_content)
+
+
+def _documents_by_ids(store: Any, ids: List[str]) -> Optional[List[Any]]:
+    docstore = getattr(store, "docstore", None)
+    if docstore is not None:
+        documents = [docstore.search(doc_id) for doc_id in ids]
+        # InMemoryDocstore returns an error string for unknown ids.
+        return documents if all(hasattr(doc, "page_content") for doc in documents) else None
+    if hasattr(store, "get_by_ids"):
+        found = {doc.id: doc for doc in store.get_by_ids(ids)}
+        return [found[doc_id] for doc_id in ids] if all(doc_id in found for doc_id in ids) else None
+    return None
+
+
+def retrieve_food_documents(store: Any, food_name: str) -> List[Any]:
+    """
+    Top-k evidence for a food, independent of dialect style and pregnancy week.
+
+    The query embedding and the ids of the retrieved chunks are cached per index
+    version and food, so repeated foods skip both the embedding call and the
+    vector search. Ids are only cached when the store can resolve them again.
+    """
+    normalized_food = _normalize_food(food_name)
+    ids_key = _retrieval_cache_key("ids", normalized_food)
+    timeout = int(_setting("RAG_RETRIEVAL_CACHE_SECONDS", DEFAULT_RETRIEVAL_CACHE_SECONDS))
+
+    cached_ids = cache.get(ids_key)
+    if cached_ids:
+        documents = _documents_by_ids(store, cached_ids)
+        if documents is not None:
+            registry.counter("retrieval_cache.hits").inc()
+            return documents
+    registry.counter("retrieval_cache.misses").inc()
+
+    embedding_key = _retrieval_cache_key("embedding", normalized_food)
+    embedding = cache.get(embedding_key)
+    if embedding is None:
+        embedding = _embed_query(store, _retrieval_query(normalized_food))
+        cache.set(embedding_key, list(embedding), timeout)
+
+    documents = store.similarity_search_by_vector(embedding, k=_retrieval_k())
+    ids = [_document_id(doc) for doc in documents]
+    if _documents_by_ids(store, ids) is not None:
+        cache.set(ids_key, ids, timeout)
+    else:
+        _log_unresolvable_ids()
+    return documents
+
+
+def _log_unresolvable_ids() -> None:
+    # Indexes built before the ingestion manifest key their docstore by uuid, not by chunk hash.
+    # The counter rate-limits the warning to the first and every UNRESOLVABLE_IDS_LOG_EVERY-th miss.
+    counter = registry.counter("retrieval_cache.unresolvable_ids")
+    counter.inc()
+    if counter.value % UNRESOLVABLE_IDS_LOG_EVERY == 1:
+        logger.warning(
+            "Retrieved chunks cannot be looked up by id in this index, so retrieval results are not cached "
+            "(%s retrievals so far). Run `python manage.py sync_nutrition_index --rebuild` to rebuild it "
+            "with content-hash ids.",
+            counter.value,
+        )
+
+
 def _build_guidance_question(food_name: str, dialect_style: str, stage_context: Dict[str, str]) -> str:
     return (
         f"Food: {food_name}\n"
@@ -321,65 +631,127 @@ def _build_guidance_question(food_name: str, dialect_style: str, stage_context:
     )
 
 
-def _invoke_ollama_guidance(context: str, question: str) -> str:
+def _build_layered_guidance_question(food_name: str, dialect_style: str, stage_context: Dict[str, str]) -> str:
+    return (
+        f"Food: {food_name}\n"
+        f"User context: {stage_context['week_context']}\n"
+        f"Style instructions: {dialect_style}\n"
+        "Task: Assess whether this food is generally safe for a pregnant user, "
+        "summarize key cautions, and provide nutrition advice. Write safety_summary and "
+        "nutritional_advice in plain standard Korean, ignoring the style instructions. Then "
+        "write styled_safety_summary and styled_nutritional_advice as the same two texts "
+        "rewritten following the style instructions, keeping every fact and caution. "
+        "Return Korean JSON only."
+    )
+
+
+def _build_style_question(dialect_style: str) -> str:
+    return (
+        f"Style instructions: {dialect_style}\n"
+        "Task: The context is finished guidance JSON. Rewrite the safety_summary and "
+        "nutritional_advice values following the style instructions. Keep every fact, "
+        "caution and the is_safe value unchanged. Return Korean JSON only."
+    )
+
+
+def _rag_system_prompt(schema: Dict[str, Any]) -> str:
+    keys = schema["required"]
+    return RAG_SYSTEM_PROMPT.format(keys=f"{', '.join(keys[:-1])}, and {keys[-1]}")
+
+
+def _guidance_shape(schema: Dict[str, Any]) -> str:
+    example = {
+        name: False if spec["type"] == "boolean" else "..." for name, spec in schema["properties"].items()
+    }
+    return json.dumps(example, ensure_ascii=False, separators=(",", ":"))
+
+
+def _ollama_guidance_payload(
+    context: str, question: str, schema: Dict[str, Any] = GUIDANCE_SCHEMA
+) -> Dict[str, Any]:
     prompt = (
         f"Retrieved context:\n{context or 'No retrieved context was available.'}\n\n"
         f"Question:\n{question}\n\n"
         "Return exactly this JSON shape:\n"
-        '{"safety_summary":"...","is_safe":false,"nutritional_advice":"..."}'
+        f"{_guidance_shape(schema)}"
     )
-    payload = {
+    return {
         "model": _ollama_rag_model(),
         "messages": [
-            {"role": "system", "content": RAG_SYSTEM_PROMPT},
+            {"role": "system", "content": _rag_system_prompt(schema)},
             {"role": "user", "content": prompt},
         ],
-        "format": GUIDANCE_SCHEMA,
+        "format": schema,
         "think": False,
-        "stream": False,
         "options": {
             "temperature": 0,
             "num_predict": int(_setting("OLLAMA_RAG_NUM_PREDICT", 512)),
         },
     }
-    response = requests.post(
-        f"{_ollama_base_url()}/api/chat",
-        json=payload,
-        timeout=_ollama_timeout_seconds(),
-    )
-    response.raise_for_status()
-    data = response.json()
-    return data.get("message", {}).get("content", "")
 
 
-def _invoke_openai_guidance(context: str, question: str) -> str:
-    api_key = _setting("OPENAI_API_KEY", "")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY is not configured")
+def _invoke_ollama_guidance(context: str, question: str, schema: Dict[str, Any] = GUIDANCE_SCHEMA) -> str:
+    return ollama_client.chat_json(
+        _ollama_guidance_payload(context, question, schema), timeout=_ollama_timeout_seconds()
+    )
 
-    prompt = (
-        f"{RAG_SYSTEM_PROMPT}\n\n"
+
+def _openai_guidance_prompt(context: str, question: str, schema: Dict[str, Any] = GUIDANCE_SCHEMA) -> str:
+    return (
+        f"{_rag_system_prompt(schema)}\n\n"
         f"Retrieved context:\n{context or 'No retrieved context was available.'}\n\n"
         f"Question:\n{question}\n\n"
         "Return exactly this JSON shape:\n"
-        '{"safety_summary":"...","is_safe":false,"nutritional_advice":"..."}'
+        f"{_guidance_shape(schema)}"
     )
-    llm = ChatOpenAI(
-        model=str(_setting("OPENAI_RAG_MODEL", DEFAULT_OPENAI_RAG_MODEL)),
-        temperature=0,
-        openai_api_key=api_key,
-    )
-    response = llm.invoke(prompt)
+
+
+def _openai_guidance_llm() -> ChatOpenAI:
+    api_key = _setting("OPENAI_API_KEY", "")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY is not configured")
+
+    return get_chat_openai(str(_setting("OPENAI_RAG_MODEL", DEFAULT_OPENAI_RAG_MODEL)), api_key)
+
+
+def _invoke_openai_guidance(context: str, question: str, schema: Dict[str, Any] = GUIDANCE_SCHEMA) -> str:
+    response = _openai_guidance_llm().invoke(_openai_guidance_prompt(context, question, schema))
     return str(getattr(response, "content", response))
 
 
+GUIDANCE_INVOKERS = {
+    "ollama": _invoke_ollama_guidance,
+    "openai": _invoke_openai_guidance,
+}
+
+
+class GuidanceUnparseable(ValueError):
+    """The guidance model's answer held no JSON object."""
+
+
+def _route_guidance(context: str, question: str, schema: Dict[str, Any] = GUIDANCE_SCHEMA) -> Tuple[str, str]:
+    """``(provider, answer)`` from the backend the router picked."""
+    # An answer without a JSON object counts as a backend failure, so the next one is tried;
+    # when every backend answers that way the router raises ProvidersExhausted.
+    return provider_router.call(
+        "rag",
+        _rag_providers(),
+        lambda provider: (provider, GUIDANCE_INVOKERS[provider](context, question, schema)),
+        is_failure=lambda result: not _extract_json(result[1]),
+        labels=_rag_provider_labels(),
+    )
+
+
+UNPARSED_GUIDANCE = {
+    "safety_summary": "검색된 문서와 모델 응답을 안정적으로 해석하지 못해 보수적인 주의가 필요합니다.",
+    "is_safe": False,
+    "nutritional_advice": "개인 건강 상태와 임신 주수에 따라 달라질 수 있으니 의료 전문가와 상담하세요.",
+}
+
+
 def _normalize_guidance(parsed: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     if not parsed:
-        return {
-            "safety_summary": "검색된 문서와 모델 응답을 안정적으로 해석하지 못해 보수적인 주의가 필요합니다.",
-            "is_safe": False,
-            "nutritional_advice": "개인 건강 상태와 임신 주수에 따라 달라질 수 있으니 의료 전문가와 상담하세요.",
-        }
+        return dict(UNPARSED_GUIDANCE)
 
     safety_summary = parsed.get("safety_summary") or parsed.get("summary") or ""
     nutritional_advice = parsed.get("nutritional_advice") or parsed.get("nutrition_summary") or ""
@@ -396,49 +768,440 @@ def _normalize_guidance(parsed: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     }
 
 
+def _parse_guidance(answer: str) -> Dict[str, Any]:
+    parsed = _extract_json(answer)
+    if not parsed:
+        raise GuidanceUnparseable("The guidance answer held no JSON object")
+    return _normalize_guidance(parsed)
+
+
+def _split_layered_guidance(parsed: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """``(base, styled)`` from a layered answer; ``styled`` is None when the model skipped it."""
+    base = _normalize_guidance(parsed)
+    if not all(parsed.get(field) for field in STYLED_GUIDANCE_FIELDS):
+        return base, None
+    styled = dict(base)
+    styled.update({field: str(parsed[styled_field]) for styled_field, field in STYLED_GUIDANCE_FIELDS.items()})
+    return base, styled
+
+
+def _parse_layered_guidance(answer: str) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    parsed = _extract_json(answer)
+    if not parsed:
+        raise GuidanceUnparseable("The guidance answer held no JSON object")
+    return _split_layered_guidance(parsed)
+
+
+def _is_generated_guidance(guidance: Optional[Dict[str, Any]]) -> bool:
+    """False for empty values and the placeholder shown when an answer could not be parsed."""
+    return bool(guidance) and guidance.get("safety_summary") != UNPARSED_GUIDANCE["safety_summary"]
+
+
+def _base_guidance_cache_key(normalized_food: str, stage_context: Dict[str, str]) -> str:
+    cache_payload = (
+        f"{normalized_food.lower()}|{stage_context['cache_tag']}|{index_version()}|"
+        f"{_rag_provider()}|{_embedding_provider()}|{_ollama_rag_model()}|{_ollama_embed_model()}"
+    )
+    return f"food_guidance:base:{hashlib.sha256(cache_payload.encode('utf-8')).hexdigest()}"
+
+
+def _styled_guidance_cache_key(base: Dict[str, Any], dialect_style: str) -> str:
+    # Keyed by the base answer itself, so a regenerated base gets a fresh rendering.
+    cache_payload = (
+        f"{json.dumps(base, ensure_ascii=False, sort_keys=True)}|{dialect_style}|"
+        f"{_rag_provider()}|{_ollama_rag_model()}"
+    )
+    return f"food_guidance:styled:{hashlib.sha256(cache_payload.encode('utf-8')).hexdigest()}"
+
+
+def _base_cache_seconds() -> int:
+    return int(_setting("GUIDANCE_BASE_CACHE_SECONDS", DEFAULT_GUIDANCE_BASE_CACHE_SECONDS))
+
+
+def _style_cache_seconds() -> int:
+    return int(_setting("GUIDANCE_STYLE_CACHE_SECONDS", DEFAULT_GUIDANCE_STYLE_CACHE_SECONDS))
+
+
+def _is_neutral_style(dialect_style: str) -> bool:
+    dialect_style = (dialect_style or "").strip()
+    if dialect_style in {"", NEUTRAL_STYLE}:
+        return True
+    neutral_prompt = cache.get_or_set(
+        "guidance:neutral_style_prompt",
+        lambda: ResponseStyle.objects.filter(name=NEUTRAL_STYLE).values_list("prompt", flat=True).first() or "",
+        3600,
+    )
+    return dialect_style == (neutral_prompt or "").strip()
+
+
+def _unavailable_guidance() -> Dict[str, Any]:
+    return {
+        "safety_summary": "현재 시스템이 안전성 정보를 제공할 수 없습니다.",
+        "is_safe": False,
+        "nutritional_advice": "현재 시스템이 영양 조언을 제공할 수 없습니다.",
+    }
+
+
+def _failed_guidance() -> Dict[str, Any]:
+    return {
+        "safety_summary": "정보를 가져오는 중 오류가 발생했습니다.",
+        "is_safe": False,
+        "nutritional_advice": "정보를 가져오는 중 오류가 발생했습니다.",
+    }
+
+
+def _guidance_generator(provider: str) -> str:
+    """``provider:model`` of the backend that produced an answer, as stored in ``GuidanceEntry``."""
+    return f"{provider}:{_rag_provider_labels()[provider]}"[:200]
+
+
+def _guidance_generators() -> List[str]:
+    # Answers from any configured backend are served, in RAG_PROVIDERS priority order.
+    return [_guidance_generator(provider) for provider in _rag_providers()]
+
+
+def _guidance_entry_key(normalized_food: str, stage_context: Dict[str, str], dialect_style: Optional[str]) -> Dict[str, Any]:
+    return {
+        "food_name": _normalize_food(normalized_food)[:200],
+        "stage": stage_context["cache_tag"],
+        "style": guidance_store.style_key(dialect_style),
+        "index_name": _active_index_name("nutrition_index")[:200],
+        "index_version": index_version(),
+    }
+
+
+def _stored_or_generated(
+    entry_key: Dict[str, Any], generate: Callable[[], Tuple[str, Dict[str, Any]]]
+) -> Dict[str, Any]:
+    stored = guidance_store.load_guidance(entry_key, _guidance_generators())
+    if _is_generated_guidance(stored):
+        return stored
+    # A failed or unparseable generation raises, so only real answers are stored.
+    provider, guidance = generate()
+    guidance_store.save_guidance(entry_key, _guidance_generator(provider), guidance)
+    return guidance
+
+
+def _base_food_guidance(store: Any, normalized_food: str, stage_context: Dict[str, str]) -> Dict[str, Any]:
+    """Style-neutral guidance for a food and pregnancy stage (the base cache layer)."""
+    question = _build_guidance_question(normalized_food, NEUTRAL_STYLE, stage_context)
+
+    def generate() -> Tuple[str, Dict[str, Any]]:
+        documents = retrieve_food_documents(store, normalized_food)
+        context = _format_source_documents(documents)
+
+        provider, answer = _route_guidance(context, question)
+        return provider, _parse_guidance(answer)
+
+    def compute() -> Dict[str, Any]:
+        return _stored_or_generated(_guidance_entry_key(normalized_food, stage_context, None), generate)
+
+    # Concurrent requests for the same food and stage share one retrieval + LLM call.
+    return guidance_flight.do(
+        _base_guidance_cache_key(normalized_food, stage_context),
+        compute,
+        timeout=_base_cache_seconds(),
+        cacheable=_is_generated_guidance,
+    )
+
+
+def _styled_food_guidance(
+    base: Dict[str, Any], dialect_style: str, normalized_food: str, stage_context: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    The base guidance rewritten in ``dialect_style`` (the style cache layer).
+
+    Only used once the base exists; the rewrite is one short call without retrieval.
+    A cold base is filled by ``_cold_styled_food_guidance`` instead.
+    """
+    if _is_neutral_style(dialect_style):
+        return base
+
+    def generate() -> Tuple[str, Dict[str, Any]]:
+        provider, answer = _route_guidance(json.dumps(base, ensure_ascii=False), _build_style_question(dialect_style))
+        styled = _parse_guidance(answer)
+        styled["is_safe"] = base["is_safe"]
+        return provider, styled
+
+    def compute() -> Dict[str, Any]:
+        return _stored_or_generated(_guidance_entry_key(normalized_food, stage_context, dialect_style), generate)
+
+    return guidance_flight.do(
+        _styled_guidance_cache_key(base, dialect_style),
+        compute,
+        timeout=_style_cache_seconds(),
+        cacheable=_is_generated_guidance,
+    )
+
+
+def _layered_guidance_cache_key(base_key: str, dialect_style: str) -> str:
+    cache_payload = f"{base_key}|{dialect_style}"
+    return f"food_guidance:layered:{hashlib.sha256(cache_payload.encode('utf-8')).hexdigest()}"
+
+
+def _store_layered_guidance(
+    provider: str,
+    base: Dict[str, Any],
+    styled: Optional[Dict[str, Any]],
+    dialect_style: str,
+    normalized_food: str,
+    stage_context: Dict[str, str],
+) -> None:
+    """Fill both cache layers and both stored entries from one layered answer."""
+    generator = _guidance_generator(provider)
+    guidance_store.save_guidance(_guidance_entry_key(normalized_food, stage_context, None), generator, base)
+    cache.set(_base_guidance_cache_key(normalized_food, stage_context), base, _base_cache_seconds())
+    if styled is not None:
+        guidance_store.save_guidance(
+            _guidance_entry_key(normalized_food, stage_context, dialect_style), generator, styled
+        )
+        cache.set(_styled_guidance_cache_key(base, dialect_style), styled, _style_cache_seconds())
+
+
+def _cold_styled_food_guidance(
+    store: Any, normalized_food: str, stage_context: Dict[str, str], dialect_style: str
+) -> Dict[str, Any]:
+    """
+    Styled guidance for a request whose base layer is cold.
+
+    One retrieval + LLM call answers in both the neutral and the requested style, and
+    fills the base and style layers, so a styled request never waits for two
+    sequential generations. A stored base falls back to the short rewrite.
+    """
+    base_key = _base_guidance_cache_key(normalized_food, stage_context)
+
+    def compute() -> Dict[str, Any]:
+        stored = guidance_store.load_guidance(
+            _guidance_entry_key(normalized_food, stage_context, None), _guidance_generators()
+        )
+        if _is_generated_guidance(stored):
+            cache.set(base_key, stored, _base_cache_seconds())
+            return _styled_food_guidance(stored, dialect_style, normalized_food, stage_context)
+
+        documents = retrieve_food_documents(store, normalized_food)
+        provider, answer = _route_guidance(
+            _format_source_documents(documents),
+            _build_layered_guidance_question(normalized_food, dialect_style, stage_context),
+            schema=LAYERED_GUIDANCE_SCHEMA,
+        )
+        base, styled = _parse_layered_guidance(answer)
+        _store_layered_guidance(provider, base, styled, dialect_style, normalized_food, stage_context)
+        if styled is None:
+            logger.warning("Layered guidance for %s skipped the styled fields; rewriting the base", normalized_food)
+            return _styled_food_guidance(base, dialect_style, normalized_food, stage_context)
+        return styled
+
+    return guidance_flight.do(
+        _layered_guidance_cache_key(base_key, dialect_style),
+        compute,
+        timeout=_style_cache_seconds(),
+        cacheable=_is_generated_guidance,
+    )
+
+
 def get_food_guidance(food_name: str, dialect_style: str = "표준어", user: Optional[Any] = None) -> Dict[str, Any]:
     store = get_qa_chain()
     if store is None:
         logger.error("Vector store is not initialized. Cannot get food guidance.")
-        return {
-            "safety_summary": "현재 시스템이 안전성 정보를 제공할 수 없습니다.",
-            "is_safe": False,
-            "nutritional_advice": "현재 시스템이 영양 조언을 제공할 수 없습니다.",
-        }
+        return _unavailable_guidance()
 
     stage_context = _resolve_stage_context(user)
     normalized_food = food_name.strip()
-    cache_payload = (
-        f"{normalized_food.lower()}|{dialect_style}|{stage_context['cache_tag']}|"
-        f"{_rag_provider()}|{_embedding_provider()}|{_ollama_rag_model()}|{_ollama_embed_model()}"
+
+    try:
+        if _is_neutral_style(dialect_style):
+            return _base_food_guidance(store, normalized_food, stage_context)
+        base = cache.get(_base_guidance_cache_key(normalized_food, stage_context))
+        if not _is_generated_guidance(base):
+            return _cold_styled_food_guidance(store, normalized_food, stage_context, dialect_style)
+        return _styled_food_guidance(base, dialect_style, normalized_food, stage_context)
+    except Exception as e:
+        logger.error("Error retrieving food guidance for %s: %s", food_name, e)
+        return _failed_guidance()
+
+
+GUIDANCE_FIELD_ALIASES = {
+    "safety_summary": "safety_summary",
+    "summary": "safety_summary",
+    "is_safe": "is_safe",
+    "nutritional_advice": "nutritional_advice",
+    "nutrition_summary": "nutritional_advice",
+}
+
+# A layered answer streams its styled texts to the client; the neutral ones only fill the base layer.
+LAYERED_GUIDANCE_FIELD_ALIASES = {
+    "styled_safety_summary": "safety_summary",
+    "is_safe": "is_safe",
+    "styled_nutritional_advice": "nutritional_advice",
+}
+
+
+class GuidanceFieldScanner:
+    """
+    Pulls completed top-level guidance fields out of a partially generated JSON answer.
+
+    A field is only reported once its whole value has arrived, so clients never see
+    half a sentence that a later token could still change.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None) -> None:
+        self.aliases = aliases or GUIDANCE_FIELD_ALIASES
+        self.key_pattern = re.compile(r'"(' + "|".join(self.aliases) + r')"\s*:\s*')
+        self.buffer = ""
+        self._position = 0
+        self._decoder = json.JSONDecoder()
+        self.emitted: Dict[str, Any] = {}
+
+    def feed(self, delta: str) -> List[tuple]:
+        self.buffer += delta
+        completed = []
+        while True:
+            match = self.key_pattern.search(self.buffer, self._position)
+            if not match or match.end() >= len(self.buffer):
+                break
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, match.end())
+            except json.JSONDecodeError:
+                break
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and end >= len(self.buffer):
+                # A number at the end of the buffer may still be growing.
+                break
+            self._position = end
+            field = self.aliases[match.group(1)]
+            if field in self.emitted:
+                continue
+            value = _coerce_bool(value) if field == "is_safe" else str(value)
+            self.emitted[field] = value
+            completed.append((field, value))
+        return completed
+
+
+def _stream_ollama_guidance(context: str, question: str, schema: Dict[str, Any] = GUIDANCE_SCHEMA) -> Iterator[str]:
+    yield from ollama_client.stream_chat_json(
+        _ollama_guidance_payload(context, question, schema), timeout=_ollama_timeout_seconds()
     )
-    cache_key = f"food_guidance:{hashlib.sha256(cache_payload.encode('utf-8')).hexdigest()}"
 
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
 
-    question = _build_guidance_question(normalized_food, dialect_style, stage_context)
+def _stream_openai_guidance(context: str, question: str, schema: Dict[str, Any] = GUIDANCE_SCHEMA) -> Iterator[str]:
+    llm = _openai_guidance_llm()
+    for chunk in llm.stream(_openai_guidance_prompt(context, question, schema)):
+        content = getattr(chunk, "content", "")
+        if content:
+            yield str(content)
 
-    try:
-        documents = store.similarity_search(question, k=_retrieval_k())
-        context = _format_source_documents(documents)
 
-        if _rag_provider() in {"ollama", "local"}:
-            answer = _invoke_ollama_guidance(context, question)
-        else:
-            answer = _invoke_openai_guidance(context, question)
+GUIDANCE_STREAMERS = {
+    "ollama": _stream_ollama_guidance,
+    "openai": _stream_openai_guidance,
+}
+
 
-        guidance = _normalize_guidance(_extract_json(answer))
-        cache.set(cache_key, guidance, GUIDANCE_CACHE_TIMEOUT)
-        return guidance
+def stream_food_guidance(
+    food_name: str, dialect_style: str = "표준어", user: Optional[Any] = None
+) -> Iterator[tuple]:
+    """
+    Yield ``(field, value)`` pairs for the guidance fields as the LLM completes them.
+
+    Every field of ``get_food_guidance`` is yielded exactly once; the final result is
+    cached under the same key, so the blocking and streaming paths share entries.
+    """
+    store = get_qa_chain()
+    if store is None:
+        logger.error("Vector store is not initialized. Cannot stream food guidance.")
+        yield from _unavailable_guidance().items()
+        return
+
+    stage_context = _resolve_stage_context(user)
+    normalized_food = food_name.strip()
+    neutral = _is_neutral_style(dialect_style)
+    base_key = _base_guidance_cache_key(normalized_food, stage_context)
+
+    base = cache.get(base_key)
+    if _is_generated_guidance(base) and neutral:
+        yield from base.items()
+        return
+
+    scanner = GuidanceFieldScanner()
+    schema = GUIDANCE_SCHEMA
+    layered = False
+    try:
+        if neutral:
+            entry_key = _guidance_entry_key(normalized_food, stage_context, None)
+            stored = guidance_store.load_guidance(entry_key, _guidance_generators())
+            if _is_generated_guidance(stored):
+                cache.set(base_key, stored, _base_cache_seconds())
+                yield from stored.items()
+                return
+            documents = retrieve_food_documents(store, normalized_food)
+            context = _format_source_documents(documents)
+            question = _build_guidance_question(normalized_food, NEUTRAL_STYLE, stage_context)
+            cache_key, timeout = base_key, _base_cache_seconds()
+        else:
+            if not _is_generated_guidance(base):
+                base = guidance_store.load_guidance(
+                    _guidance_entry_key(normalized_food, stage_context, None), _guidance_generators()
+                )
+                if _is_generated_guidance(base):
+                    cache.set(base_key, base, _base_cache_seconds())
+            entry_key = _guidance_entry_key(normalized_food, stage_context, dialect_style)
+            timeout = _style_cache_seconds()
+            if _is_generated_guidance(base):
+                cache_key = _styled_guidance_cache_key(base, dialect_style)
+                cached = cache.get(cache_key) or guidance_store.load_guidance(entry_key, _guidance_generators())
+                if _is_generated_guidance(cached):
+                    cache.set(cache_key, cached, timeout)
+                    yield from cached.items()
+                    return
+                context, question = json.dumps(base, ensure_ascii=False), _build_style_question(dialect_style)
+                # The rendering must not change the verdict, so it goes out first from the base.
+                scanner.emitted["is_safe"] = base["is_safe"]
+                yield "is_safe", base["is_safe"]
+            else:
+                # Cold base: one call streams the styled answer and fills both layers.
+                layered, schema = True, LAYERED_GUIDANCE_SCHEMA
+                scanner = GuidanceFieldScanner(LAYERED_GUIDANCE_FIELD_ALIASES)
+                documents = retrieve_food_documents(store, normalized_food)
+                context = _format_source_documents(documents)
+                question = _build_layered_guidance_question(normalized_food, dialect_style, stage_context)
+
+        streamed_by: List[str] = []
+
+        def open_stream(provider: str) -> Iterator[str]:
+            streamed_by.append(provider)
+            return GUIDANCE_STREAMERS[provider](context, question, schema)
+
+        deltas = provider_router.stream("rag", _rag_providers(), open_stream, labels=_rag_provider_labels())
+
+        for delta in deltas:
+            yield from scanner.feed(delta)
+
+        parsed = _extract_json(scanner.buffer)
+        if layered and parsed:
+            base, styled = _split_layered_guidance(parsed)
+            guidance = dict(styled or base)
+            # Streamed values are already final; only backfill what the model skipped.
+            guidance.update(scanner.emitted)
+            if styled is not None:
+                styled = guidance
+            # The router only falls through before the first delta, so the last backend opened answered.
+            _store_layered_guidance(streamed_by[-1], base, styled, dialect_style, normalized_food, stage_context)
+        elif parsed:
+            guidance = _normalize_guidance(parsed)
+            guidance.update(scanner.emitted)
+            cache.set(cache_key, guidance, timeout)
+            guidance_store.save_guidance(entry_key, _guidance_generator(streamed_by[-1]), guidance)
+        else:
+            guidance = _normalize_guidance(parsed)
+            guidance.update(scanner.emitted)
+            # The placeholder still answers this request but is never cached or stored.
+            logger.warning("Streamed guidance for %s held no JSON object; not caching it", food_name)
     except Exception as e:
-        logger.error("Error retrieving food guidance for %s: %s", food_name, e)
-        return {
-            "safety_summary": "정보를 가져오는 중 오류가 발생했습니다.",
-            "is_safe": False,
-            "nutritional_advice": "정보를 가져오는 중 오류가 발생했습니다.",
-        }
+        logger.error("Error streaming food guidance for %s: %s", food_name, e)
+        guidance = _failed_guidance()
+
+    for field, value in guidance.items():
+        if field not in scanner.emitted:
+            yield field, value
 
 
 def get_food_safety_info(food_name: str, dialect_style: str = "표준어") -> Dict[str, Any]:
@@ -451,25 +1214,55 @@ def get_nutritional_advice(food_name: str, user: Any, dialect_style: str) -> str
     return guidance["nutritional_advice"]
 
 
-def update_index(new_pdf_path: str) -> None:
-    global db
-    if db is None:
-        db = get_qa_chain()
-    if db is None:
+def sync_index(directory: Optional[str] = None, *, rebuild: bool = False) -> Optional[SyncReport]:
+    """
+    Ingest new or changed PDFs from ``directory`` (the corpus by default) and drop
+    the vectors of removed ones. Indexes built before the manifest existed, or
+    any index with ``rebuild``, are rebuilt from scratch.
+    """
+    global db, index_manifest
+    store = get_qa_chain()
+    if store is None or index_location is None:
         logger.error("Vector store is not initialized. Cannot update index.")
-        return
+        return None
 
+    embeddings = get_embeddings()
+    if isinstance(store, CompactIndex):
+        # The compact index is read-only; ingestion works on the FAISS store it was exported from.
+        store = _load_faiss(index_location, embeddings)
+    if isinstance(store, FAISS):
+        create_store = _faiss_factory(embeddings)
+    else:
+        create_store = _chroma_factory(embeddings, index_location)
+
+    directories = [directory or pdf_directory]
+    manifest = index_manifest
+    if rebuild or manifest is None or not manifest.exists:
+        manifest = _fresh_manifest(index_location)
+        if hasattr(store, "delete_collection"):
+            # Chroma would otherwise add the new chunks next to the old collection.
+            store.delete_collection()
+        store = None
+        if os.path.abspath(directories[0]) != os.path.abspath(pdf_directory):
+            directories.insert(0, pdf_directory)
+
+    report = SyncReport(version=manifest.version)
+    for path in directories:
+        store, report = _sync_directory(path, manifest, store, create_store)
+    if store is None:
+        logger.error("No texts available for creating index. Index update aborted.")
+        return report
+    _persist_timed(store, index_location, report)
+    manifest.save()
+    db, index_manifest = store, manifest
+    # Answers built on the previous evidence are never read again once the version moved.
+    guidance_store.purge_stale(_active_index_name("nutrition_index"), manifest.version)
+    return report
+
+
+def update_index(new_pdf_path: str) -> Optional[SyncReport]:
     try:
-        new_texts = load_and_process_pdfs(new_pdf_path)
-        if not new_texts:
-            logger.warning("No new texts found in %s. Index update aborted.", new_pdf_path)
-            return
-
-        db.add_documents(new_texts)
-        if hasattr(db, "save_local"):
-            db.save_local(os.path.join(_base_dir(), _active_index_name("nutrition_index")))
-        elif hasattr(db, "persist"):
-            db.persist()
-        logger.info("Index updated with new documents from: %s", new_pdf_path)
+        return sync_index(new_pdf_path)
     except Exception as e:
         logger.error("Error during index update with new PDFs from %s: %s", new_pdf_path, e)
+        return None
@@ -0,0 +1,157 @@
+"""
+Buffered writer for ``FoodRecognitionLog`` rows.
+
+Recognition requests only append an event to an in-process buffer; a background
+thread flushes it with ``bulk_create`` once ``RECOGNITION_LOG_FLUSH_SIZE`` events
+are waiting or every ``RECOGNITION_LOG_FLUSH_INTERVAL_MS``. Pending events are
+flushed at interpreter exit and from gunicorn's ``worker_exit`` hook. Rows are
+stamped when they are flushed, so ``date`` can trail the request by up to one
+flush interval.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from vision.metrics import registry
+from vision.models import FoodRecognitionLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL_MS = 1000
+DEFAULT_MAX_BUFFER = 5000
+SHUTDOWN_JOIN_SECONDS = 5
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def _buffering_enabled() -> bool:
+    value = str(_setting("RECOGNITION_LOG_BUFFERED", "true")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+def _flush_size() -> int:
+    return max(1, int(_setting("RECOGNITION_LOG_FLUSH_SIZE", DEFAULT_FLUSH_SIZE)))
+
+
+def _flush_interval_seconds() -> float:
+    return max(1.0, float(_setting("RECOGNITION_LOG_FLUSH_INTERVAL_MS", DEFAULT_FLUSH_INTERVAL_MS))) / 1000.0
+
+
+def _max_buffer() -> int:
+    return max(1, int(_setting("RECOGNITION_LOG_MAX_BUFFER", DEFAULT_MAX_BUFFER)))
+
+
+def write_recognition_logs(events: List[Dict[str, Any]]) -> int:
+    """Insert events in one ``bulk_create``, falling back to row-by-row when a row is rejected."""
+    if not events:
+        return 0
+    started = time.perf_counter()
+    close_old_connections()
+    rows = [FoodRecognitionLog(**event) for event in events]
+    try:
+        FoodRecognitionLog.objects.bulk_create(rows)
+        written = len(rows)
+    except Exception as exc:  # pylint: disable=broad-except
+        # One bad row (e.g. a user deleted meanwhile) must not drop the whole batch.
+        logger.warning("Bulk insert of %s recognition logs failed, retrying row by row: %s", len(rows), str(exc))
+        close_old_connections()
+        written = 0
+        for row in rows:
+            try:
+                row.save(force_insert=True)
+                written += 1
+            except Exception as row_exc:  # pylint: disable=broad-except
+                logger.error("Dropping recognition log for user %s: %s", row.user_id, str(row_exc))
+        registry.counter("recognition_log.failed").inc(len(rows) - written)
+    registry.counter("recognition_log.written").inc(written)
+    registry.histogram("recognition_log.flush_ms").observe((time.perf_counter() - started) * 1000.0)
+    return written
+
+
+class RecognitionLogWriter:
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._buffer: List[Dict[str, Any]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._closed = False
+
+    def record(self, **event: Any) -> None:
+        if not _buffering_enabled():
+            write_recognition_logs([event])
+            return
+
+        with self._condition:
+            if not self._closed:
+                self._ensure_thread()
+                self._buffer.append(event)
+                overflow = len(self._buffer) - _max_buffer()
+                if overflow > 0:
+                    # The database is not keeping up; shed the oldest events rather than grow without bound.
+                    del self._buffer[:overflow]
+                    registry.counter("recognition_log.dropped").inc(overflow)
+                registry.gauge("recognition_log.buffered").set(len(self._buffer))
+                if len(self._buffer) >= _flush_size():
+                    self._condition.notify()
+                return
+        # Late events during shutdown are written directly.
+        write_recognition_logs([event])
+
+    def _ensure_thread(self) -> None:
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        if self._pid is not None:
+            # Forked from a process that already buffered events; the parent flushes those.
+            self._buffer = []
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="recognition-log-writer", daemon=True)
+        self._thread.start()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch, self._buffer = self._buffer, []
+        registry.gauge("recognition_log.buffered").set(0)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._closed and len(self._buffer) < _flush_size():
+                    self._condition.wait(_flush_interval_seconds())
+                batch = self._take_batch()
+                closed = self._closed
+            try:
+                write_recognition_logs(batch)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error("Recognition log flush failed: %s", str(exc), exc_info=True)
+            if closed:
+                return
+
+    def flush(self) -> int:
+        with self._condition:
+            batch = self._take_batch()
+        return write_recognition_logs(batch)
+
+    def close(self) -> None:
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread if self._pid == os.getpid() else None
+            self._condition.notify()
+        if thread is not None and thread.is_alive():
+            thread.join(SHUTDOWN_JOIN_SECONDS)
+        # Anything the writer thread did not get to (or a missing thread) is flushed here.
+        self.flush()
+
+
+recognition_log_writer = RecognitionLogWriter()
+atexit.register(recognition_log_writer.close)
@@ -35,8 +35,8 @@ class FoodRecommendationSerializer(serializers.ModelSerializer):
 class FoodRecognitionLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = FoodRecognitionLog
-        fields = ['id', 'user', 'image_url', 'recognized_food', 'confidence_score', 'date']
-        read_only_fields = ['user', 'date']
+        fields = ['id', 'user', 'image_url', 'recognized_food', 'confidence_score', 'provider', 'model_name', 'latency_ms', 'date']
+        read_only_fields = ['user', 'provider', 'model_name', 'latency_ms', 'date']
 
 class FoodRatingSerializer(serializers.ModelSerializer):
     class Meta:
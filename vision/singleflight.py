@@ -0,0 +1,140 @@
+"""
+Singleflight coalescing for expensive cache-filled computations.
+
+Concurrent callers asking for the same cache key share one computation. Inside a
+worker process the first caller (the leader) runs it and the others wait on its
+``Future``. Across processes the leader also takes a short lease with
+``cache.add``; leaders in other workers that lose the lease poll the cache for
+the winner's result instead of calling the backend themselves. If the lease
+holder fails or dies, the lease is released or expires and a waiting worker
+takes over.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from vision.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_POLL_MS = 50
+MAX_POLL_MS = 500
+LEASE_PREFIX = "singleflight:lease:"
+
+
+def _setting(name: str, default: Any = None) -> Any:
+    return getattr(settings, name, os.getenv(name, default))
+
+
+def _singleflight_enabled() -> bool:
+    value = str(_setting("SINGLEFLIGHT_ENABLED", "true")).strip().lower()
+    return value in {"1", "true", "yes", "y", "on"}
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+
+    def _count(self, outcome: str) -> None:
+        registry.counter(f"singleflight.{self.name}.{outcome}").inc()
+
+    def do(
+        self,
+        cache_key: str,
+        compute: Callable[[], Any],
+        *,
+        timeout: int,
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for ``cache_key`` or compute it exactly once.
+
+        ``compute`` runs in the leader only. Its result is stored under ``cache_key``
+        for ``timeout`` seconds when ``cacheable`` accepts it (default: any truthy
+        value) and is handed to every waiting caller in this process. Exceptions
+        propagate to the in-process waiters as well.
+        """
+        cached = cache.get(cache_key)
+        if cached:
+            self._count("cache_hit")
+            return cached
+        if not _singleflight_enabled():
+            return self._compute_and_store(cache_key, compute, timeout, cacheable)
+
+        with self._lock:
+            future = self._inflight.get(cache_key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[cache_key] = future
+
+        if not leader:
+            self._count("coalesced")
+            return future.result()
+
+        try:
+            result = self._lead(cache_key, compute, timeout, cacheable)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+
+    def _compute_and_store(self, cache_key, compute, timeout, cacheable) -> Any:
+        result = compute()
+        if (cacheable or bool)(result):
+            cache.set(cache_key, result, timeout=timeout)
+        return result
+
+    def _lead(self, cache_key, compute, timeout, cacheable) -> Any:
+        lease_key = f"{LEASE_PREFIX}{cache_key}"
+        lease_seconds = int(_setting("SINGLEFLIGHT_LEASE_SECONDS", DEFAULT_LEASE_SECONDS))
+        poll_seconds = float(_setting("SINGLEFLIGHT_POLL_MS", DEFAULT_POLL_MS)) / 1000.0
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + lease_seconds
+        waited = False
+
+        while not cache.add(lease_key, token, timeout=lease_seconds):
+            # Another worker is computing the same key; wait for its result.
+            if not waited:
+                self._count("lease_wait")
+                waited = True
+            if time.monotonic() >= deadline:
+                logger.warning("Singleflight lease for %s was not released in time; computing locally", cache_key)
+                return self._compute_and_store(cache_key, compute, timeout, cacheable)
+            time.sleep(poll_seconds)
+            poll_seconds = min(poll_seconds * 2, MAX_POLL_MS / 1000.0)
+            cached = cache.get(cache_key)
+            if cached:
+                self._count("lease_hit")
+                return cached
+
+        try:
+            # The previous lease holder may have filled the cache just before releasing.
+            cached = cache.get(cache_key)
+            if cached:
+                self._count("lease_hit")
+                return cached
+            self._count("computed")
+            return self._compute_and_store(cache_key, compute, timeout, cacheable)
+        finally:
+            if cache.get(lease_key) == token:
+                cache.delete(lease_key)
+
+
+recognition_flight = SingleFlight("recognition")
+guidance_flight = SingleFlight("guidance")
@@ -0,0 +1,150 @@
+import json
+import logging
+from typing import Any, Iterator, Optional
+
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .image_preprocessing import ImageUpload, prepare_image
+from .parsers import ImageTooLarge, image_upload_from, read_image_stream
+from .rag_utils import stream_food_guidance
+from .views import (
+    RECOGNITION_CACHE_TIMEOUT,
+    _recognition_cache_key,
+    _recognize_food,
+    _resolve_response_style,
+)
+
+logger = logging.getLogger(__name__)
+
+# rag_utils field name -> field name used by the JSON recognize endpoint
+RESPONSE_FIELDS = {
+    "safety_summary": "safety_info",
+    "is_safe": "is_safe",
+    "nutritional_advice": "nutritional_advice",
+}
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _authenticate(request) -> Optional[Any]:
+    drf_request = Request(
+        request,
+        authenticators=[authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    user = drf_request.user
+    return user if user and user.is_authenticated else None
+
+
+def _read_image_upload(request) -> Optional[ImageUpload]:
+    """Accept the same bodies as the JSON endpoint: base64 JSON, multipart or a raw image."""
+    content_type = request.content_type or ""
+    if content_type.startswith("image/"):
+        return read_image_stream(request)
+    if content_type == "multipart/form-data":
+        return image_upload_from(request.FILES.get("image"))
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    image_data = body.get("image") if isinstance(body, dict) else None
+    return image_upload_from(image_data) if isinstance(image_data, str) else None
+
+
+def _recognition_events(user, response_style, upload: ImageUpload, cache_key: str) -> Iterator[str]:
+    cached_payload = cache.get(cache_key)
+    if cached_payload:
+        yield _sse("food_name", {"food_name": cached_payload["food_name"]})
+        for field in RESPONSE_FIELDS.values():
+            if field in cached_payload:
+                yield _sse(field, {field: cached_payload[field]})
+        yield _sse("done", cached_payload)
+        return
+
+    try:
+        prepared_image = prepare_image(upload)
+    except ValueError as e:
+        logger.warning("Invalid image payload: %s", str(e))
+        yield _sse("error", {"error": "이미지 형식이 올바르지 않습니다.", "status": 400})
+        return
+
+    result = _recognize_food(prepared_image, user.id)
+    if not isinstance(result, dict) or 'error' in result:
+        error = result.get('error') if isinstance(result, dict) else "음식 인식 처리 중 예기치 않은 오류가 발생했습니다."
+        logger.error("Food recognition error: %s", error)
+        yield _sse("error", {"error": error, "status": 400})
+        return
+    if result.get('food_name') == "Unknown":
+        yield _sse("error", {"error": "음식을 인식할 수 없습니다.", "status": 404})
+        return
+
+    yield _sse("food_name", {"food_name": result['food_name']})
+
+    try:
+        guidance_fields = stream_food_guidance(result['food_name'], dialect_style=response_style.prompt, user=user)
+        for field, value in guidance_fields:
+            response_field = RESPONSE_FIELDS.get(field)
+            if response_field and response_field not in result:
+                result[response_field] = value
+                yield _sse(response_field, {response_field: value})
+    except Exception as e:
+        logger.error("Error streaming combined guidance: %s", str(e))
+        result.setdefault('is_safe', False)
+        result.setdefault('safety_info', "안전 정보를 가져오는 중 오류가 발생했습니다.")
+        result.setdefault('nutritional_advice', "영양 조언을 가져오는 중 오류가 발생했습니다.")
+        yield _sse("error", {"error": "안내 정보를 가져오는 중 오류가 발생했습니다.", "status": 500})
+
+    cache.set(cache_key, result, timeout=RECOGNITION_CACHE_TIMEOUT)
+    yield _sse("done", result)
+
+
+@csrf_exempt
+def recognize_stream(request):
+    """
+    Server-Sent Events variant of ``FoodViewSet.recognize``.
+
+    Emits ``food_name`` as soon as recognition finishes, then ``safety_info``,
+    ``is_safe`` and ``nutritional_advice`` as the LLM completes each field, and
+    finally ``done`` with the same body the JSON endpoint returns.
+
+    The events come from a plain generator, so WSGI workers write each one as it is
+    produced. A stream holds one worker thread for its whole duration; the gthread
+    workers (``GUNICORN_THREADS`` > 1) keep serving other requests meanwhile. Under
+    ASGI, Django would buffer a sync iterator, so this view is meant for WSGI.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST 요청만 지원합니다."}, status=405)
+
+    try:
+        user = _authenticate(request)
+    except APIException as exc:
+        return JsonResponse({"detail": str(exc.detail)}, status=exc.status_code)
+    if user is None:
+        return JsonResponse({"detail": "자격 인증데이터(authentication credentials)가 제공되지 않았습니다."}, status=401)
+
+    try:
+        upload = _read_image_upload(request)
+    except ImageTooLarge as exc:
+        return JsonResponse({"error": str(exc.detail)}, status=exc.status_code)
+    except ValueError as exc:
+        logger.warning("Invalid image payload: %s", str(exc))
+        return JsonResponse({"error": "이미지 형식이 올바르지 않습니다."}, status=400)
+    if upload is None or not upload.size:
+        return JsonResponse({"error": "이미지가 제공되지 않았습니다."}, status=400)
+
+    response_style = _resolve_response_style(user)
+    cache_key = _recognition_cache_key(user.id, response_style.name, upload.content_hash)
+
+    response = StreamingHttpResponse(
+        _recognition_events(user, response_style, upload, cache_key),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import threading
+
+import faiss
+import numpy as np
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from vision.compact_index import CompactIndex, compact_directory, export_compact
+
+
+class FakeFAISSStore:
+    """The attributes of a LangChain FAISS store that ``export_compact`` reads."""
+
+    def __init__(self, vectors):
+        self.index = faiss.IndexFlatL2(vectors.shape[1])
+        self.index.add(vectors)
+        self.index_to_docstore_id = {row: f"chunk-{row}" for row in range(len(vectors))}
+        self.documents = {
+            doc_id: Document(id=doc_id, page_content=f"text {row}", metadata={"page": row})
+            for row, doc_id in self.index_to_docstore_id.items()
+        }
+        self.docstore = self
+
+    def search(self, doc_id):
+        return self.documents[doc_id]
+
+
+class CompactIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.vectors = np.random.default_rng(0).standard_normal((50, 8)).astype(np.float32)
+        self.store = FakeFAISSStore(self.vectors)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_search_returns_documents_for_the_nearest_rows(self):
+        export_compact(self.store, self.tmpdir.name, 1)
+        index = CompactIndex(self.tmpdir.name, None)
+
+        documents = index.similarity_search_by_vector(self.vectors[7].tolist(), k=2)
+
+        self.assertEqual(documents[0].id, "chunk-7")
+        self.assertEqual(documents[0].page_content, "text 7")
+        self.assertEqual(documents[0].metadata, {"page": 7})
+        self.assertEqual(sorted(doc.id for doc in index.get_by_ids(["chunk-3", "chunk-9", "missing"])), ["chunk-3", "chunk-9"])
+
+    def test_loaded_index_survives_later_exports_from_new_threads(self):
+        export_compact(self.store, self.tmpdir.name, 1)
+        index = CompactIndex(self.tmpdir.name, None)
+        export_compact(self.store, self.tmpdir.name, 2)
+        export_compact(self.store, self.tmpdir.name, 3)
+        self.assertNotIn("docstore.v1.sqlite3", os.listdir(compact_directory(self.tmpdir.name)))
+
+        found = []
+        thread = threading.Thread(
+            target=lambda: found.extend(index.similarity_search_by_vector(self.vectors[4].tolist(), k=1))
+        )
+        thread.start()
+        thread.join()
+
+        self.assertEqual([doc.id for doc in found], ["chunk-4"])
+        self.assertEqual(CompactIndex(self.tmpdir.name, None).version, 3)
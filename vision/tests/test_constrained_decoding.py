@@ -0,0 +1,140 @@
+import json
+import string
+
+import torch
+from django.test import SimpleTestCase
+
+from vision.constrained_decoding import COMPLETE, JsonAutomaton, JsonSchemaLogitsProcessor, compile_schema
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "maxLength": 5},
+        "is_food": {"type": "boolean"},
+        "items": {
+            "type": "array",
+            "maxItems": 2,
+            "items": {"type": "object", "properties": {"score": {"type": "number"}}},
+        },
+    },
+    "required": ["name", "is_food", "items"],
+}
+EOS_TOKEN_ID = 0
+
+
+class FakeTokenizer:
+    """A SentencePiece-style vocabulary: specials, every printable character and a few words."""
+
+    all_special_ids = [EOS_TOKEN_ID]
+
+    def __init__(self):
+        self.pieces = ["</s>"] + list(string.printable.strip()) + ['{"', '":', "true", "▁rice", "kimchi", "<0x22>"]
+
+    def __len__(self):
+        return len(self.pieces)
+
+    def convert_ids_to_tokens(self, ids):
+        return [self.pieces[token_id] for token_id in ids]
+
+    def get_added_vocab(self):
+        return {}
+
+    def token_id(self, piece):
+        return self.pieces.index(piece)
+
+
+# One instance for the module: token texts are cached per tokenizer object.
+TOKENIZER = FakeTokenizer()
+
+
+class JsonAutomatonTestCase(SimpleTestCase):
+    def setUp(self):
+        self.automaton = JsonAutomaton(compile_schema(SCHEMA))
+        self.start = self.automaton.initial_state()
+
+    def feed(self, text):
+        return self.automaton.feed_text(self.start, text)
+
+    def test_accepts_a_reply_in_schema_order(self):
+        reply = '{"name":"rice","is_food":true,"items":[{"score":0.75},{"score":-2}]}'
+
+        self.assertEqual(self.feed(reply), COMPLETE)
+        self.assertEqual(self.feed('{"name":"a\\"b","is_food":false,"items":[]}'), COMPLETE)
+        self.assertIsNotNone(self.feed('{"name":"ri'))
+
+    def test_rejects_keys_out_of_order_or_outside_the_schema(self):
+        self.assertIsNone(self.feed('{"is_food":'))
+        self.assertIsNone(self.feed('{"calories":'))
+        self.assertIsNone(self.feed('{"name":"rice","items":'))
+        self.assertIsNone(self.feed('{"name":"rice","is_food":true,"items":[],"extra":'))
+        self.assertIsNone(self.feed('{ "name":'))
+
+    def test_enforces_max_length_and_max_items(self):
+        self.assertIsNotNone(self.feed('{"name":"12345"'))
+        self.assertIsNone(self.feed('{"name":"123456'))
+
+        two_items = '{"name":"","is_food":true,"items":[{"score":1},{"score":2}'
+        self.assertIsNotNone(self.feed(two_items + "]"))
+        self.assertIsNone(self.feed(two_items + ","))
+
+    def test_rejects_a_feed_after_completion(self):
+        reply = '{"name":"","is_food":true,"items":[]}'
+
+        self.assertIsNone(self.feed(reply + " "))
+        self.assertIsNone(self.automaton.fallback_char(COMPLETE))
+
+    def test_fallback_chars_close_any_prefix_into_valid_json(self):
+        for prefix in ["", '{"name":"ki', '{"name":"","is_food":f', '{"name":"","is_food":true,"items":[{"score":1.']:
+            with self.subTest(prefix=prefix):
+                text, state = prefix, self.feed(prefix)
+                while state:
+                    char = self.automaton.fallback_char(state)
+                    text, state = text + char, self.automaton.feed(state, char)
+                    self.assertIsNotNone(state)
+
+                reply = json.loads(text)
+                self.assertEqual(list(reply), ["name", "is_food", "items"])
+                self.assertIsInstance(reply["is_food"], bool)
+
+
+class JsonSchemaLogitsProcessorTestCase(SimpleTestCase):
+    def setUp(self):
+        self.processor = JsonSchemaLogitsProcessor(TOKENIZER, SCHEMA, eos_token_id=EOS_TOKEN_ID, top_k=4)
+        self.input_ids = torch.tensor([[EOS_TOKEN_ID, EOS_TOKEN_ID]])
+
+    def step(self, scores):
+        constrained = self.processor(self.input_ids, scores.unsqueeze(0))
+        token_id = int(constrained[0].argmax())
+        self.input_ids = torch.cat([self.input_ids, torch.tensor([[token_id]])], dim=1)
+        return token_id, constrained[0]
+
+    def prefer(self, *pieces):
+        scores = torch.zeros(len(TOKENIZER))
+        for rank, piece in enumerate(pieces):
+            scores[TOKENIZER.token_id(piece)] = float(len(pieces) - rank)
+        return scores
+
+    def test_keeps_the_highest_legal_candidate_and_masks_the_rest(self):
+        token_id, constrained = self.step(self.prefer("x", '{"', "{"))
+
+        self.assertEqual(token_id, TOKENIZER.token_id('{"'))
+        self.assertEqual(int(torch.isfinite(constrained).sum()), 1)
+
+    def test_forces_the_fallback_character_when_no_candidate_is_legal(self):
+        token_id, _ = self.step(self.prefer("x", "y", "z", "]"))
+
+        self.assertEqual(token_id, TOKENIZER.token_id("{"))
+
+    def test_generation_ends_in_valid_json_then_eos(self):
+        generator = torch.Generator().manual_seed(0)
+        for _ in range(200):
+            token_id, _ = self.step(torch.randn(len(TOKENIZER), generator=generator))
+            if token_id == EOS_TOKEN_ID:
+                break
+        self.assertTrue(self.processor.is_complete(0))
+
+        text = "".join(self.processor.texts[token_id] for token_id in self.input_ids[0, 2:-1].tolist())
+        self.assertEqual(list(json.loads(text)), ["name", "is_food", "items"])
+
+        token_id, _ = self.step(self.prefer("}", "x"))
+        self.assertEqual(token_id, EOS_TOKEN_ID)
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from vision.embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[len(text) / 3.0, 0.1] for text in texts]
+
+
+class CachedEmbeddingsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = EmbeddingStore(os.path.join(self.tmpdir.name, "cache.sqlite3"))
+        self.inner = FakeEmbeddings()
+        self.embeddings = CachedEmbeddings(self.inner, "fake", "model", self.store)
+
+    def test_cold_and_warm_calls_return_identical_vectors(self):
+        cold = self.embeddings.embed_documents(["rice", "kimchi", "rice"])
+        warm = self.embeddings.embed_documents(["kimchi", "rice"])
+
+        self.assertEqual(self.inner.embedded, ["rice", "kimchi"])
+        self.assertEqual(warm, [cold[1], cold[0]])
+        self.assertEqual(cold[0], cold[2])
+        # Values come back at the stored float16 precision, not the backend's.
+        self.assertNotEqual(cold[0][1], 0.1)
+        self.assertAlmostEqual(cold[0][1], 0.1, places=3)
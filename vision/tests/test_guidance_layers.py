@@ -0,0 +1,91 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from vision import rag_utils
+from vision.provider_router import ProviderRouter
+
+BASE_ANSWER = {"safety_summary": "대체로 안전합니다.", "is_safe": True, "nutritional_advice": "나트륨에 주의하세요."}
+STYLED_ANSWER = {
+    **BASE_ANSWER,
+    "styled_safety_summary": "대체로 괜찮아예.",
+    "styled_nutritional_advice": "짠 거 조심하이소.",
+}
+STYLE = "경상도 사투리"
+
+
+@override_settings(RAG_PROVIDERS="ollama", SINGLEFLIGHT_ENABLED="false")
+class LayeredGuidanceTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+        self.stored = {}
+        patches = [
+            mock.patch.object(rag_utils, "get_qa_chain", return_value=object()),
+            mock.patch.object(rag_utils, "retrieve_food_documents", return_value=[]),
+            mock.patch.object(rag_utils, "_is_neutral_style", side_effect=lambda style: style == "표준어"),
+            mock.patch.object(rag_utils, "_rag_provider_labels", return_value={"ollama": "fake"}),
+            mock.patch.object(rag_utils, "provider_router", ProviderRouter()),
+            mock.patch.dict(rag_utils.GUIDANCE_INVOKERS, {"ollama": self.invoke}),
+            mock.patch.dict(rag_utils.GUIDANCE_STREAMERS, {"ollama": self.stream}),
+            mock.patch.object(rag_utils.guidance_store, "load_guidance", side_effect=self.load_guidance),
+            mock.patch.object(rag_utils.guidance_store, "save_guidance", side_effect=self.save_guidance),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def answer(self, question, schema):
+        self.calls.append((question, schema))
+        if schema is rag_utils.LAYERED_GUIDANCE_SCHEMA:
+            return json.dumps(STYLED_ANSWER, ensure_ascii=False)
+        if question.startswith("Style instructions"):
+            return json.dumps({**BASE_ANSWER, "safety_summary": "다시 쓴 요약"}, ensure_ascii=False)
+        return json.dumps(BASE_ANSWER, ensure_ascii=False)
+
+    def invoke(self, context, question, schema=rag_utils.GUIDANCE_SCHEMA):
+        return self.answer(question, schema)
+
+    def stream(self, context, question, schema=rag_utils.GUIDANCE_SCHEMA):
+        answer = self.answer(question, schema)
+        for start in range(0, len(answer), 7):
+            yield answer[start : start + 7]
+
+    def load_guidance(self, entry_key, generators):
+        return self.stored.get(entry_key["style"])
+
+    def save_guidance(self, entry_key, generator, guidance):
+        self.stored[entry_key["style"]] = guidance
+
+    def test_cold_styled_request_fills_both_layers_with_one_call(self):
+        styled = rag_utils.get_food_guidance("김치", dialect_style=STYLE)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(styled["safety_summary"], "대체로 괜찮아예.")
+        self.assertEqual(styled["nutritional_advice"], "짠 거 조심하이소.")
+        self.assertTrue(styled["is_safe"])
+
+        self.assertEqual(rag_utils.get_food_guidance("김치", dialect_style="표준어"), BASE_ANSWER)
+        self.assertEqual(rag_utils.get_food_guidance("김치", dialect_style=STYLE), styled)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_warm_base_is_rewritten_without_retrieval(self):
+        rag_utils.get_food_guidance("김치", dialect_style="표준어")
+
+        styled = rag_utils.get_food_guidance("김치", dialect_style=STYLE)
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertTrue(self.calls[1][0].startswith("Style instructions"))
+        self.assertEqual(styled["safety_summary"], "다시 쓴 요약")
+
+    def test_cold_styled_stream_yields_styled_fields_from_one_call(self):
+        fields = dict(rag_utils.stream_food_guidance("김치", dialect_style=STYLE))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(fields["safety_summary"], "대체로 괜찮아예.")
+        self.assertEqual(fields["nutritional_advice"], "짠 거 조심하이소.")
+        self.assertEqual(rag_utils.get_food_guidance("김치", dialect_style="표준어"), BASE_ANSWER)
+        self.assertEqual(rag_utils.get_food_guidance("김치", dialect_style=STYLE), fields)
+        self.assertEqual(len(self.calls), 1)
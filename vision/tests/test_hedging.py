@@ -0,0 +1,91 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, override_settings
+
+from vision import food_recognition
+from vision.hedging import hedged_call
+from vision.metrics import registry
+
+
+@override_settings(VISION_HEDGING="true", VISION_HEDGE_DELAY_MS=50, VISION_HEDGE_MIN_DELAY_MS=50)
+class HedgedCallTestCase(SimpleTestCase):
+    def test_cancelled_primary_is_recorded_as_a_censored_latency(self):
+        primary_cancelled = threading.Event()
+
+        def invoke(model, cancel_event):
+            if model == "primary":
+                cancel_event.wait(5)
+                primary_cancelled.set()
+                return "late"
+            return "ok"
+
+        result = hedged_call("test_hedge_censored", ["primary", "backup"], invoke, accept=bool)
+
+        self.assertEqual(result, ("backup", "ok"))
+        self.assertTrue(primary_cancelled.wait(5))
+        primary = registry.histogram("test_hedge_censored.latency_ms.primary")
+        self.assertEqual(primary.count, 1)
+        self.assertGreaterEqual(primary.percentile(50), 50)
+        self.assertEqual(registry.counter("test_hedge_censored.latency_censored.primary").value, 1)
+        self.assertEqual(registry.histogram("test_hedge_censored.latency_ms.backup").count, 1)
+
+
+class FakeOpenAIStream:
+    def __init__(self, text, delay):
+        self.text = text
+        self.delay = delay
+        self.closed = False
+
+    def __iter__(self):
+        for char in self.text:
+            time.sleep(self.delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=char))])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeOpenAIClient:
+    def __init__(self, delays):
+        self.delays = delays
+        self.streams = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, stream, **kwargs):
+        self.streams[model] = FakeOpenAIStream('{"food_name": "kimchi"}' * 20, self.delays[model])
+        return self.streams[model]
+
+
+@override_settings(VISION_HEDGING="true", VISION_HEDGE_DELAY_MS=50, VISION_HEDGE_MIN_DELAY_MS=50)
+class OpenAIHedgeCancellationTestCase(SimpleTestCase):
+    def test_cancelled_loser_stops_reading_and_releases_its_worker(self):
+        client = FakeOpenAIClient({"slow": 0.02, "fast": 0.0})
+        finished = {}
+
+        def invoke(model, cancel_event):
+            try:
+                return food_recognition._stream_openai_vision_content(client, model, "b64", "image/png", cancel_event)
+            finally:
+                finished[model] = time.monotonic()
+
+        model, _ = hedged_call("test_openai_cancel", ["slow", "fast"], invoke, accept=bool)
+        returned = time.monotonic()
+        deadline = returned + 2
+        while "slow" not in finished and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(model, "fast")
+        # The full slow stream would take about 9 seconds.
+        self.assertLess(finished["slow"] - returned, 0.5)
+        self.assertTrue(client.streams["slow"].closed)
+
+    def test_cancelled_call_is_not_started(self):
+        client = FakeOpenAIClient({"slow": 0.0})
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        with self.assertRaises(food_recognition.OpenAICallCancelled):
+            food_recognition._stream_openai_vision_content(client, "slow", "b64", "image/png", cancel_event)
+        self.assertEqual(client.streams, {})
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+from PIL import Image
+
+from vision.local_vlm_server import LocalVLMClient, LocalVLMServer, fake_generate_batch
+from vision.vlm_batching import MicroBatchScheduler
+
+
+class LocalVLMServerTransportTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "vlm.sock")
+        self.scheduler = MicroBatchScheduler(fake_generate_batch, max_batch_size=4, max_wait_ms=20, name="test_vlm")
+        self.server = self.start_server()
+        self.client = LocalVLMClient(self.socket_path, timeout=5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def start_server(self):
+        server = LocalVLMServer(self.socket_path, self.scheduler, fake=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    @staticmethod
+    def food_name(raw_result):
+        return json.loads(raw_result)["detected_items"][0]["food_name"]
+
+    def test_generate_passes_pixels_through_shared_memory(self):
+        image = Image.new("RGB", (640, 480), (0x12, 0x34, 0x56))
+
+        self.assertEqual(self.food_name(self.client.generate(image)), "fake-123456")
+
+    def batch_count(self):
+        return self.client.ping()["batching"].get("test_vlm.batch.size", {}).get("count", 0)
+
+    def test_concurrent_requests_share_batches(self):
+        colors = [(index * 10, 0, 0) for index in range(8)]
+        batches_before = self.batch_count()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda color: self.client.generate(Image.new("RGB", (32, 32), color)), colors))
+
+        self.assertEqual(
+            [self.food_name(result) for result in results],
+            [f"fake-{red:02x}0000" for red, _, _ in colors],
+        )
+        self.assertLess(self.batch_count() - batches_before, len(colors))
+
+    def test_client_reconnects_after_server_restart(self):
+        self.assertTrue(self.client.ping()["fake"])
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = self.start_server()
+
+        self.assertTrue(self.client.ping()["fake"])
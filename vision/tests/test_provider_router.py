@@ -0,0 +1,190 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from vision.provider_router import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BackendHealth,
+    ProviderRouter,
+    ProvidersExhausted,
+    ProvidersUnavailable,
+)
+
+
+@override_settings(
+    PROVIDER_EWMA_ALPHA=0.5,
+    PROVIDER_BREAKER_FAILURE_THRESHOLD=3,
+    PROVIDER_BREAKER_ERROR_RATE=0.9,
+    PROVIDER_BREAKER_MIN_CALLS=100,
+    PROVIDER_BREAKER_COOLDOWN_SECONDS=30,
+    PROVIDER_ERROR_PENALTY_MS=1000,
+    PROVIDER_SCORE_HALF_LIFE_SECONDS=0,
+)
+class BackendHealthTestCase(SimpleTestCase):
+    def setUp(self):
+        self.health = BackendHealth("rag", "ollama")
+
+    def after_cooldown(self):
+        return time.monotonic() + 31
+
+    def test_ewma_latency_and_error_rate(self):
+        self.health.record_success(100.0)
+        self.health.record_success(300.0)
+        self.assertEqual(self.health.ewma_latency_ms, 200.0)
+
+        self.health.record_failure(10.0, "boom")
+        # A fast failure is observed at no less than the current average.
+        self.assertEqual(self.health.ewma_latency_ms, 200.0)
+        self.assertEqual(self.health.ewma_error_rate, 0.5)
+        self.assertEqual(self.health.score(), 200.0 + 1000 * 0.5)
+
+        self.health.record_success(200.0)
+        self.assertEqual(self.health.ewma_error_rate, 0.25)
+
+    @override_settings(PROVIDER_SCORE_HALF_LIFE_SECONDS=60)
+    def test_stale_measurements_decay_toward_the_prior(self):
+        self.health.record_success(800.0)
+        observed_at = self.health.observed_at
+
+        self.assertEqual(self.health.score(observed_at), 800.0)
+        self.assertEqual(self.health.score(observed_at + 60), 400.0)
+
+        with mock.patch("vision.provider_router.time.monotonic", return_value=observed_at + 600):
+            self.health.record_success(100.0)
+        # Ten half-lives later the old average keeps about 0.05% of its weight.
+        self.assertLess(self.health.ewma_latency_ms, 101.0)
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            self.health.record_failure(50.0)
+        self.assertEqual(self.health.state, CLOSED)
+
+        self.health.record_failure(50.0)
+
+        self.assertEqual(self.health.state, OPEN)
+        self.assertFalse(self.health.try_acquire(time.monotonic()))
+        self.assertFalse(self.health.is_eligible(time.monotonic()))
+
+    def test_success_resets_the_consecutive_count(self):
+        for _ in range(2):
+            self.health.record_failure(50.0)
+        self.health.record_success(50.0)
+        for _ in range(2):
+            self.health.record_failure(50.0)
+
+        self.assertEqual(self.health.state, CLOSED)
+
+    @override_settings(PROVIDER_BREAKER_MIN_CALLS=4, PROVIDER_BREAKER_ERROR_RATE=0.6)
+    def test_opens_on_error_rate_once_enough_calls(self):
+        outcomes = [False, True, False, True, True]
+        for failed in outcomes:
+            if failed:
+                self.health.record_failure(50.0)
+            else:
+                self.health.record_success(50.0)
+
+        self.assertLess(self.health.consecutive_failures, 3)
+        self.assertEqual(self.health.state, OPEN)
+
+    def test_half_open_allows_a_single_probe(self):
+        for _ in range(3):
+            self.health.record_failure(50.0)
+        now = self.after_cooldown()
+
+        self.assertTrue(self.health.is_eligible(now))
+        self.assertTrue(self.health.try_acquire(now))
+        self.assertEqual(self.health.state, HALF_OPEN)
+        self.assertFalse(self.health.try_acquire(now))
+
+        self.health.release_probe()
+        self.assertTrue(self.health.try_acquire(now))
+
+    def test_half_open_probe_outcome_closes_or_reopens(self):
+        for _ in range(3):
+            self.health.record_failure(50.0)
+        self.health.try_acquire(self.after_cooldown())
+        self.health.record_failure(50.0)
+        self.assertEqual(self.health.state, OPEN)
+
+        self.health.try_acquire(self.after_cooldown())
+        self.health.record_success(50.0)
+        self.assertEqual(self.health.state, CLOSED)
+        self.assertEqual(self.health.consecutive_failures, 0)
+
+
+@override_settings(PROVIDER_BREAKER_FAILURE_THRESHOLD=2, PROVIDER_BREAKER_MIN_CALLS=100)
+class ProviderRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ProviderRouter()
+
+    def test_falls_through_to_the_next_backend(self):
+        def invoke(name):
+            if name == "ollama":
+                raise RuntimeError("down")
+            return "ok"
+
+        self.assertEqual(self.router.call("rag", ["ollama", "openai"], invoke), "ok")
+        self.assertEqual(self.router.backend("rag", "ollama").failures, 1)
+
+    def test_orders_backends_by_score(self):
+        self.router.backend("rag", "ollama").record_success(900.0)
+        self.router.backend("rag", "openai").record_success(100.0)
+
+        self.assertEqual(self.router.plan("rag", ["ollama", "openai"]), ["openai", "ollama"])
+
+    def test_backends_within_the_tolerance_band_keep_their_priority(self):
+        self.router.backend("rag", "ollama").record_success(130.0)
+        self.router.backend("rag", "openai").record_success(100.0)
+
+        self.assertEqual(self.router.plan("rag", ["ollama", "openai"]), ["ollama", "openai"])
+
+    def test_a_stale_slow_backend_is_retried_and_recovers(self):
+        clock = [1000.0]
+
+        def invoke(name):
+            clock[0] += 0.1
+            return name
+
+        with mock.patch("vision.provider_router.time.monotonic", side_effect=lambda: clock[0]):
+            self.router.backend("rag", "ollama").record_success(900.0)
+            self.router.backend("rag", "openai").record_success(100.0)
+            self.assertEqual(self.router.plan("rag", ["ollama", "openai"]), ["openai", "ollama"])
+
+            # Ten half-lives without traffic: both scores fall inside the band.
+            clock[0] += 3000
+            self.assertEqual(self.router.call("rag", ["ollama", "openai"], invoke), "ollama")
+            self.assertAlmostEqual(self.router.backend("rag", "ollama").ewma_latency_ms, 100.0, delta=1.0)
+
+            # openai is now the stale one and gets its turn; afterwards both are fast.
+            self.assertEqual(self.router.call("rag", ["ollama", "openai"], invoke), "openai")
+            self.assertEqual(self.router.plan("rag", ["ollama", "openai"]), ["ollama", "openai"])
+
+    def test_rejected_results_raise_with_the_last_result(self):
+        with self.assertRaises(ProvidersExhausted) as raised:
+            self.router.call("rag", ["ollama", "openai"], lambda name: f"bad {name}", is_failure=lambda result: True)
+
+        self.assertEqual(raised.exception.last_result, "bad openai")
+        self.assertEqual(self.router.backend("rag", "openai").failures, 1)
+
+    def test_reraises_the_last_exception_when_nothing_answered(self):
+        def invoke(name):
+            raise ValueError(name)
+
+        with self.assertRaisesMessage(ValueError, "openai"):
+            self.router.call("rag", ["ollama", "openai"], invoke)
+
+    def test_open_circuits_are_skipped(self):
+        for _ in range(2):
+            self.router.backend("rag", "ollama").record_failure(50.0)
+        called = []
+
+        self.router.call("rag", ["ollama", "openai"], lambda name: called.append(name) or "ok")
+        self.assertEqual(called, ["openai"])
+
+        for _ in range(2):
+            self.router.backend("rag", "openai").record_failure(50.0)
+        with self.assertRaises(ProvidersUnavailable):
+            self.router.call("rag", ["ollama", "openai"], lambda name: "ok")
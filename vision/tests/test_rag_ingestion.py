@@ -0,0 +1,156 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from vision.rag_ingestion import IngestionManifest, chunk_id, sync_directory
+
+
+def fake_parse_pdf(path):
+    """One chunk per line of the file, so tests control chunk text without real PDFs."""
+    with open(path, "r", encoding="utf-8") as handle:
+        lines = [line for line in handle.read().splitlines() if line]
+    return [Document(page_content=line) for line in lines], {"load_ms": 0.0, "split_ms": 0.0}
+
+
+class FakeStore:
+    """The parts of a LangChain FAISS store that ``sync_directory`` uses."""
+
+    def __init__(self, documents, ids):
+        self.index_to_docstore_id = {}
+        self.added = []
+        self.deleted = []
+        self.add_documents(documents, ids=ids)
+
+    def add_documents(self, documents, ids):
+        for cid in ids:
+            self.index_to_docstore_id[len(self.index_to_docstore_id)] = cid
+        self.added.extend(ids)
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+        self.index_to_docstore_id = {
+            row: cid
+            for row, cid in enumerate(cid for cid in self.index_to_docstore_id.values() if cid not in set(ids))
+        }
+
+    @property
+    def ids(self):
+        return set(self.index_to_docstore_id.values())
+
+
+class IngestionManifestTestCase(SimpleTestCase):
+    def test_release_returns_only_chunks_no_other_file_owns(self):
+        manifest = IngestionManifest("unused.json")
+        manifest.files = {
+            "a.pdf": {"sha256": "a", "chunks": ["shared", "only-a"]},
+            "b.pdf": {"sha256": "b", "chunks": ["shared"]},
+        }
+        manifest.chunks = {"shared": ["a.pdf", "b.pdf"], "only-a": ["a.pdf"]}
+
+        self.assertEqual(manifest.release("a.pdf"), {"only-a"})
+        self.assertEqual(manifest.chunks, {"shared": ["b.pdf"]})
+        self.assertNotIn("a.pdf", manifest.files)
+        self.assertEqual(manifest.release("missing.pdf"), set())
+
+
+@mock.patch("vision.rag_ingestion.parse_pdf", fake_parse_pdf)
+class SyncDirectoryTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.base_dir = self.tmpdir.name
+        self.directory = os.path.join(self.base_dir, "pdfs")
+        os.makedirs(self.directory)
+        self.manifest = IngestionManifest(os.path.join(self.base_dir, "manifest.json"))
+        self.store = None
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, *lines):
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as handle:
+            handle.write("\n".join(lines))
+
+    def remove(self, name):
+        os.remove(os.path.join(self.directory, name))
+
+    def sync(self):
+        self.store, report = sync_directory(
+            self.directory, self.manifest, self.store, create_store=FakeStore, base_dir=self.base_dir
+        )
+        return report
+
+    def test_shared_chunks_are_stored_once_and_kept_while_owned(self):
+        self.write("a.pdf", "rice", "kimchi")
+        self.write("b.pdf", "rice", "bulgogi")
+
+        report = self.sync()
+
+        self.assertEqual(report.chunks_added, 3)
+        self.assertEqual(report.chunks_deduplicated, 1)
+        self.assertEqual(sorted(self.manifest.chunks[chunk_id("rice")]), ["pdfs/a.pdf", "pdfs/b.pdf"])
+
+        self.remove("a.pdf")
+        report = self.sync()
+
+        self.assertEqual(report.files_removed, ["pdfs/a.pdf"])
+        self.assertEqual(self.store.deleted, [chunk_id("kimchi")])
+        self.assertEqual(self.store.ids, {chunk_id("rice"), chunk_id("bulgogi")})
+        self.assertEqual(self.manifest.chunks[chunk_id("rice")], ["pdfs/b.pdf"])
+
+    def test_copy_is_ingested_when_its_original_is_removed(self):
+        self.write("a.pdf", "rice", "kimchi")
+        self.write("a (1).pdf", "rice", "kimchi")
+        report = self.sync()
+        self.assertEqual(report.duplicate_files, ["pdfs/a (1).pdf"])
+        self.assertEqual(self.manifest.files["pdfs/a (1).pdf"]["duplicate_of"], "pdfs/a.pdf")
+
+        self.remove("a.pdf")
+        report = self.sync()
+
+        # The copy now owns the chunks; their vectors are neither deleted nor embedded again.
+        self.assertEqual(report.files_added, ["pdfs/a (1).pdf"])
+        self.assertEqual((report.chunks_added, report.chunks_deleted), (0, 0))
+        self.assertEqual(self.store.ids, {chunk_id("rice"), chunk_id("kimchi")})
+        self.assertEqual(self.manifest.chunks[chunk_id("kimchi")], ["pdfs/a (1).pdf"])
+        self.assertNotIn("duplicate_of", self.manifest.files["pdfs/a (1).pdf"])
+
+    def test_changed_file_reuses_its_unchanged_chunks(self):
+        self.write("a.pdf", "rice", "kimchi")
+        self.sync()
+
+        self.write("a.pdf", "rice", "bibimbap")
+        report = self.sync()
+
+        self.assertEqual((report.files_removed, report.files_added), (["pdfs/a.pdf"], ["pdfs/a.pdf"]))
+        self.assertEqual(self.store.added, [chunk_id("rice"), chunk_id("kimchi"), chunk_id("bibimbap")])
+        self.assertEqual(self.store.deleted, [chunk_id("kimchi")])
+        self.assertEqual(self.store.ids, {chunk_id("rice"), chunk_id("bibimbap")})
+
+    def test_chunks_already_in_the_store_are_not_added_again(self):
+        # The store was persisted but the process died before the manifest was saved.
+        self.write("a.pdf", "rice", "kimchi")
+        self.store = FakeStore([Document(page_content="rice")], [chunk_id("rice")])
+
+        report = self.sync()
+
+        self.assertEqual(report.chunks_added, 1)
+        self.assertEqual(self.store.added, [chunk_id("rice"), chunk_id("kimchi")])
+        self.assertEqual(self.manifest.files["pdfs/a.pdf"]["chunks"], [chunk_id("rice"), chunk_id("kimchi")])
+
+    def test_version_bumps_only_when_the_index_changes(self):
+        self.write("a.pdf", "rice")
+        self.assertEqual(self.sync().version, 1)
+        self.assertEqual(self.sync().version, 1)
+
+        self.write("a (1).pdf", "rice")
+        report = self.sync()
+        self.assertEqual((report.duplicate_files, report.version), (["pdfs/a (1).pdf"], 1))
+
+        self.write("b.pdf", "kimchi")
+        self.assertEqual(self.sync().version, 2)
+        self.remove("b.pdf")
+        self.assertEqual(self.sync().version, 3)
+        self.assertEqual(self.manifest.version, 3)
@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from vision import streaming
+
+
+def parse_event(chunk):
+    event, data = (chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk).strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+class RecognizeStreamTestCase(SimpleTestCase):
+    def setUp(self):
+        self.guidance_finished = False
+        patches = [
+            mock.patch.object(streaming, "_authenticate", return_value=SimpleNamespace(id=1)),
+            mock.patch.object(
+                streaming, "_read_image_upload", return_value=SimpleNamespace(size=3, content_hash=self.id())
+            ),
+            mock.patch.object(
+                streaming, "_resolve_response_style", return_value=SimpleNamespace(name="standard", prompt="표준어")
+            ),
+            mock.patch.object(streaming, "prepare_image", side_effect=lambda upload: upload),
+            mock.patch.object(streaming, "_recognize_food", return_value={"food_name": "kimchi"}),
+            mock.patch.object(streaming, "stream_food_guidance", side_effect=self.fake_guidance),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fake_guidance(self, food_name, dialect_style, user):
+        yield "safety_summary", "generally safe"
+        yield "is_safe", True
+        yield "nutritional_advice", "mind the sodium"
+        self.guidance_finished = True
+
+    def test_events_are_produced_before_generation_completes(self):
+        request = RequestFactory().post("/api/foods/recognize/stream/", data={}, content_type="application/json")
+
+        response = streaming.recognize_stream(request)
+        self.assertFalse(response.is_async)
+        events = iter(response.streaming_content)
+
+        self.assertEqual(parse_event(next(events)), ("food_name", {"food_name": "kimchi"}))
+        self.assertEqual(parse_event(next(events)), ("safety_info", {"safety_info": "generally safe"}))
+        self.assertFalse(self.guidance_finished)
+
+        remaining = [parse_event(chunk) for chunk in events]
+        self.assertTrue(self.guidance_finished)
+        self.assertEqual([event for event, _ in remaining], ["is_safe", "nutritional_advice", "done"])
+        self.assertEqual(remaining[-1][1]["nutritional_advice"], "mind the sodium")
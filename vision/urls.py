@@ -1,14 +1,19 @@
 from django.urls import path
 from .views import (
     FoodViewSet, FoodLogViewSet, UserPregnancyProfileViewSet, 
-    FoodRecommendationViewSet, FoodRecognitionLogViewSet, FoodRatingViewSet, UserStyleViewSet
+    FoodRecommendationViewSet, FoodRecognitionLogViewSet, FoodRatingViewSet, UserStyleViewSet, VisionMetricsViewSet,
+    ProviderRoutingViewSet, ReadinessViewSet, RECOGNITION_PARSER_CLASSES,
+    BATCH_RECOGNITION_PARSER_CLASSES
 )
+from .streaming import recognize_stream
 
 urlpatterns = [
     # Food URLs
     path('foods/', FoodViewSet.as_view({'get': 'list'}), name='food-list'),
     path('foods/<int:pk>/', FoodViewSet.as_view({'get': 'retrieve'}), name='food-detail'),
-    path('foods/recognize/', FoodViewSet.as_view({'post': 'recognize'}), name='food-recognize'),
+    path('foods/recognize/', FoodViewSet.as_view({'post': 'recognize'}, parser_classes=RECOGNITION_PARSER_CLASSES), name='food-recognize'),
+    path('foods/recognize/batch/', FoodViewSet.as_view({'post': 'recognize_batch'}, parser_classes=BATCH_RECOGNITION_PARSER_CLASSES), name='food-recognize-batch'),
+    path('foods/recognize/stream/', recognize_stream, name='food-recognize-stream'),
     path('foods/<int:pk>/safety-info/', FoodViewSet.as_view({'get': 'safety_info'}), name='food-safety-info'),
 
     # FoodLog URLs
@@ -31,4 +36,9 @@ urlpatterns = [
 
     path('user-styles/list-styles/', UserStyleViewSet.as_view({'get': 'list_styles'}), name='list-styles'),
     path('user-styles/set-preferred-style/', UserStyleViewSet.as_view({'post': 'set_preferred_style'}), name='set-preferred-style'),
+
+    # Runtime metrics
+    path('vision/ready/', ReadinessViewSet.as_view({'get': 'list'}), name='vision-ready'),
+    path('vision/metrics/', VisionMetricsViewSet.as_view({'get': 'list'}), name='vision-metrics'),
+    path('vision/routing/', ProviderRoutingViewSet.as_view({'get': 'list'}), name='vision-routing'),
 ]
\ No newline at end of file
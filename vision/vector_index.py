@@ -0,0 +1,111 @@
+"""
+FAISS index types for the served (compact) nutrition index.
+
+Ingestion keeps an exact flat index because it needs ``remove_ids`` for
+changed and deleted PDFs, which HNSW does not support. The served index is
+rebuilt from the flat vectors on every export as one of ``INDEX_TYPES``:
+
+- ``flat``: exact search over float32 vectors (the baseline).
+- ``hnsw``: HNSW graph over float32 vectors; faster search, more memory.
+- ``ivfpq``: inverted lists with product-quantized codes; smallest, lossy.
+- ``ivfsq8``: inverted lists with 8-bit scalar-quantized vectors (4x smaller).
+"""
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq", "ivfsq8")
+# FAISS warns below 39 training points per centroid; below this many vectors IVF variants fall back to flat.
+MIN_POINTS_PER_CENTROID = 39
+MIN_IVF_VECTORS = 1000
+
+
+@dataclass
+class IndexParams:
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 80
+    hnsw_ef_search: int = 64
+    ivf_nlist: int = 0  # 0: about 4 * sqrt(n), capped so every centroid gets enough training points
+    ivf_nprobe: int = 8
+    pq_m: int = 0  # 0: one sub-quantizer per 8 dimensions
+
+    def search_parameters(self) -> Dict[str, int]:
+        return {"efSearch": self.hnsw_ef_search, "nprobe": self.ivf_nprobe}
+
+
+def _nlist(count: int, configured: int) -> int:
+    if configured > 0:
+        return configured
+    return max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_m(dim: int, configured: int) -> int:
+    if configured > 0:
+        return configured
+    target = max(1, dim // 8)
+    return next(m for m in range(target, 0, -1) if dim % m == 0)
+
+
+def effective_type(index_type: str, count: int) -> str:
+    if index_type in {"ivfpq", "ivfsq8"} and count < MIN_IVF_VECTORS:
+        return "flat"
+    return index_type
+
+
+def factory_string(index_type: str, dim: int, count: int, params: IndexParams) -> str:
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{params.hnsw_m}"
+    nlist = _nlist(count, params.ivf_nlist)
+    if index_type == "ivfsq8":
+        return f"IVF{nlist},SQ8"
+    if index_type == "ivfpq":
+        # 8-bit codebooks need 256 * 39 training vectors; small corpora get smaller codebooks.
+        nbits = max(4, min(8, int(math.log2(max(2, count // MIN_POINTS_PER_CENTROID)))))
+        return f"IVF{nlist},PQ{_pq_m(dim, params.pq_m)}x{nbits}"
+    raise ValueError(f"Unknown FAISS index type {index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+
+
+def build_index(vectors: np.ndarray, index_type: str, metric: int, params: Optional[IndexParams] = None) -> Any:
+    """Train and fill an index of ``index_type`` whose row i is ``vectors[i]``."""
+    params = params or IndexParams()
+    count, dim = vectors.shape
+    if effective_type(index_type, count) != index_type:
+        logger.warning("Only %s vectors; building a flat index instead of %s.", count, index_type)
+        index_type = "flat"
+    description = factory_string(index_type, dim, count, params)
+    index = faiss.index_factory(dim, description, metric)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = params.hnsw_ef_construction
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    set_search_parameters(index, params.search_parameters())
+    logger.info("Built %s index (%s) over %s vectors", index_type, description, count)
+    return index
+
+
+def rebuild_from(index: Any, index_type: str, params: Optional[IndexParams] = None) -> Any:
+    """``index_type`` rebuilt from the vectors of an exact flat ``index``."""
+    vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), dtype=np.float32)
+    return build_index(vectors, index_type, index.metric_type, params)
+
+
+def set_search_parameters(index: Any, parameters: Dict[str, int]) -> None:
+    """Apply the query-time knobs (``efSearch``, ``nprobe``) that ``index`` supports."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and "nprobe" in parameters:
+        ivf.nprobe = parameters["nprobe"]
+    if hasattr(index, "hnsw") and "efSearch" in parameters:
+        index.hnsw.efSearch = parameters["efSearch"]
+
+
+def index_bytes(index: Any) -> int:
+    return int(faiss.serialize_index(index).nbytes)
@@ -1,11 +1,15 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from django.utils import timezone
 from datetime import timedelta
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
 from django.core.cache import cache
+from django.db import connections
 from django.db.models import Avg
 from .models import Food, FoodLog, UserPregnancyProfile, FoodRecommendation, FoodRecognitionLog, FoodRating, ResponseStyle
 from django.contrib.auth import get_user_model
@@ -13,7 +17,15 @@ from .serializers import (
     FoodSerializer, FoodLogSerializer, UserPregnancyProfileSerializer, 
     FoodRecommendationSerializer, FoodRecognitionLogSerializer, FoodRatingSerializer, ResponseStyleSerializer
 )
-from .food_recognition import process_food_image
+from .food_recognition import process_food_image, peek_local_vlm_scheduler, log_food_recognition
+from .image_fingerprint import lookup_food_by_fingerprint, remember_food_fingerprint
+from .image_preprocessing import prepare_image
+from .parsers import ImageTooLarge, RawImageParser, image_upload_from
+from .local_vlm_warmup import is_ready, start_local_vlm_warmup, warmup_status
+from .hedging import hedge_stats
+from .metrics import registry as metrics_registry
+from .provider_router import router as provider_router
+from .singleflight import recognition_flight
 from .nutrient_analysis import analyze_nutrients, get_personalized_recommendations
 from .rag_utils import get_food_guidance, get_food_safety_info
 from django.conf import settings
@@ -25,6 +37,124 @@ import logging
 logger = logging.getLogger(__name__)
 CustomUser = get_user_model()
 RECOGNITION_CACHE_TIMEOUT = 1800  # 30분
+# JSON(Base64), multipart 파일, image/* 바이너리 본문을 모두 허용
+RECOGNITION_PARSER_CLASSES = [JSONParser, MultiPartParser, RawImageParser]
+BATCH_RECOGNITION_PARSER_CLASSES = [JSONParser, MultiPartParser]
+DEFAULT_BATCH_MAX_IMAGES = 8
+
+
+def _resolve_response_style(user):
+    style_name = user.preferred_speaking_style if user.preferred_speaking_style else '표준어'
+    try:
+        return ResponseStyle.objects.get(name=style_name)
+    except ResponseStyle.DoesNotExist:
+        return ResponseStyle.objects.get(name='표준어')
+
+
+def _recognition_cache_key(user_id, style_name, image_hash):
+    # 디코딩된 이미지 바이트의 해시를 사용하므로 base64/multipart/바이너리 업로드가 같은 캐시를 공유
+    return f"vision:recognize:{user_id}:{style_name}:{image_hash}"
+
+
+class RecognitionFailed(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _recognize_food(prepared_image, user_id):
+    # 재인코딩/리사이즈된 동일 사진은 사용자와 무관하게 지각 해시로 재사용
+    started = time.perf_counter()
+    fingerprint_food = lookup_food_by_fingerprint(prepared_image)
+    if fingerprint_food:
+        logger.debug("Near-duplicate image matched food %s", fingerprint_food)
+        return log_food_recognition(
+            fingerprint_food,
+            user_id,
+            image_hash=prepared_image.content_hash,
+            provider="fingerprint",
+            latency_ms=(time.perf_counter() - started) * 1000.0,
+        )
+
+    result = process_food_image(prepared_image, user_id)
+    if isinstance(result, dict) and 'error' not in result:
+        remember_food_fingerprint(prepared_image, result.get('food_name', ''))
+    return result
+
+
+def _recognize_upload(upload, user_id):
+    # 한 번만 디코딩하여 EXIF 회전/축소 후 지각 해시와 모든 비전 프로바이더가 공유
+    try:
+        prepared_image = prepare_image(upload)
+    except ValueError as e:
+        logger.warning("Invalid image payload: %s", str(e))
+        raise RecognitionFailed("이미지 형식이 올바르지 않습니다.", status.HTTP_400_BAD_REQUEST)
+
+    result = _recognize_food(prepared_image, user_id)
+
+    if not isinstance(result, dict):
+        logger.error(f"Unexpected result type from process_food_image: {type(result)}")
+        raise RecognitionFailed("음식 인식 처리 중 예기치 않은 오류가 발생했습니다.", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    if 'error' in result:
+        logger.error(f"Food recognition error: {result['error']}")
+        raise RecognitionFailed(result['error'], status.HTTP_400_BAD_REQUEST)
+
+    if result.get('food_name') == "Unknown":
+        raise RecognitionFailed("음식을 인식할 수 없습니다.", status.HTTP_404_NOT_FOUND)
+
+    return result
+
+
+def _fetch_guidance(food_name, response_style, user):
+    try:
+        return get_food_guidance(food_name, dialect_style=response_style.prompt, user=user)
+    except Exception as e:
+        logger.error("Error getting combined guidance: %s", str(e))
+        return None
+
+
+def _merge_guidance(result, guidance):
+    if guidance is None:
+        result.setdefault('is_safe', False)
+        result['safety_info'] = result.get('safety_info', "안전 정보를 가져오는 중 오류가 발생했습니다.")
+        result['nutritional_advice'] = result.get('nutritional_advice', "영양 조언을 가져오는 중 오류가 발생했습니다.")
+        return result
+    result['is_safe'] = guidance.get('is_safe', False)
+    result['safety_info'] = guidance.get('safety_summary', '')
+    result['nutritional_advice'] = guidance.get('nutritional_advice', '')
+    return result
+
+
+def _batch_max_images():
+    return int(getattr(settings, 'VISION_BATCH_MAX_IMAGES', os.getenv('VISION_BATCH_MAX_IMAGES', DEFAULT_BATCH_MAX_IMAGES)))
+
+
+def _batch_image_values(data):
+    if hasattr(data, 'getlist'):
+        return data.getlist('images')
+    values = data.get('images')
+    return values if isinstance(values, list) else []
+
+
+def _map_in_threads(func, items):
+    """
+    요청 스레드 밖에서 func를 병렬 실행합니다. 원격 프로바이더는 동시에 호출되고,
+    로컬 LoRA 모델 요청은 마이크로배치 스케줄러에서 하나의 generate로 묶입니다.
+    """
+    def run(item):
+        try:
+            return func(item)
+        finally:
+            # 요청 사이클 밖의 스레드이므로 DB 연결을 직접 반환
+            connections.close_all()
+
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=len(items), thread_name_prefix="vision-batch") as executor:
+        return list(executor.map(run, items))
+
 
 class FoodViewSet(viewsets.ModelViewSet):
     queryset = Food.objects.all()
@@ -65,7 +195,7 @@ class FoodViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         method='post',
         operation_summary="이미지로 음식 인식 및 안전 정보 제공",
-        operation_description="사용자가 제공한 Base64 인코딩된 이미지에서 음식을 인식하고, 해당 음식의 임신 중 섭취 안전성 및 영양 정보를 제공합니다.",
+        operation_description="사용자가 제공한 이미지에서 음식을 인식하고, 해당 음식의 임신 중 섭취 안전성 및 영양 정보를 제공합니다. 이미지는 JSON 본문의 Base64 문자열, `multipart/form-data`의 `image` 파일, 또는 `Content-Type: image/jpeg` 등 이미지 자체를 본문으로 보낼 수 있습니다. 바이너리 업로드는 Base64 변환 없이 처리되어 전송량이 약 25% 줄어듭니다.",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=['image'],
@@ -88,73 +218,165 @@ class FoodViewSet(viewsets.ModelViewSet):
             ),
             400: "잘못된 요청: 이미지가 제공되지 않았거나 형식이 올바르지 않습니다.",
             404: "음식 인식 실패: 이미지에서 음식을 인식할 수 없습니다.",
+            413: "이미지가 VISION_UPLOAD_MAX_BYTES보다 큽니다.",
             500: "서버 오류: 음식 인식 또는 정보 검색 중 오류가 발생했습니다."
         }
     )
     @action(detail=False, methods=['post'])
     def recognize(self, request):
-        user = request.user
-        style_name = user.preferred_speaking_style if user.preferred_speaking_style else '표준어'
+        response_style = _resolve_response_style(request.user)
+
         try:
-            response_style = ResponseStyle.objects.get(name=style_name)
-        except ResponseStyle.DoesNotExist:
-            response_style = ResponseStyle.objects.get(name='표준어')
-        
-        image_data = request.data.get('image')
+            upload = image_upload_from(request.data.get('image'))
+        except ValueError as e:
+            logger.warning("Invalid image payload: %s", str(e))
+            return Response({"error": "이미지 형식이 올바르지 않습니다."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not image_data:
+        if upload is None or not upload.size:
             return Response({"error": "이미지가 제공되지 않았습니다."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        logger.debug(f"Received image data length: {len(image_data)}")
-        
+
+        logger.debug(f"Received image bytes: {upload.size}")
+
         try:
-            # Base64 접두사 제거 (만약 포함되어 있다면)
-            if 'base64,' in image_data:
-                image_data = image_data.split('base64,')[1]
-            image_data = image_data.strip()
+            cache_namespace = _recognition_cache_key(request.user.id, response_style.name, upload.content_hash)
 
-            image_hash = hashlib.sha256(image_data.encode('utf-8')).hexdigest()
-            cache_namespace = f"vision:recognize:{request.user.id}:{response_style.name}:{image_hash}"
+            # 같은 이미지에 대한 동시 요청은 한 번만 인식하고 결과를 공유
+            result = recognition_flight.do(
+                cache_namespace,
+                lambda: self._recognize_with_guidance(upload, request.user, response_style),
+                timeout=RECOGNITION_CACHE_TIMEOUT,
+            )
+            return Response(result)
+
+        except RecognitionFailed as e:
+            return Response({"error": e.message}, status=e.status_code)
+        except Exception as e:
+            logger.exception("Unexpected error in recognize method")
+            return Response({"error": f"처리 중 오류가 발생했습니다: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def _recognize_with_guidance(upload, user, response_style):
+        result = _recognize_upload(upload, user.id)
+        # 안전 정보 및 영양 조언 추가 (단일 RAG 호출 + 캐시)
+        return _merge_guidance(result, _fetch_guidance(result['food_name'], response_style, user))
+
+    @swagger_auto_schema(
+        method='post',
+        operation_summary="여러 장의 이미지로 한 끼 식사 일괄 인식",
+        operation_description="한 끼 식사를 찍은 여러 장의 이미지를 한 번에 인식합니다. 이미지는 동시에 인식되며(로컬 모델은 하나의 배치로 묶임), 인식된 음식 이름을 중복 제거한 뒤 음식마다 한 번만 안전 정보를 조회합니다. 일부 이미지가 실패해도 나머지 결과는 반환되며, 각 결과의 `status`로 성공 여부를 구분합니다. JSON 본문의 `images`(Base64 문자열 배열) 또는 `multipart/form-data`의 `images` 파일 여러 개를 받습니다.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['images'],
+            properties={
+                'images': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_STRING),
+                    description="Base64로 인코딩된 이미지 데이터 목록"
+                )
+            },
+        ),
+        responses={
+            200: openapi.Response(
+                description="이미지별 인식 결과입니다. 실패한 이미지는 `status`와 `error`를 포함합니다.",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'results': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    'index': openapi.Schema(type=openapi.TYPE_INTEGER, description="요청 내 이미지 순서"),
+                                    'status': openapi.Schema(type=openapi.TYPE_INTEGER, description="이미지별 HTTP 상태 코드"),
+                                    'food_name': openapi.Schema(type=openapi.TYPE_STRING, description="인식된 음식의 이름"),
+                                    'is_safe': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="임신 중 섭취 안전 여부"),
+                                    'safety_info': openapi.Schema(type=openapi.TYPE_STRING, description="임신 중 섭취에 대한 안전 정보"),
+                                    'nutritional_advice': openapi.Schema(type=openapi.TYPE_STRING, description="임신 단계별 영양 조언"),
+                                    'error': openapi.Schema(type=openapi.TYPE_STRING, description="실패한 경우의 오류 메시지"),
+                                }
+                            )
+                        ),
+                        'succeeded': openapi.Schema(type=openapi.TYPE_INTEGER, description="성공한 이미지 수"),
+                        'failed': openapi.Schema(type=openapi.TYPE_INTEGER, description="실패한 이미지 수"),
+                    }
+                )
+            ),
+            400: "잘못된 요청: 이미지가 제공되지 않았거나 VISION_BATCH_MAX_IMAGES를 초과했습니다.",
+        }
+    )
+    @action(detail=False, methods=['post'])
+    def recognize_batch(self, request):
+        response_style = _resolve_response_style(request.user)
+        values = _batch_image_values(request.data)
+
+        if not values:
+            return Response({"error": "이미지가 제공되지 않았습니다."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_images = _batch_max_images()
+        if len(values) > max_images:
+            return Response(
+                {"error": f"한 번에 최대 {max_images}장까지 인식할 수 있습니다."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = [None] * len(values)
+        # 같은 사진이 여러 번 포함되어도 한 번만 인식
+        pending = {}
+        for index, value in enumerate(values):
+            try:
+                upload = image_upload_from(value)
+            except ImageTooLarge as e:
+                results[index] = {"index": index, "status": e.status_code, "error": str(e.detail)}
+                continue
+            except ValueError as e:
+                logger.warning("Invalid image payload in batch: %s", str(e))
+                results[index] = {"index": index, "status": status.HTTP_400_BAD_REQUEST, "error": "이미지 형식이 올바르지 않습니다."}
+                continue
+            if upload is None or not upload.size:
+                results[index] = {"index": index, "status": status.HTTP_400_BAD_REQUEST, "error": "이미지가 제공되지 않았습니다."}
+                continue
+
+            cache_namespace = _recognition_cache_key(request.user.id, response_style.name, upload.content_hash)
             cached_payload = cache.get(cache_namespace)
             if cached_payload:
-                logger.debug("Returning cached vision response for key %s", cache_namespace)
-                return Response(cached_payload)
-
-            logger.debug(f"Base64 data length after prefix removal: {len(image_data)}")
-
-            # 음식 인식 처리 (Base64 인코딩된 이미지 데이터를 직접 전달)
-            result = process_food_image(image_data, request.user.id)
-            
-            if not isinstance(result, dict):
-                logger.error(f"Unexpected result type from process_food_image: {type(result)}")
-                return Response({"error": "음식 인식 처리 중 예기치 않은 오류가 발생했습니다."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            if 'error' in result:
-                logger.error(f"Food recognition error: {result['error']}")
-                return Response({"error": result['error']}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if result.get('food_name') == "Unknown":
-                return Response({"error": "음식을 인식할 수 없습니다."}, status=status.HTTP_404_NOT_FOUND)
-            
-            # 안전 정보 및 영양 조언 추가 (단일 RAG 호출 + 캐시)
+                results[index] = {"index": index, "status": status.HTTP_200_OK, **cached_payload}
+                continue
+            pending.setdefault(cache_namespace, (upload, []))[1].append(index)
+
+        def recognize_one(item):
+            upload, _ = item
             try:
-                guidance = get_food_guidance(result['food_name'], dialect_style=response_style.prompt, user=request.user)
-                result['is_safe'] = guidance.get('is_safe', False)
-                result['safety_info'] = guidance.get('safety_summary', '')
-                result['nutritional_advice'] = guidance.get('nutritional_advice', '')
+                return _recognize_upload(upload, request.user.id)
+            except RecognitionFailed as e:
+                return e
             except Exception as e:
-                logger.error("Error getting combined guidance: %s", str(e))
-                result.setdefault('is_safe', False)
-                result['safety_info'] = result.get('safety_info', "안전 정보를 가져오는 중 오류가 발생했습니다.")
-                result['nutritional_advice'] = result.get('nutritional_advice', "영양 조언을 가져오는 중 오류가 발생했습니다.")
+                logger.exception("Unexpected error in batch recognition")
+                return RecognitionFailed(f"처리 중 오류가 발생했습니다: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        recognized = dict(zip(pending, _map_in_threads(recognize_one, list(pending.values()))))
 
+        # 인식된 음식 이름을 중복 제거하여 음식마다 한 번만 RAG 호출
+        food_names = sorted({
+            result['food_name'] for result in recognized.values() if not isinstance(result, RecognitionFailed)
+        })
+        guidance_by_food = dict(zip(
+            food_names,
+            _map_in_threads(lambda food_name: _fetch_guidance(food_name, response_style, request.user), food_names),
+        ))
+
+        for cache_namespace, (_, indexes) in pending.items():
+            result = recognized[cache_namespace]
+            if isinstance(result, RecognitionFailed):
+                for index in indexes:
+                    results[index] = {"index": index, "status": result.status_code, "error": result.message}
+                continue
+            result = _merge_guidance(result, guidance_by_food[result['food_name']])
             cache.set(cache_namespace, result, timeout=RECOGNITION_CACHE_TIMEOUT)
-            
-            return Response(result)
-        
-        except Exception as e:
-            logger.exception("Unexpected error in recognize method")
-            return Response({"error": f"처리 중 오류가 발생했습니다: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            for index in indexes:
+                results[index] = {"index": index, "status": status.HTTP_200_OK, **result}
+
+        succeeded = sum(1 for result in results if result['status'] == status.HTTP_200_OK)
+        return Response({"results": results, "succeeded": succeeded, "failed": len(results) - succeeded})
 
     @swagger_auto_schema(
         method='get',
@@ -423,3 +645,60 @@ class UserStyleViewSet(viewsets.ViewSet):
         user.save()
 
         return Response({'message': '선호 스타일이 설정되었습니다.'})
+
+
+class VisionMetricsViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="비전 파이프라인 런타임 지표 조회",
+        operation_description="현재 워커 프로세스의 로컬 VLM 배치 큐 길이, 배치 크기 분포, 요청별 대기 시간, 헤지 요청 비율과 백업 모델 승률 등 런타임 지표를 반환합니다. 지표는 워커별로 집계됩니다.",
+        responses={200: "워커 프로세스의 런타임 지표"}
+    )
+    def list(self, request):
+        # Only processes that served a batched lora request have a scheduler.
+        scheduler = peek_local_vlm_scheduler()
+        return Response({
+            "pid": os.getpid(),
+            "local_vlm_batching": scheduler.stats() if scheduler is not None else None,
+            "local_vlm_warmup": warmup_status(),
+            "hedging": {
+                "openai_vision": hedge_stats("openai_vision"),
+                "ollama_vision": hedge_stats("ollama_vision"),
+            },
+            "metrics": metrics_registry.snapshot(),
+        })
+
+
+class ProviderRoutingViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="비전/RAG 백엔드 라우팅 상태 조회",
+        operation_description="현재 워커 프로세스가 추적하는 백엔드별 EWMA 지연 시간, 오류율, 서킷 브레이커 상태(closed/open/half_open)와 최근 라우팅 결정 내역을 반환합니다.",
+        responses={200: "백엔드 상태와 최근 라우팅 결정"}
+    )
+    def list(self, request):
+        return Response({
+            "pid": os.getpid(),
+            **provider_router.snapshot(),
+        })
+
+
+class ReadinessViewSet(viewsets.ViewSet):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @swagger_auto_schema(
+        operation_summary="워커 준비 상태 확인",
+        operation_description="LOCAL_VLM_PRELOAD가 켜져 있으면 로컬 VLM 로딩과 워밍업이 끝날 때까지 503을 반환합니다. 로드 밸런서와 컨테이너 헬스체크에서 사용합니다.",
+        responses={200: "요청을 받을 준비가 됨", 503: "로컬 VLM 워밍업 중이거나 실패함"}
+    )
+    def list(self, request):
+        # Starts the warm-up for servers that skip the gunicorn hook; a no-op once it is running.
+        start_local_vlm_warmup()
+        ready = is_ready()
+        return Response(
+            {"status": "ready" if ready else "starting", "local_vlm": warmup_status()},
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
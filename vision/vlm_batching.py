@@ -0,0 +1,138 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+from vision.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+
+class _PendingRequest:
+    __slots__ = ("payload", "future", "enqueued_at")
+
+    def __init__(self, payload: Any) -> None:
+        self.payload = payload
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatchScheduler:
+    """
+    Collects concurrent requests for a single shared model and runs them as one batch.
+
+    A batch is closed when it reaches ``max_batch_size`` or when the oldest request
+    has waited ``max_wait_ms``. ``run_batch`` receives the payloads in submission
+    order and must return one result per payload.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Sequence[Any]],
+        *,
+        max_batch_size: int,
+        max_wait_ms: float,
+        name: str = "local_vlm",
+    ) -> None:
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_seconds = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+
+        self._queue_depth = registry.gauge(f"{name}.batch.queue_depth")
+        self._batch_sizes = registry.histogram(f"{name}.batch.size", BATCH_SIZE_BUCKETS)
+        self._wait_ms = registry.histogram(f"{name}.batch.wait_ms")
+        self._run_ms = registry.histogram(f"{name}.batch.run_ms")
+        self._errors = registry.counter(f"{name}.batch.errors")
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so a gunicorn worker forked from a preloaded
+        # master needs its own batching thread.
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def submit_async(self, payload: Any) -> Future:
+        self._ensure_worker()
+        request = _PendingRequest(payload)
+        self._queue.put(request)
+        self._queue_depth.set(self._queue.qsize())
+        return request.future
+
+    def submit(self, payload: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit_async(payload).result(timeout=timeout)
+
+    def submit_many(self, payloads: Sequence[Any], timeout: Optional[float] = None) -> List[Any]:
+        futures = [self.submit_async(payload) for payload in payloads]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            self._queue_depth.set(self._queue.qsize())
+
+            started = time.monotonic()
+            for request in batch:
+                self._wait_ms.observe((started - request.enqueued_at) * 1000.0)
+            self._batch_sizes.observe(len(batch))
+
+            live = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not live:
+                continue
+
+            try:
+                results = list(self.run_batch([request.payload for request in live]))
+                if len(results) != len(live):
+                    raise RuntimeError(
+                        f"{self.name} batch returned {len(results)} results for {len(live)} requests"
+                    )
+            except BaseException as exc:  # pylint: disable=broad-except
+                self._errors.inc()
+                logger.error("%s batch of %s failed: %s", self.name, len(live), exc, exc_info=True)
+                for request in live:
+                    request.future.set_exception(exc)
+                continue
+            finally:
+                self._run_ms.observe((time.monotonic() - started) * 1000.0)
+
+            for request, result in zip(live, results):
+                request.future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_seconds * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            **registry.snapshot(prefix=f"{self.name}.batch."),
+        }
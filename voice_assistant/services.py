@@ -7,6 +7,8 @@ from typing import Any, Dict, Iterable, Optional
 import httpx
 from django.conf import settings
 
+from project_template.http_clients import get_httpx_client
+
 from .exceptions import OpenAIRealtimeException
 
 logger = logging.getLogger(__name__)
@@ -18,6 +20,7 @@ class OpenAIRealtimeService:
 
     - 세션 생성은 서버에서 수행하여 클라이언트에 에페메랄 토큰을 전달합니다.
     - HTTP 타임아웃, 재시도 정책, 로깅을 표준화합니다.
+    - 프로세스 단위로 공유되는 keep-alive 연결 풀을 사용합니다.
     """
 
     OPENAI_BETA_HEADER = "realtime=v1"
@@ -89,8 +92,9 @@ class OpenAIRealtimeService:
         url = f"{self.api_base.rstrip('/')}/realtime/sessions"
 
         try:
-            with httpx.Client(timeout=self.timeout) as client:
-                response = client.post(url, headers=headers, json=payload)
+            response = get_httpx_client("openai_realtime").post(
+                url, headers=headers, json=payload, timeout=self.timeout
+            )
         except httpx.RequestError as exc:
             logger.exception("OpenAI Realtime 세션 생성 중 네트워크 오류: %s", exc)
             raise OpenAIRealtimeException("OpenAI Realtime API와 통신에 실패했습니다.") from exc